@@ -0,0 +1,122 @@
+"""Memory held by the list data behind rv_products and clients_rv.
+
+    python -m benchmarks.memory --db bench_100k.db --rows 100000
+
+"before" rebuilds rows the way the screens did before the repositories
+package: fetchall() tuples turned into one dict per row (with the row
+callbacks copied into every dict). "after" is the repositories' slot
+records, which the RecycleViews now take as their data directly. Both are
+measured with tracemalloc: bytes still held once the list is built, and
+the peak while building it.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import db
+from repositories.clients import client_repository
+from repositories.products import product_repository
+
+
+def _handler(*args):
+    pass
+
+
+_LEGACY_HANDLERS = {'view_product': _handler, 'edit_product': _handler, 'delete_product': _handler}
+
+
+def legacy_product_rows(limit):
+    conn = db.get_connection()
+    rows = conn.execute(
+        "SELECT id, name, category, thumb_path, last_updated FROM products "
+        "ORDER BY last_updated DESC, id DESC LIMIT ?", (limit,)
+    ).fetchall()
+    data = []
+    for idx, (id_, name, category, thumb_path, last_updated) in enumerate(rows):
+        row = {
+            'product_id': id_,
+            'name': name,
+            'category': category,
+            'image_path': thumb_path or 'default_img.png',
+            'index': idx,
+            'last_updated': last_updated,
+            'sort_key': (last_updated, id_),
+        }
+        row.update(_LEGACY_HANDLERS)
+        data.append(row)
+    return data
+
+
+def legacy_client_rows(limit):
+    conn = db.get_connection()
+    rows = conn.execute(
+        "SELECT c.id, c.name, c.phone, IFNULL(b.total, 0) FROM clients c "
+        "LEFT JOIN client_balances b ON b.client_id = c.id LIMIT ?", (limit,)
+    ).fetchall()
+    return [{
+        'client_id': client_id,
+        'name': name,
+        'phone': phone or 'No phone',
+        'balance': f"${total_debt:.2f}",
+        'total_debt': total_debt,
+    } for client_id, name, phone, total_debt in rows]
+
+
+def record_product_rows(limit):
+    return product_repository.first_page(limit)
+
+
+def record_client_rows(limit):
+    return client_repository.all()[:limit]
+
+
+def measure(build, limit):
+    """(rows, bytes held per row, peak bytes per row, seconds) for one build."""
+    db.get_connection()  # open outside the measurement
+    tracemalloc.start()
+    started = time.perf_counter()
+    data = build(limit)
+    elapsed = time.perf_counter() - started
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(data) or 1
+    return {'rows': len(data), 'held_per_row': round(held / count, 1),
+            'peak_per_row': round(peak / count, 1), 'seconds': round(elapsed, 3)}
+
+
+CASES = (
+    ('products', legacy_product_rows, record_product_rows),
+    ('clients', legacy_client_rows, record_client_rows),
+)
+
+
+def run(path, rows):
+    db.configure(path)
+    db.migrate()
+    results = {}
+    for name, before, after in CASES:
+        results[name] = {'before': measure(before, rows), 'after': measure(after, rows)}
+        b, a = results[name]['before'], results[name]['after']
+        print(f"{name:<9} {b['rows']:>8,} rows   held/row {b['held_per_row']:7.1f} -> {a['held_per_row']:7.1f} B"
+              f"   peak/row {b['peak_per_row']:7.1f} -> {a['peak_per_row']:7.1f} B"
+              f"   per 100k held {b['held_per_row'] * 1e5 / 2**20:6.1f} -> {a['held_per_row'] * 1e5 / 2**20:6.1f} MiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row memory of dict rows and slot records.")
+    parser.add_argument("--db", required=True, help="database to read (see benchmarks.synthetic)")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.db, args.rows)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
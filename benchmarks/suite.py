@@ -0,0 +1,208 @@
+"""Headless benchmarks for the queries and row building behind the screens.
+
+    python -m benchmarks.suite --db bench_100k.db --out results.json
+    python -m benchmarks.suite --db bench_100k.db --baseline results.json
+
+Each case calls the same service functions the screens run on their
+workers (no Kivy window is needed) and reports per-run timings in ms.
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+import db
+from services import catalog, clients, metrics, products, reports, search
+from services.suppliers import SupplierManager
+
+# Typing "tech" one key at a time, as filter_suppliers sees it.
+SUPPLIER_KEYSTROKES = ('t', 'te', 'tec', 'tech')
+
+# Typing a product name in the Add Debt dialog.
+PRODUCT_KEYSTROKES = ('c', 'cl', 'cla', 'class', 'classic c')
+
+
+def _refresh_products():
+    return products.fetch_first_page(products.PAGE_SIZE)
+
+
+def _scroll_products(pages=5):
+    source = products.LatestProducts()
+    rows = source.first(products.PAGE_SIZE)
+    data = list(rows)
+    for _ in range(pages):
+        if not rows:
+            break
+        rows = source.after(source.key(rows[-1]), products.PAGE_SIZE)
+        data += rows
+    return data
+
+
+def _search_products(text='cof'):
+    return search.ProductSearch(text).first(products.PAGE_SIZE)
+
+
+def _catalog_sort_filter(sort='name', category='Bakery'):
+    # Applying the Filter dialog once the catalog is loaded: select, then the first page.
+    return catalog.CatalogProducts(sort, category, active_only=True).first(products.PAGE_SIZE)
+
+
+def _refresh_clients():
+    return clients.sort_client_rows(clients.fetch_clients(), 'name')
+
+
+def _sort_clients_by_balance(data):
+    return clients.sort_client_rows(data, 'balance')
+
+
+def _add_debt_autocomplete():
+    # A fresh cache per run: the first dialog open after a write.
+    source = products.ProductAutocomplete()
+    results = None
+    for text in PRODUCT_KEYSTROKES:
+        results = source.complete(text)
+    return results
+
+
+def _filter_suppliers(manager):
+    results = None
+    for term in SUPPLIER_KEYSTROKES:
+        results = manager.filter_suppliers(term)
+    return results
+
+
+def _cold_suppliers():
+    return SupplierManager().get_all_suppliers()
+
+
+def _cases(rng):
+    """(name, setup, fn) triples; setup's result is passed to fn when not None."""
+    conn = db.get_connection()
+    client_count = conn.execute("SELECT MAX(id) FROM clients").fetchone()[0] or 1
+    warm_manager = SupplierManager()
+    warm_manager.get_all_suppliers()
+
+    return [
+        ('refresh_products', None, _refresh_products),
+        ('products_scroll_6_pages', None, _scroll_products),
+        ('product_search', None, _search_products),
+        ('catalog_load', None, catalog.ProductCatalog().load),
+        ('catalog_sort_filter', None, _catalog_sort_filter),
+        ('catalog_sort_all', None, lambda: _catalog_sort_filter('stock', None)),
+        ('refresh_clients', None, _refresh_clients),
+        ('sort_clients_by_balance', _refresh_clients, _sort_clients_by_balance),
+        ('open_manage_debts', lambda: rng.randrange(1, client_count + 1), clients.fetch_client_debts),
+        ('add_debt_autocomplete', None, _add_debt_autocomplete),
+        ('suppliers_cold_load', None, _cold_suppliers),
+        ('filter_suppliers', lambda: warm_manager, _filter_suppliers),
+        ('dashboard_metrics', None, metrics.compute_metrics),
+        ('report_30_days', None, lambda: reports.build_report(30)),
+    ]
+
+
+def _size(result):
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def time_case(setup, fn, runs, warmup=1):
+    timings = []
+    size = None
+    for i in range(warmup + runs):
+        arg = setup() if setup else None
+        started = time.perf_counter()
+        result = fn(arg) if setup else fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        if i >= warmup:
+            timings.append(elapsed)
+            size = _size(result)
+    timings.sort()
+    return {
+        'runs': runs,
+        'rows': size,
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _table_counts():
+    conn = db.get_connection()
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ('products', 'product_stores', 'stores', 'clients', 'debts', 'suppliers')}
+
+
+def run(path, runs=20, only=None, seed=1):
+    db.configure(path)
+    db.migrate()
+    rng = random.Random(seed)
+    results = {}
+    for name, setup, fn in _cases(rng):
+        if only and name not in only:
+            continue
+        results[name] = time_case(setup, fn, runs)
+        print(f"{name:<26} median {results[name]['median_ms']:9.3f} ms   "
+              f"p95 {results[name]['p95_ms']:9.3f} ms")
+    return {
+        'meta': {
+            'db': path,
+            'tables': _table_counts(),
+            'schema_version': db.schema_version(),
+            'fts': search.fts_available(),
+            'sqlite': sqlite3.sqlite_version,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'git': _git_revision(),
+            'started': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    """Print median changes against a previous results file."""
+    for name, result in report['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old or not old['median_ms']:
+            continue
+        ratio = result['median_ms'] / old['median_ms']
+        print(f"{name:<26} {old['median_ms']:9.3f} -> {result['median_ms']:9.3f} ms  ({ratio:5.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the data-layer code paths behind each screen.")
+    parser.add_argument("--db", required=True, help="database to benchmark (see benchmarks.synthetic)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="case names to run")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare medians with an earlier JSON results file")
+    args = parser.parse_args()
+
+    report = run(args.db, runs=args.runs, only=args.only)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(report, json.load(f))
+    db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
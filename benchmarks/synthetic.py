@@ -0,0 +1,197 @@
+"""Deterministic synthetic datasets for benchmarking the data layer.
+
+    python -m benchmarks.synthetic --scale 100k --db bench_100k.db
+
+The database is created through db.migrate(), so it has exactly the
+schema (indexes, triggers, FTS) the app uses on users.db. The same scale
+and seed always produce the same rows.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import db
+
+# products per scale; everything else is derived from it in scale_counts().
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+BATCH_SIZE = 5000
+
+CATEGORIES = [
+    'Beverages', 'Snacks', 'Dairy', 'Bakery', 'Produce', 'Frozen', 'Household', 'Cleaning',
+    'Personal Care', 'Stationery', 'Electronics', 'Hardware', 'Tools', 'Garden', 'Toys',
+    'Clothing', 'Footwear', 'Pharmacy', 'Pet Supplies', 'Automotive',
+]
+ADJECTIVES = [
+    'Classic', 'Premium', 'Fresh', 'Organic', 'Compact', 'Deluxe', 'Everyday', 'Family',
+    'Golden', 'Heavy Duty', 'Light', 'Mini', 'Natural', 'Original', 'Rapid', 'Smart',
+    'Super', 'Ultra', 'Value', 'Wireless',
+]
+NOUNS = [
+    'Coffee', 'Tea', 'Juice', 'Biscuits', 'Crisps', 'Yoghurt', 'Cheese', 'Bread', 'Apples',
+    'Rice', 'Soap', 'Detergent', 'Shampoo', 'Notebook', 'Pen', 'Charger', 'Cable', 'Hammer',
+    'Drill', 'Gloves', 'Hose', 'Blocks', 'T-Shirt', 'Sandals', 'Bandages', 'Dog Food',
+    'Motor Oil', 'Battery', 'Lamp', 'Towel',
+]
+FIRST_NAMES = [
+    'Alice', 'Bob', 'Chloe', 'David', 'Esther', 'Felix', 'Grace', 'Hugo', 'Ines', 'Jean',
+    'Kevin', 'Laura', 'Moses', 'Nadia', 'Olivier', 'Patience', 'Quentin', 'Rose', 'Samuel',
+    'Teta', 'Umuhoza', 'Victor', 'Wanda', 'Xavier', 'Yvette', 'Zawadi',
+]
+LAST_NAMES = [
+    'Mugisha', 'Uwase', 'Habimana', 'Ingabire', 'Niyonzima', 'Mukamana', 'Nkurunziza',
+    'Smith', 'Johnson', 'Martin', 'Dubois', 'Okafor', 'Kamau', 'Mensah', 'Banda',
+]
+CITIES = ['Kigali', 'Musanze', 'Huye', 'Rubavu', 'Nyagatare', 'Rusizi', 'Muhanga', 'Karongi']
+SUPPLIER_WORDS = ['Acme', 'Global', 'Prime', 'Summit', 'Delta', 'Nova', 'Atlas', 'Vertex', 'Pioneer', 'Union']
+SUPPLIER_KINDS = ['Supplies', 'Systems', 'Traders', 'Distributors', 'Wholesale', 'Logistics', 'Imports']
+SUPPLIER_CATEGORIES = [
+    'Industrial Equipment & Materials', 'Technology & Software Solutions', 'Food & Beverage',
+    'Office Supplies', 'Cleaning Products', 'Building Materials', 'Textiles',
+]
+
+
+def scale_counts(products):
+    """Row counts for a dataset with this many products."""
+    return {
+        'products': products,
+        'stores': max(4, products // 1000),
+        'product_stores': products * 2,
+        'clients': max(10, products // 10),
+        'debts': products,
+        'suppliers': max(10, products // 100),
+    }
+
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(sql, rows, label, total, progress):
+    written = 0
+    for batch in _batched(rows):
+        with db.transaction() as conn:
+            conn.executemany(sql, batch)
+        written += len(batch)
+        progress(label, written, total)
+    return written
+
+
+def _products(rng, count, now):
+    for i in range(count):
+        updated = now - timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600))
+        yield (
+            f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i + 1}",
+            rng.randrange(0, 500),
+            rng.choice(CATEGORIES),
+            int(rng.random() < 0.8),
+            updated.strftime("%Y-%m-%d %H:%M:%S"),
+            None,
+        )
+
+
+def _stores(rng, count):
+    for i in range(count):
+        city = rng.choice(CITIES)
+        yield (f"{city} Store {i + 1}", city)
+
+
+def _product_stores(rng, products, stores):
+    # Two distinct stores per product.
+    for product_id in range(1, products + 1):
+        first = rng.randrange(1, stores + 1)
+        second = first % stores + 1
+        yield (product_id, first)
+        yield (product_id, second)
+
+
+def _clients(rng, count):
+    for _ in range(count):
+        phone = f"+2507{rng.randrange(10_000_000, 99_999_999)}" if rng.random() < 0.9 else None
+        yield (f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", phone)
+
+
+def _debts(rng, count, clients, products):
+    for _ in range(count):
+        yield (
+            rng.randrange(1, clients + 1),
+            f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.randrange(1, products + 1)}",
+            round(rng.uniform(0.5, 250), 2),
+        )
+
+
+def _suppliers(rng, count, now):
+    for i in range(count):
+        name = f"{rng.choice(SUPPLIER_WORDS)} {rng.choice(SUPPLIER_KINDS)} {i + 1}"
+        yield (
+            f"synthetic_{i + 1}", name, rng.choice(SUPPLIER_CATEGORIES),
+            'Active' if rng.random() < 0.85 else 'Inactive',
+            f"+1-555-{rng.randrange(1000, 9999)}", f"contact{i + 1}@example.com",
+            round(rng.uniform(1, 5), 1), name[:2].upper(), None,
+            f"{rng.randrange(1, 999)} {rng.choice(CITIES)} Road",
+            (now - timedelta(days=rng.randrange(1000))).strftime('%Y-%m-%d'),
+        )
+
+
+def _report_progress(label, written, total):
+    print(f"\r{label}: {written:,} / {total:,}", end="\n" if written >= total else "", flush=True)
+
+
+def generate(path, products=SCALES['1k'], seed=42, progress=_report_progress):
+    """Create a fresh database at path with a synthetic dataset; returns the row counts."""
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+    counts = scale_counts(products)
+    rng = random.Random(seed)
+    # A fixed clock keeps last_updated values identical between runs.
+    now = datetime(2025, 1, 1)
+
+    db.configure(path)
+    db.migrate()
+    _insert("INSERT INTO stores (name, location) VALUES (?, ?)",
+            _stores(rng, counts['stores']), 'stores', counts['stores'], progress)
+    _insert("INSERT INTO products (name, stock, category, active, last_updated, image_path) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            _products(rng, counts['products'], now), 'products', counts['products'], progress)
+    _insert("INSERT OR IGNORE INTO product_stores (product_id, store_id) VALUES (?, ?)",
+            _product_stores(rng, counts['products'], counts['stores']),
+            'product_stores', counts['product_stores'], progress)
+    _insert("INSERT INTO clients (name, phone) VALUES (?, ?)",
+            _clients(rng, counts['clients']), 'clients', counts['clients'], progress)
+    _insert("INSERT INTO debts (client_id, product, amount) VALUES (?, ?, ?)",
+            _debts(rng, counts['debts'], counts['clients'], counts['products']),
+            'debts', counts['debts'], progress)
+    _insert("INSERT INTO suppliers (slug, name, category, status, contact, email, rating, avatar, "
+            "color, address, date_added) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            _suppliers(rng, counts['suppliers'], now), 'suppliers', counts['suppliers'], progress)
+    with db.transaction() as conn:
+        conn.execute("ANALYZE")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic users.db-compatible database.")
+    parser.add_argument("--scale", choices=sorted(SCALES, key=SCALES.get), default='1k')
+    parser.add_argument("--db", help="output path (default bench_<scale>.db)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    path = args.db or f"bench_{args.scale}.db"
+    started = time.perf_counter()
+    counts = generate(path, SCALES[args.scale], seed=args.seed)
+    print(f"Wrote {path} in {time.perf_counter() - started:.1f} s: "
+          + ", ".join(f"{count:,} {table}" for table, count in counts.items()))
+    db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
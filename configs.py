@@ -1,5 +1,15 @@
+import os
+
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.filechooser import FileChooserListView
 from kivy.uix.popup import Popup
 from kivy.uix.label import Label
+from kivy.uix.progressbar import ProgressBar
+
+from services import executor, exporter, importer
 
 
 def show_popup(title, message):
@@ -9,4 +19,93 @@ def show_popup(title, message):
             size_hint=(None, None),
             size=(300, 200)
         )
-        popup.open()
\ No newline at end of file
+        popup.open()
+
+
+def _progress_popup(title, text):
+    """Open a non-dismissable popup with a progress bar; returns (popup, update(value, total, text))."""
+    content = BoxLayout(orientation='vertical', spacing=10, padding=10)
+    status = Label(text=text)
+    bar = ProgressBar(max=1, value=0)
+    content.add_widget(status)
+    content.add_widget(bar)
+    popup = Popup(title=title, content=content, size_hint=(None, None), size=(360, 200),
+                  auto_dismiss=False)
+    popup.open()
+
+    def update(value, total, text):
+        bar.max = max(total, 1)
+        bar.value = value
+        status.text = text
+
+    return popup, update
+
+
+def start_export(kind):
+    """Export a table to CSV on the DB worker, showing progress in a popup."""
+    app = App.get_running_app()
+    directory = os.path.join(app.user_data_dir, exporter.EXPORT_DIR) if app else exporter.EXPORT_DIR
+    popup, update = _progress_popup('Export', f"Exporting {kind}...")
+
+    def progress(written, total):
+        # Called on the worker thread after each chunk.
+        Clock.schedule_once(lambda dt: update(written, total, f"Exporting {kind}... {written}/{total} rows"))
+
+    def done(result):
+        path, written = result
+        popup.dismiss()
+        show_popup("Export complete", f"{written} {kind} rows exported to\n{path}")
+
+    def failed(error):
+        popup.dismiss()
+        show_popup("Error", f"Export failed: {error}")
+
+    executor.submit(exporter.export, kind, exporter.export_path(kind, directory), progress=progress,
+                    on_result=done, on_error=failed, group=f"export:{kind}")
+
+
+def start_import(kind, on_done=None):
+    """Pick a CSV file and bulk-import it as `kind` on the DB worker.
+
+    on_done(report) runs on the UI thread after a successful import.
+    """
+    content = BoxLayout(orientation='vertical')
+    filechooser = FileChooserListView(filters=['*.csv'], path=os.getcwd())
+    btn_layout = BoxLayout(size_hint_y=None, height='48dp', spacing=10)
+    select_btn = Button(text='Import', size_hint_x=0.5)
+    cancel_btn = Button(text='Cancel', size_hint_x=0.5)
+    btn_layout.add_widget(select_btn)
+    btn_layout.add_widget(cancel_btn)
+    content.add_widget(filechooser)
+    content.add_widget(btn_layout)
+    chooser = Popup(title=f'Import {kind} from CSV', content=content, size_hint=(0.9, 0.9))
+
+    def run(path):
+        chooser.dismiss()
+        popup, update = _progress_popup('Import', f"Importing {kind}...")
+
+        def progress(report):
+            # Called on the worker thread after each committed batch.
+            text = f"Importing {kind}... {report.accepted} accepted, {report.rejected} rejected"
+            done_bytes, total_bytes = report.bytes_read, report.total_bytes
+            Clock.schedule_once(lambda dt: update(done_bytes, total_bytes, text))
+
+        def done(report):
+            popup.dismiss()
+            message = report.summary()
+            if report.rejects:
+                message += "\n" + "\n".join(f"row {n}: {reason}" for n, reason in report.rejects[:5])
+            show_popup("Import complete", message)
+            if on_done is not None:
+                on_done(report)
+
+        def failed(error):
+            popup.dismiss()
+            show_popup("Error", f"Import failed: {error}\nRun it again to resume.")
+
+        executor.submit(importer.import_csv, kind, path, progress=progress,
+                        on_result=done, on_error=failed, group=f"import:{kind}")
+
+    select_btn.bind(on_press=lambda x: run(filechooser.selection[0]) if filechooser.selection else None)
+    cancel_btn.bind(on_press=chooser.dismiss)
+    chooser.open()
@@ -1,10 +1,207 @@
+import logging
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from services import instrumentation
+
+DB_PATH = "users.db"
+
+logger = logging.getLogger(__name__)
+
+# Per-connection tuning, applied once when a connection is opened.
+CACHE_SIZE_KB = 8192
+MMAP_SIZE = 64 * 1024 * 1024
+BUSY_TIMEOUT = 5.0
+# Prepared statements kept per connection, keyed by exact SQL text; the
+# repositories use fixed statement text so their queries stay cached.
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionManager:
+    """Hands out one tuned connection per thread and counts how often they are reused."""
+
+    def __init__(self, path=DB_PATH, cache_size_kb=CACHE_SIZE_KB, mmap_size=MMAP_SIZE):
+        self.path = path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with self._lock:
+                self.reused += 1
+            return conn
+
+        # Each connection is only ever used by the thread that opened it;
+        # check_same_thread is relaxed so close_all() can run at shutdown.
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE,
+                               factory=instrumentation.TimedConnection)
+        self._configure(conn)
+        self._local.conn = conn
+        self._local.depth = 0
+        with self._lock:
+            self._connections[threading.get_ident()] = (threading.current_thread(), conn)
+            self.opened += 1
+        return conn
+
+    def _configure(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA foreign_keys=ON")
+
+    def close_thread(self):
+        """Close the calling thread's connection, if it has one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections.pop(threading.get_ident(), None)
+            self.closed += 1
+        conn.close()
+
+    def close_all(self):
+        """Close every connection. Only call this when no other thread is using the database."""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self.closed += len(connections)
+        for _thread, conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def _prune_dead_threads(self):
+        with self._lock:
+            dead = [ident for ident, (thread, _conn) in self._connections.items() if not thread.is_alive()]
+            conns = [self._connections.pop(ident)[1] for ident in dead]
+            self.closed += len(conns)
+        for conn in conns:
+            conn.close()
+
+    def stats(self):
+        self._prune_dead_threads()
+        with self._lock:
+            requests = self.opened + self.reused
+            return {
+                "open": len(self._connections),
+                "opened": self.opened,
+                "closed": self.closed,
+                "reused": self.reused,
+                "reuse_ratio": self.reused / requests if requests else 0.0,
+            }
+
+
+_manager = ConnectionManager()
+
+
+def configure(path=DB_PATH, cache_size_kb=CACHE_SIZE_KB, mmap_size=MMAP_SIZE):
+    """Point the module at a (possibly different) database file with new tuning.
+
+    Existing connections are closed; the next get_connection() opens a fresh one.
+    """
+    global _manager
+    _manager.close_all()
+    _manager = ConnectionManager(path, cache_size_kb, mmap_size)
+
 
 def get_connection():
-    return sqlite3.connect("users.db")
+    return _manager.connect()
 
-def create_tables():
+
+def close_connections():
+    _manager.close_all()
+
+
+def connection_stats():
+    return _manager.stats()
+
+
+def data_version():
+    """PRAGMA data_version for this thread's connection.
+
+    The value changes only when *another* connection (a worker thread or
+    another process) commits, never for this connection's own writes.
+    """
+    return get_connection().execute("PRAGMA data_version").fetchone()[0]
+
+
+# Bumped after every transaction() that committed changes, from any thread.
+_write_generation = 0
+_generation_lock = threading.Lock()
+
+
+def write_generation():
+    """A counter that moves whenever this process commits a write through transaction()."""
+    return _write_generation
+
+
+def _bump_write_generation():
+    global _write_generation
+    with _generation_lock:
+        _write_generation += 1
+
+
+@contextmanager
+def transaction():
+    """Commit everything done inside the block, or roll it back on error.
+
+    Nested blocks join the outermost transaction. The write lock is taken
+    up front (BEGIN IMMEDIATE): a deferred transaction that reads first
+    fails outright with SQLITE_BUSY_SNAPSHOT when another connection
+    commits before its first write, and busy_timeout cannot retry that.
+    Use read_snapshot() for blocks that only read.
+    """
     conn = get_connection()
+    local = _manager._local
+    if local.depth == 0 and not conn.in_transaction:
+        # An explicit BEGIN keeps DDL inside the transaction as well.
+        conn.execute("BEGIN IMMEDIATE")
+    if local.depth == 0:
+        local.changes_at_begin = conn.total_changes
+    local.depth += 1
+    try:
+        yield conn
+    except BaseException:
+        local.depth -= 1
+        if local.depth == 0:
+            conn.rollback()
+        raise
+    local.depth -= 1
+    if local.depth == 0:
+        conn.commit()
+        if conn.total_changes != local.changes_at_begin:
+            _bump_write_generation()
+
+
+@contextmanager
+def read_snapshot():
+    """Run the block's reads against one consistent snapshot, without taking the write lock.
+
+    Inside a transaction() block this just joins it.
+    """
+    conn = get_connection()
+    if _manager._local.depth or conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+
+def _migration_1_base_schema(conn):
     cursor = conn.cursor()
 
     # Users table
@@ -45,7 +242,7 @@ def create_tables():
     phone TEXT
 );
 """)
-    
+
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS debts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -66,25 +263,678 @@ def create_tables():
             PRIMARY KEY(product_id, store_id)
         )
     ''')
-    # cursor.execute("""DELETE FROM products""")
-    conn.commit()
-    conn.close()
 
-def insert_user(username, email, password):
+
+def _migration_2_hot_path_indexes(conn):
+    # refresh_products sorts on last_updated; debts are looked up and
+    # grouped by client; store listings go through product_stores.store_id.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_last_updated ON products(last_updated)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products(category)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_debts_client_id ON debts(client_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_product_stores_store_id ON product_stores(store_id)")
+
+
+def _migration_3_backfill_last_updated(conn):
+    # Keyset paging compares (last_updated, id) row values, which never
+    # match NULL; give legacy rows an empty timestamp so they sort last.
+    conn.execute("UPDATE products SET last_updated = '' WHERE last_updated IS NULL")
+
+
+def _migration_4_product_thumbnails(conn):
+    conn.execute("ALTER TABLE products ADD COLUMN thumb_path TEXT")
+
+
+def _migration_5_product_search(conn):
+    # External-content FTS5 index over products(name, category), kept in
+    # step by triggers. Builds without FTS5 skip it and search falls back
+    # to LIKE (see services.search).
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE products_fts USING fts5(
+                name, category,
+                content='products', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError as exc:
+        logger.warning("FTS5 unavailable, product search will use LIKE: %s", exc)
+        return
+    conn.execute("""
+        CREATE TRIGGER products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER products_fts_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, category)
+            VALUES ('delete', old.id, old.name, old.category);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER products_fts_au AFTER UPDATE OF name, category ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, category)
+            VALUES ('delete', old.id, old.name, old.category);
+            INSERT INTO products_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+        END
+    """)
+    conn.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def _migration_6_suppliers(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS suppliers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            slug TEXT NOT NULL,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Active',
+            contact TEXT,
+            email TEXT,
+            rating REAL DEFAULT 0,
+            avatar TEXT,
+            color TEXT,
+            address TEXT,
+            date_added TEXT
+        )
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_suppliers_slug ON suppliers(slug)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_suppliers_status ON suppliers(status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_suppliers_category ON suppliers(category)")
+    # The two suppliers SupplierManager used to hard-code.
+    conn.executemany("""
+        INSERT OR IGNORE INTO suppliers
+            (slug, name, category, status, contact, email, rating, avatar, color, address, date_added)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        ('acme_supplies', 'Acme Supplies Ltd.', 'Industrial Equipment & Materials', 'Active',
+         '+1-555-0123', 'acme@supplies.com', 4.2, 'AS', '[0.27, 0.54, 0.96, 1]',
+         '123 Industrial Ave, Manufacturing City', '2024-01-15'),
+        ('global_systems', 'Global Systems Inc.', 'Technology & Software Solutions', 'Active',
+         '+1-555-0456', 'info@globalsystems.com', 4.8, 'GS', '[0.64, 0.42, 0.89, 1]',
+         '456 Tech Boulevard, Silicon Valley', '2024-02-20'),
+    ])
+
+
+def _migration_7_import_checkpoints(conn):
+    # Last committed row of an interrupted CSV import, so it can resume.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            row_number INTEGER NOT NULL,
+            accepted INTEGER NOT NULL,
+            rejected INTEGER NOT NULL,
+            PRIMARY KEY(source, kind)
+        )
+    """)
+
+
+
+def _migration_8_client_balances(conn):
+    # Outstanding debt per client, kept exact by triggers on debts so the
+    # debtors list never has to SUM the whole debt history. debt_count lets
+    # a client whose last debt goes away drop back to exactly 0 instead of
+    # carrying float residue.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS client_balances (
+            client_id INTEGER PRIMARY KEY REFERENCES clients(id) ON DELETE CASCADE,
+            total REAL NOT NULL DEFAULT 0,
+            debt_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_client_balances_total ON client_balances(total)")
+    conn.execute("""
+        CREATE TRIGGER clients_balance_ai AFTER INSERT ON clients BEGIN
+            INSERT OR IGNORE INTO client_balances (client_id) VALUES (new.id);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER debts_balance_ai AFTER INSERT ON debts BEGIN
+            INSERT INTO client_balances (client_id, total, debt_count) VALUES (new.client_id, new.amount, 1)
+            ON CONFLICT(client_id) DO UPDATE SET total = total + new.amount, debt_count = debt_count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER debts_balance_ad AFTER DELETE ON debts BEGIN
+            UPDATE client_balances
+            SET total = CASE WHEN debt_count <= 1 THEN 0 ELSE total - old.amount END,
+                debt_count = MAX(debt_count - 1, 0)
+            WHERE client_id = old.client_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER debts_balance_au AFTER UPDATE OF client_id, amount ON debts BEGIN
+            UPDATE client_balances
+            SET total = CASE WHEN debt_count <= 1 THEN 0 ELSE total - old.amount END,
+                debt_count = MAX(debt_count - 1, 0)
+            WHERE client_id = old.client_id;
+            INSERT INTO client_balances (client_id, total, debt_count) VALUES (new.client_id, new.amount, 1)
+            ON CONFLICT(client_id) DO UPDATE SET total = total + new.amount, debt_count = debt_count + 1;
+        END
+    """)
+    rebuild_client_balances(conn)
+
+
+def rebuild_client_balances(conn):
+    """Recompute every client_balances row from debts (backfill / repair)."""
+    conn.execute("DELETE FROM client_balances")
+    conn.execute("""
+        INSERT INTO client_balances (client_id, total, debt_count)
+        SELECT c.id, IFNULL(SUM(d.amount), 0), COUNT(d.id)
+        FROM clients c LEFT JOIN debts d ON d.client_id = c.id
+        GROUP BY c.id
+    """)
+
+
+def _migration_9_report_rollups(conn):
+    # Dated stock and debt events, written by triggers on products and
+    # debts, and daily rollups maintained from them by a trigger on
+    # report_events. Reports read only the rollups, whose size grows with
+    # days x categories rather than with history. store_id 0 means "not
+    # attributed to a store".
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS report_events (
+            id INTEGER PRIMARY KEY,
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('stock', 'debt')),
+            category TEXT NOT NULL DEFAULT '',
+            store_id INTEGER NOT NULL DEFAULT 0,
+            ref_id INTEGER,
+            delta REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_stock_rollup (
+            day TEXT NOT NULL,
+            category TEXT NOT NULL,
+            store_id INTEGER NOT NULL,
+            stock_in REAL NOT NULL DEFAULT 0,
+            stock_out REAL NOT NULL DEFAULT 0,
+            movements INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, category, store_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_debt_rollup (
+            day TEXT PRIMARY KEY,
+            added REAL NOT NULL DEFAULT 0,
+            settled REAL NOT NULL DEFAULT 0,
+            entries INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER report_events_stock_ai AFTER INSERT ON report_events
+        WHEN new.kind = 'stock' BEGIN
+            INSERT INTO daily_stock_rollup (day, category, store_id, stock_in, stock_out, movements)
+            VALUES (new.day, new.category, new.store_id, MAX(new.delta, 0), MAX(-new.delta, 0), 1)
+            ON CONFLICT(day, category, store_id) DO UPDATE SET
+                stock_in = stock_in + excluded.stock_in,
+                stock_out = stock_out + excluded.stock_out,
+                movements = movements + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER report_events_debt_ai AFTER INSERT ON report_events
+        WHEN new.kind = 'debt' BEGIN
+            INSERT INTO daily_debt_rollup (day, added, settled, entries)
+            VALUES (new.day, MAX(new.delta, 0), MAX(-new.delta, 0), 1)
+            ON CONFLICT(day) DO UPDATE SET
+                added = added + excluded.added,
+                settled = settled + excluded.settled,
+                entries = entries + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER products_report_ai AFTER INSERT ON products
+        WHEN IFNULL(new.stock, 0) != 0 BEGIN
+            INSERT INTO report_events (day, kind, category, ref_id, delta)
+            VALUES (date('now', 'localtime'), 'stock', IFNULL(new.category, ''), new.id, new.stock);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER products_report_au AFTER UPDATE OF stock ON products
+        WHEN IFNULL(new.stock, 0) != IFNULL(old.stock, 0) BEGIN
+            INSERT INTO report_events (day, kind, category, ref_id, delta)
+            VALUES (date('now', 'localtime'), 'stock', IFNULL(new.category, ''), new.id,
+                    IFNULL(new.stock, 0) - IFNULL(old.stock, 0));
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER products_report_ad AFTER DELETE ON products
+        WHEN IFNULL(old.stock, 0) != 0 BEGIN
+            INSERT INTO report_events (day, kind, category, ref_id, delta)
+            VALUES (date('now', 'localtime'), 'stock', IFNULL(old.category, ''), old.id, -old.stock);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER debts_report_ai AFTER INSERT ON debts BEGIN
+            INSERT INTO report_events (day, kind, ref_id, delta)
+            VALUES (date('now', 'localtime'), 'debt', new.client_id, new.amount);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER debts_report_au AFTER UPDATE OF amount ON debts
+        WHEN new.amount != old.amount BEGIN
+            INSERT INTO report_events (day, kind, ref_id, delta)
+            VALUES (date('now', 'localtime'), 'debt', new.client_id, new.amount - old.amount);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER debts_report_ad AFTER DELETE ON debts BEGIN
+            INSERT INTO report_events (day, kind, ref_id, delta)
+            VALUES (date('now', 'localtime'), 'debt', old.client_id, -old.amount);
+        END
+    """)
+    # Existing stock and debts carry no dates; open the history with them
+    # as of today so the rollups reconcile with current totals.
+    conn.execute("""
+        INSERT INTO report_events (day, kind, category, ref_id, delta)
+        SELECT date('now', 'localtime'), 'stock', IFNULL(category, ''), id, stock
+        FROM products WHERE IFNULL(stock, 0) != 0
+    """)
+    conn.execute("""
+        INSERT INTO report_events (day, kind, ref_id, delta)
+        SELECT date('now', 'localtime'), 'debt', client_id, amount FROM debts
+    """)
+
+
+def _migration_10_image_store(conn):
+    # Content-addressed product images (see services.images). refs counts
+    # the products whose image_path points at the blob and is kept exact by
+    # triggers; touched_at gives fresh or just-released blobs a grace
+    # period before garbage collection.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS image_blobs (
+            hash TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            refs INTEGER NOT NULL DEFAULT 0,
+            touched_at REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_image_blobs_unreferenced
+        ON image_blobs(touched_at) WHERE refs <= 0
+    """)
+    conn.execute("""
+        CREATE TRIGGER products_image_ai AFTER INSERT ON products
+        WHEN new.image_path IS NOT NULL BEGIN
+            UPDATE image_blobs SET refs = refs + 1 WHERE path = new.image_path;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER products_image_au AFTER UPDATE OF image_path ON products
+        WHEN new.image_path IS NOT old.image_path BEGIN
+            UPDATE image_blobs SET refs = refs - 1, touched_at = CAST(strftime('%s', 'now') AS REAL)
+            WHERE path = old.image_path;
+            UPDATE image_blobs SET refs = refs + 1 WHERE path = new.image_path;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER products_image_ad AFTER DELETE ON products
+        WHEN old.image_path IS NOT NULL BEGIN
+            UPDATE image_blobs SET refs = refs - 1, touched_at = CAST(strftime('%s', 'now') AS REAL)
+            WHERE path = old.image_path;
+        END
+    """)
+
+
+def _migration_11_product_autocomplete(conn):
+    # Case-insensitive prefix lookups for the Add Debt autocomplete, and
+    # debts linked to the product they were for (NULL for free-text
+    # entries or products since deleted).
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_name_nocase ON products(name COLLATE NOCASE)")
+    conn.execute("ALTER TABLE debts ADD COLUMN product_id INTEGER REFERENCES products(id) ON DELETE SET NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_debts_product_id ON debts(product_id)")
+    conn.execute("""
+        UPDATE debts SET product_id = (
+            SELECT p.id FROM products p
+            WHERE p.name = debts.product COLLATE NOCASE
+            ORDER BY p.id LIMIT 1
+        )
+    """)
+
+
+def _migration_12_store_stock(conn):
+    # Units held per (product, store), maintained by services.stock, and the
+    # append-only ledger of movements behind it. products.stock stays as the
+    # stock not assigned to any store (store 0 in reports).
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS store_stock (
+            product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+            store_id INTEGER NOT NULL REFERENCES stores(id) ON DELETE CASCADE,
+            quantity INTEGER NOT NULL DEFAULT 0 CHECK (quantity >= 0),
+            updated_at TEXT,
+            PRIMARY KEY (product_id, store_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_store_stock_store ON store_stock(store_id, product_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            store_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            reason TEXT,
+            reference TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_item ON stock_movements(product_id, store_id)")
+    conn.execute("""
+        CREATE TRIGGER stock_movements_no_update BEFORE UPDATE ON stock_movements BEGIN
+            SELECT RAISE(ABORT, 'stock_movements is append-only');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER stock_movements_no_delete BEFORE DELETE ON stock_movements BEGIN
+            SELECT RAISE(ABORT, 'stock_movements is append-only');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER stock_movements_report_ai AFTER INSERT ON stock_movements BEGIN
+            INSERT INTO report_events (day, kind, category, store_id, ref_id, delta)
+            VALUES (date('now', 'localtime'), 'stock',
+                    IFNULL((SELECT category FROM products WHERE id = new.product_id), ''),
+                    new.store_id, new.product_id, new.delta);
+        END
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO store_stock (product_id, store_id, quantity)
+        SELECT product_id, store_id, 0 FROM product_stores
+    """)
+
+
+def _migration_13_orders(conn):
+    # Orders reserve store_stock units while pending (see services.orders);
+    # the CHECK keeps reservations within what the store holds. Status
+    # leads the index so "pending orders, newest first" is a range scan.
+    conn.execute(
+        "ALTER TABLE store_stock ADD COLUMN reserved INTEGER NOT NULL DEFAULT 0 "
+        "CHECK (reserved >= 0 AND reserved <= quantity)"
+    )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER REFERENCES clients(id) ON DELETE SET NULL,
+            store_id INTEGER NOT NULL REFERENCES stores(id),
+            status TEXT NOT NULL DEFAULT 'pending'
+                CHECK (status IN ('pending', 'fulfilled', 'cancelled')),
+            line_count INTEGER NOT NULL DEFAULT 0,
+            units INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            note TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status, created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at, id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS order_lines (
+            order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+            line_no INTEGER NOT NULL,
+            product_id INTEGER NOT NULL REFERENCES products(id),
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            unit_price REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (order_id, line_no)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_lines_product ON order_lines(product_id)")
+
+
+def _sync_uid_sql(table, id_expr):
+    """SQL for a row's sync uid: its mapped remote uid, else '<device_id>:<id>'."""
+    return (f"COALESCE((SELECT uid FROM sync_rows WHERE tbl = '{table}' AND row_id = {id_expr}), "
+            f"(SELECT value FROM sync_state WHERE key = 'device_id') || ':' || {id_expr})")
+
+
+# Synced columns per table as of migration 14 (UPDATE OF lists for the
+# change-log triggers). Device-local columns such as image paths are left out.
+_SYNC_TRIGGER_COLUMNS = {
+    'stores': "name, location",
+    'products': "name, stock, category, active, last_updated",
+    'clients': "name, phone",
+    'debts': "client_id, product, amount, product_id",
+    'product_stores': None,
+}
+
+
+def _migration_14_sync_log(conn):
+    # Local writes are recorded for services.sync: sync_rows maps every
+    # synced row to a device-independent uid with a last-writer-wins
+    # version (ms clock, never decreasing per row), change_log lists which
+    # rows changed in order. The sync engine sets sync_state.applying while
+    # it writes pulled changes so they are not logged back as local edits.
+    conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT OR IGNORE INTO sync_state (key, value) VALUES ('device_id', lower(hex(randomblob(8))))")
+    conn.execute("INSERT OR IGNORE INTO sync_state (key, value) VALUES ('applying', '0')")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_rows (
+            tbl TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            row_id INTEGER,
+            version INTEGER NOT NULL,
+            origin TEXT NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tbl, uid)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_rows_row ON sync_rows(tbl, row_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('upsert', 'delete'))
+        )
+    """)
+    # Cursors per sync server: last change_log seq pushed, last server seq pulled.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            peer TEXT PRIMARY KEY,
+            pushed_seq INTEGER NOT NULL DEFAULT 0,
+            pulled_seq INTEGER NOT NULL DEFAULT 0,
+            last_synced TEXT
+        )
+    """)
+    # Pulled changes whose parent rows have not arrived yet.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_deferred (
+            tbl TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            change TEXT NOT NULL,
+            PRIMARY KEY (tbl, uid)
+        ) WITHOUT ROWID
+    """)
+
+    now_ms = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+    device = "(SELECT value FROM sync_state WHERE key = 'device_id')"
+    for table, columns in _SYNC_TRIGGER_COLUMNS.items():
+        events = [('ai', 'AFTER INSERT', 'new', 'upsert', 0),
+                  ('ad', 'AFTER DELETE', 'old', 'delete', 1)]
+        if columns:
+            events.append(('au', f'AFTER UPDATE OF {columns}', 'new', 'upsert', 0))
+        for suffix, event, ref, op, deleted in events:
+            if table == 'product_stores':
+                uid = (f"{_sync_uid_sql('products', ref + '.product_id')} || '|' || "
+                       f"{_sync_uid_sql('stores', ref + '.store_id')}")
+                row_id = "NULL"
+            else:
+                uid = _sync_uid_sql(table, ref + '.id')
+                row_id = ref + '.id'
+            conn.execute(f"""
+                CREATE TRIGGER sync_{table}_{suffix} {event} ON {table}
+                WHEN (SELECT value FROM sync_state WHERE key = 'applying') = '0'
+                BEGIN
+                    INSERT INTO sync_rows (tbl, uid, row_id, version, origin, deleted)
+                    VALUES ('{table}', {uid}, {row_id}, {now_ms}, {device}, {deleted})
+                    ON CONFLICT(tbl, uid) DO UPDATE SET version = MAX(excluded.version, version + 1),
+                        origin = excluded.origin, deleted = excluded.deleted;
+                    INSERT INTO change_log (tbl, uid, op) VALUES ('{table}', {uid}, '{op}');
+                END
+            """)
+
+    # Everything already on this device is pushed on the first sync.
+    for table in ('stores', 'products', 'clients', 'debts'):
+        conn.execute(f"""
+            INSERT OR IGNORE INTO sync_rows (tbl, uid, row_id, version, origin)
+            SELECT '{table}', {device} || ':' || id, id, {now_ms}, {device} FROM {table}
+        """)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO sync_rows (tbl, uid, row_id, version, origin)
+        SELECT 'product_stores', {device} || ':' || product_id || '|' || {device} || ':' || store_id,
+               NULL, {now_ms}, {device}
+        FROM product_stores
+    """)
+    conn.execute("""
+        INSERT INTO change_log (tbl, uid, op)
+        SELECT tbl, uid, 'upsert' FROM sync_rows
+        ORDER BY CASE tbl WHEN 'stores' THEN 0 WHEN 'products' THEN 1 WHEN 'clients' THEN 2
+                          WHEN 'debts' THEN 3 ELSE 4 END, row_id
+    """)
+
+
+def _migration_15_products_version(conn):
+    # A counter that moves with every write to the products columns the
+    # in-memory catalog holds (services.catalog), whichever connection or
+    # process made it, so the catalog can tell cheaply whether it is stale.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            tbl TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO table_versions (tbl, version) VALUES ('products', 0)")
+    bump = "UPDATE table_versions SET version = version + 1 WHERE tbl = 'products';"
+    conn.execute(f"CREATE TRIGGER products_version_ai AFTER INSERT ON products BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER products_version_ad AFTER DELETE ON products BEGIN {bump} END")
+    conn.execute(f"""
+        CREATE TRIGGER products_version_au
+        AFTER UPDATE OF name, category, stock, active, last_updated, thumb_path ON products
+        BEGIN {bump} END
+    """)
+
+
+def _migration_16_order_line_names(conn):
+    # Order lines outlive their products: product_id is cleared when the
+    # product is deleted (as debts.product_id is), and product_name keeps
+    # the name the product had when it was ordered. SQLite cannot change a
+    # foreign key in place, so the table is rebuilt.
+    conn.execute("""
+        CREATE TABLE order_lines_new (
+            order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+            line_no INTEGER NOT NULL,
+            product_id INTEGER REFERENCES products(id) ON DELETE SET NULL,
+            product_name TEXT NOT NULL DEFAULT '',
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            unit_price REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (order_id, line_no)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO order_lines_new (order_id, line_no, product_id, product_name, quantity, unit_price)
+        SELECT l.order_id, l.line_no, l.product_id, IFNULL(p.name, ''), l.quantity, l.unit_price
+        FROM order_lines l LEFT JOIN products p ON p.id = l.product_id
+    """)
+    conn.execute("DROP TABLE order_lines")
+    conn.execute("ALTER TABLE order_lines_new RENAME TO order_lines")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_lines_product ON order_lines(product_id)")
+
+
+# Numbered schema migrations, applied in order. Never edit a shipped
+# migration; append a new one instead.
+MIGRATIONS = [
+    (1, "base schema", _migration_1_base_schema),
+    (2, "hot path indexes", _migration_2_hot_path_indexes),
+    (3, "backfill products.last_updated", _migration_3_backfill_last_updated),
+    (4, "products.thumb_path", _migration_4_product_thumbnails),
+    (5, "products full-text search", _migration_5_product_search),
+    (6, "suppliers table", _migration_6_suppliers),
+    (7, "import checkpoints", _migration_7_import_checkpoints),
+    (8, "client balances", _migration_8_client_balances),
+    (9, "report events and daily rollups", _migration_9_report_rollups),
+    (10, "content-addressed image store", _migration_10_image_store),
+    (11, "product name index and debts.product_id", _migration_11_product_autocomplete),
+    (12, "store stock and movement ledger", _migration_12_store_stock),
+    (13, "orders and stock reservations", _migration_13_orders),
+    (14, "sync change log", _migration_14_sync_log),
+    (15, "products version counter", _migration_15_products_version),
+    (16, "order lines keep product names", _migration_16_order_line_names),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate():
+    """Bring the schema up to SCHEMA_VERSION.
+
+    Each pending migration runs in its own transaction together with the
+    user_version bump, and its duration is recorded in schema_migrations.
+    Returns a list of (version, name, duration_ms) for what was applied.
+    """
+    current = schema_version()
+    if current >= SCHEMA_VERSION:
+        return []
+
+    applied = []
+    for version, name, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        started = time.perf_counter()
+        with transaction() as conn:
+            apply(conn)
+            duration_ms = (time.perf_counter() - started) * 1000
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TEXT NOT NULL,
+                    duration_ms REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "INSERT OR REPLACE INTO schema_migrations (version, name, applied_at, duration_ms) "
+                "VALUES (?, ?, datetime('now'), ?)",
+                (version, name, duration_ms)
+            )
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        logger.info("Applied migration %d (%s) in %.1f ms", version, name, duration_ms)
+        applied.append((version, name, duration_ms))
+    return applied
+
+
+def migration_history():
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
-                   (username, email, password))
-    conn.commit()
-    conn.close()
+    if schema_version() == 0:
+        return []
+    return conn.execute(
+        "SELECT version, name, applied_at, duration_ms FROM schema_migrations ORDER BY version"
+    ).fetchall()
+
+
+def create_tables():
+    migrate()
+
+
+def insert_user(username, email, password):
+    with transaction() as conn:
+        conn.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                     (username, email, password))
 
 
 def get_user_by_email(email):
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email=?", (email,))
+    cursor = conn.execute("SELECT * FROM users WHERE email=?", (email,))
     return cursor.fetchone()
 
 
 if __name__ == "__main__":
-    create_tables()
\ No newline at end of file
+    create_tables()
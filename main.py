@@ -1,72 +1,98 @@
+import time
+
+_launch = time.perf_counter()
+
 from kivymd.app import MDApp
 from kivy.uix.widget import Widget
 from kivy.properties import ObjectProperty
 from kivy.uix.popup import Popup
 from kivy.uix.label import Label
 from kivy.lang import Builder
+from kivy.clock import Clock
 from kivy.uix.screenmanager import Screen, ScreenManager
 import sqlite3
 from configs import show_popup
 
 
 # ===== SCREEN CLASSES =====
-from screens.login_screen import LoginScreen
-from screens.register_screen import RegisterScreen
-from screens.dashboard_screen import DashboardScreen
-from screens.products_screen import ProductsScreen
-from screens.stores_screen import StoresScreen
-from screens.orders_screen import OrdersScreen
-from screens.suppliers_screen import SuppliersScreen
-from screens.reports_screen import ReportsScreen
-from screens.settings_screen import SettingsScreen
-from screens.add_product_screen import AddProductScreen
-from screens.edit_product_screen import EditProductScreen
-from screens.debtors_screen import DebtorsScreen
+# Screens are imported, parsed and built on first navigation (see screens.registry).
+from screens.registry import LazyScreenManager, timeline
+from kivy.logger import Logger
+import db
 from db import create_tables
+# The other services pull in PIL and requests; they are imported once the
+# login screen is up (see MyApp._start_background).
+from services import executor, instrumentation
+
+timeline.record('import', 'main', _launch)
+
+# Seconds after on_start before background work (and its imports) starts,
+# so the login screen gets its first frames first.
+BACKGROUND_START_DELAY = 0.5
 
 
-class MyScreenManager(ScreenManager):
+class MyScreenManager(LazyScreenManager):
     pass
 
 # ===== MAIN APP =====
 class MyApp(MDApp):
+    # Screens built in idle frames after the login screen is up; empty to disable.
+    prewarm_screens = ('dashboard', 'products')
+
     def build(self):
+        # my.kv (CommonHeader and other shared rules) is loaded by App.load_kv
+        # before build() runs.
+        started = time.perf_counter()
         create_tables()
-        Builder.load_file("kv/login.kv")
-        Builder.load_file("kv/dashboard.kv")
-        Builder.load_file("kv/products.kv")
-        Builder.load_file("kv/stores.kv")
-        Builder.load_file("kv/orders.kv")
-        Builder.load_file("kv/suppliers.kv")
-        Builder.load_file("kv/reports.kv")
-        Builder.load_file("kv/settings.kv")
-        Builder.load_file("kv/add_product.kv")
-        Builder.load_file("kv/edit_product.kv")
-        Builder.load_file("kv/debtors.kv")
+        timeline.record('db', 'migrate', started)
 
+        # Dialog, RecycleView and frame timings; recorded only once enabled
+        # from Settings or with INVENTORY_INSTRUMENT=1.
+        instrumentation.install_ui_hooks()
 
         self.load_sample_data()
         sm = MyScreenManager()
-        sm.add_widget(LoginScreen(name="login"))
-        sm.add_widget(RegisterScreen(name="register"))
-        sm.add_widget(DashboardScreen(name="dashboard"))
-        sm.add_widget(ProductsScreen(name="products"))
-        sm.add_widget(StoresScreen(name="stores"))
-        sm.add_widget(OrdersScreen(name="orders"))
-        sm.add_widget(SuppliersScreen(name="suppliers"))
-        sm.add_widget(ReportsScreen(name="reports"))
-        sm.add_widget(SettingsScreen(name="settings"))
-        sm.add_widget(AddProductScreen(name="add_product"))
-        sm.add_widget(EditProductScreen(name="edit_product"))
-        sm.add_widget(DebtorsScreen(name="debtors"))
-
-        Builder.load_file("my.kv")
-
+        sm.current = "login"
         return sm
 
     def load_sample_data(self):
         pass
 
+    def on_start(self):
+        timeline.log()
+        self.root.prewarm(self.prewarm_screens)
+        Clock.schedule_once(self._start_background, BACKGROUND_START_DELAY)
+
+    def _start_background(self, dt):
+        from services import images, stock, sync, thumbnails
+
+        # Products added before thumbnails existed get theirs in the background.
+        executor.submit(thumbnails.generate_missing_thumbnails)
+        # Reclaim image blobs no product points at any more.
+        executor.submit(images.collect_garbage)
+        # Check per-store stock levels against the movement ledger now and then.
+        self._reconcile_stock(0)
+        Clock.schedule_interval(self._reconcile_stock, stock.RECONCILE_INTERVAL)
+        # Exchange changes with the sync server, if INVENTORY_SYNC_URL names one.
+        if sync.server_url():
+            self.sync_now(0)
+            Clock.schedule_interval(self.sync_now, sync.SYNC_INTERVAL)
+
+    def _reconcile_stock(self, dt):
+        from services import stock
+
+        executor.submit(stock.reconcile, group="reconcile")
+
+    def sync_now(self, dt=None, on_result=None, on_error=None):
+        from services import sync
+
+        executor.submit(sync.sync, on_result=on_result, on_error=on_error, group="sync")
+
+    def on_stop(self):
+        executor.executor.shutdown()
+        Logger.info("DB: connection stats %s", db.connection_stats())
+        db.close_connections()
+
     def logout(self):
         self.root.current = "login"
         screen = self.root.get_screen("login")
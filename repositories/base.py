@@ -0,0 +1,43 @@
+from collections.abc import Mapping
+
+import db
+
+
+class Record(Mapping):
+    """Base for the slot-based row records.
+
+    A record is also a read-only mapping over its slots, so a list of
+    records can be handed to a RecycleView as its data: the view reads
+    items through .get() and .items() and gets one attribute per slot,
+    without a dict being built for every row.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+def fetch_all(sql, params, factory):
+    """Run a fixed statement and build each row with factory(cursor, row) as it is fetched."""
+    cursor = db.get_connection().cursor()
+    cursor.row_factory = factory
+    return cursor.execute(sql, params).fetchall()
+
+
+def fetch_one(sql, params, factory):
+    cursor = db.get_connection().cursor()
+    cursor.row_factory = factory
+    return cursor.execute(sql, params).fetchone()
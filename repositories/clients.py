@@ -0,0 +1,54 @@
+import db
+from repositories.base import Record, fetch_all, fetch_one
+
+
+class Client(Record):
+    __slots__ = ('client_id', 'name', 'phone', 'total_debt')
+
+    def __init__(self, client_id, name, phone, total_debt=0.0):
+        self.client_id = client_id
+        self.name = name
+        self.phone = phone
+        self.total_debt = total_debt
+
+
+def _row(cursor, row):
+    return Client(*row)
+
+
+class ClientRepository:
+    # Totals come from client_balances, which triggers on debts keep exact.
+    ALL = """
+        SELECT c.id, c.name, c.phone, IFNULL(b.total, 0)
+        FROM clients c
+        LEFT JOIN client_balances b ON b.client_id = c.id
+    """
+    GET = ALL + " WHERE c.id = ?"
+    TOP_DEBTORS = """
+        SELECT c.id, c.name, c.phone, b.total
+        FROM client_balances b
+        JOIN clients c ON c.id = b.client_id
+        WHERE b.total > 0
+        ORDER BY b.total DESC
+        LIMIT ?
+    """
+    INSERT = "INSERT INTO clients (name, phone) VALUES (?, ?)"
+
+    def all(self):
+        """Every client with its current balance."""
+        return fetch_all(self.ALL, (), _row)
+
+    def get(self, client_id):
+        return fetch_one(self.GET, (client_id,), _row)
+
+    def top_debtors(self, limit):
+        """The clients owing the most, largest balance first."""
+        return fetch_all(self.TOP_DEBTORS, (limit,), _row)
+
+    def add(self, name, phone=None):
+        with db.transaction() as conn:
+            client_id = conn.execute(self.INSERT, (name, phone)).lastrowid
+        return Client(client_id, name, phone, 0.0)
+
+
+client_repository = ClientRepository()
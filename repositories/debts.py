@@ -0,0 +1,38 @@
+import db
+from repositories.base import Record, fetch_all
+
+
+class Debt(Record):
+    __slots__ = ('debt_id', 'client_id', 'product', 'amount', 'product_id')
+
+    def __init__(self, debt_id, client_id, product, amount, product_id=None):
+        self.debt_id = debt_id
+        self.client_id = client_id
+        self.product = product
+        self.amount = amount
+        self.product_id = product_id
+
+
+def _row(cursor, row):
+    return Debt(*row)
+
+
+class DebtRepository:
+    FOR_CLIENT = "SELECT id, client_id, product, amount, product_id FROM debts WHERE client_id = ?"
+    INSERT = "INSERT INTO debts (client_id, product, amount, product_id) VALUES (?, ?, ?, ?)"
+    DELETE = "DELETE FROM debts WHERE id = ?"
+
+    def for_client(self, client_id):
+        return fetch_all(self.FOR_CLIENT, (client_id,), _row)
+
+    def add(self, client_id, product, amount, product_id=None):
+        with db.transaction() as conn:
+            debt_id = conn.execute(self.INSERT, (client_id, product, amount, product_id)).lastrowid
+        return Debt(debt_id, client_id, product, amount, product_id)
+
+    def delete(self, debt_id):
+        with db.transaction() as conn:
+            conn.execute(self.DELETE, (debt_id,))
+
+
+debt_repository = DebtRepository()
@@ -0,0 +1,121 @@
+import json
+
+import db
+from repositories.base import Record, fetch_all, fetch_one
+
+
+class Product(Record):
+    __slots__ = ('product_id', 'name', 'category', 'stock', 'active', 'last_updated',
+                 'thumb_path', 'image_path', 'sort_key')
+
+    def __init__(self, product_id, name, category, stock, active, last_updated,
+                 thumb_path='', image_path=None, sort_key=None):
+        self.product_id = product_id
+        self.name = name
+        self.category = category
+        self.stock = stock
+        self.active = active
+        self.last_updated = last_updated
+        self.thumb_path = thumb_path
+        self.image_path = image_path
+        self.sort_key = sort_key
+
+
+# Columns of a list row; ranked queries append a score.
+LIST_COLUMNS = "id, name, category, stock, active, last_updated, thumb_path"
+
+
+def latest_row(cursor, row):
+    """Row factory for list queries, keyed on (last_updated, id)."""
+    product_id, name, category, stock, active, last_updated, thumb_path = row
+    return Product(product_id, name, category, stock, active, last_updated,
+                   thumb_path or '', None, (last_updated, product_id))
+
+
+def ranked_row(cursor, row):
+    """Row factory for list queries with a trailing score, keyed on (score, id)."""
+    product_id, name, category, stock, active, last_updated, thumb_path, score = row
+    return Product(product_id, name, category, stock, active, last_updated,
+                   thumb_path or '', None, (score, product_id))
+
+
+def _full_row(cursor, row):
+    product_id, name, category, stock, active, last_updated, thumb_path, image_path = row
+    return Product(product_id, name, category, stock, active, last_updated, thumb_path or '', image_path)
+
+
+class ProductRepository:
+    """Product reads and writes. Statement text never varies, so each hits the statement cache."""
+
+    FIRST_PAGE = f"SELECT {LIST_COLUMNS} FROM products ORDER BY last_updated DESC, id DESC LIMIT ?"
+    PAGE_AFTER = (f"SELECT {LIST_COLUMNS} FROM products WHERE (last_updated, id) < (?, ?) "
+                  "ORDER BY last_updated DESC, id DESC LIMIT ?")
+    PAGE_BEFORE = (f"SELECT {LIST_COLUMNS} FROM products WHERE (last_updated, id) > (?, ?) "
+                   "ORDER BY last_updated ASC, id ASC LIMIT ?")
+    # One statement for any number of ids: they travel as a JSON array.
+    BY_IDS = f"SELECT {LIST_COLUMNS} FROM products WHERE id IN (SELECT value FROM json_each(?))"
+    GET = f"SELECT {LIST_COLUMNS}, image_path FROM products WHERE id = ?"
+    INSERT = ("INSERT INTO products (name, stock, category, active, last_updated, image_path) "
+              "VALUES (?, ?, ?, ?, ?, ?)")
+    UPDATE_DETAILS = "UPDATE products SET name = ?, category = ? WHERE id = ?"
+    DELETE_STORE_LINKS = "DELETE FROM product_stores WHERE product_id = ?"
+    DELETE = "DELETE FROM products WHERE id = ?"
+
+    def __init__(self):
+        self._write_listeners = []
+
+    def add_write_listener(self, callback):
+        """callback(product_id) runs on the writing thread after each add, update_details or delete."""
+        self._write_listeners.append(callback)
+
+    def _written(self, product_id):
+        for callback in self._write_listeners:
+            callback(product_id)
+
+    def first_page(self, limit):
+        return fetch_all(self.FIRST_PAGE, (limit,), latest_row)
+
+    def page_after(self, key, limit):
+        """Rows that sort after key = (last_updated, id), newest first."""
+        return fetch_all(self.PAGE_AFTER, (key[0], key[1], limit), latest_row)
+
+    def page_before(self, key, limit):
+        """Rows that sort just before key = (last_updated, id), returned newest first."""
+        rows = fetch_all(self.PAGE_BEFORE, (key[0], key[1], limit), latest_row)
+        rows.reverse()
+        return rows
+
+    def fetch_many(self, product_ids):
+        """List rows for specific products, keyed by id (missing ids are absent)."""
+        if not product_ids:
+            return {}
+        rows = fetch_all(self.BY_IDS, (json.dumps(list(product_ids)),), latest_row)
+        return {row.product_id: row for row in rows}
+
+    def get(self, product_id):
+        return fetch_one(self.GET, (product_id,), _full_row)
+
+    def add(self, name, stock, category, active, last_updated, image_path=None):
+        with db.transaction() as conn:
+            product_id = conn.execute(
+                self.INSERT, (name, stock, category, active, last_updated, image_path)).lastrowid
+        self._written(product_id)
+        return product_id
+
+    def update_details(self, product_id, name, category):
+        """Rename/recategorise a product; returns the Product as it was before (None if gone)."""
+        with db.transaction() as conn:
+            previous = self.get(product_id)
+            conn.execute(self.UPDATE_DETAILS, (name, category, product_id))
+        self._written(product_id)
+        return previous
+
+    def delete(self, product_id):
+        # foreign_keys is on, so drop the store links before the product itself
+        with db.transaction() as conn:
+            conn.execute(self.DELETE_STORE_LINKS, (product_id,))
+            conn.execute(self.DELETE, (product_id,))
+        self._written(product_id)
+
+
+product_repository = ProductRepository()
@@ -0,0 +1,40 @@
+import db
+from repositories.base import Record, fetch_all, fetch_one
+
+
+class Store(Record):
+    __slots__ = ('store_id', 'name', 'location')
+
+    def __init__(self, store_id, name, location):
+        self.store_id = store_id
+        self.name = name
+        self.location = location
+
+
+def _row(cursor, row):
+    return Store(*row)
+
+
+class StoreRepository:
+    ALL = "SELECT id, name, location FROM stores ORDER BY name COLLATE NOCASE, id"
+    GET = "SELECT id, name, location FROM stores WHERE id = ?"
+    FIND = "SELECT id, name, location FROM stores WHERE name = ? COLLATE NOCASE ORDER BY id LIMIT 1"
+    INSERT = "INSERT INTO stores (name, location) VALUES (?, ?)"
+
+    def all(self):
+        return fetch_all(self.ALL, (), _row)
+
+    def get(self, store_id):
+        return fetch_one(self.GET, (store_id,), _row)
+
+    def find(self, name):
+        """The store with exactly this name (ignoring case), or None."""
+        return fetch_one(self.FIND, (name,), _row)
+
+    def add(self, name, location):
+        with db.transaction() as conn:
+            store_id = conn.execute(self.INSERT, (name, location)).lastrowid
+        return Store(store_id, name, location)
+
+
+store_repository = StoreRepository()
@@ -5,9 +5,9 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from datetime import datetime
-import sqlite3
-import shutil
 import os
+from repositories.products import product_repository
+from services import executor, images, products
 
 class AddProductScreen(Screen):
     selected_image_path = None
@@ -51,29 +51,15 @@ class AddProductScreen(Screen):
             self.show_popup("Error", "Please fill all fields correctly.")
             return
 
-        image_db_path = None
-        if self.selected_image_path:
-            images_dir = os.path.join(os.getcwd(), 'product_images')
-            os.makedirs(images_dir, exist_ok=True)
-
-            filename = f"{int(datetime.timestamp(datetime.now()))}_{os.path.basename(self.selected_image_path)}"
-            dest_path = os.path.join(images_dir, filename)
+        product_id = product_repository.add(name, int(stock), category, active, last_updated)
 
-            try:
-                shutil.copy(self.selected_image_path, dest_path)
-                image_db_path = dest_path
-            except Exception as e:
-                self.show_popup("Error", f"Failed to copy image: {e}")
-                return
-
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO products (name, stock, category, active, last_updated, image_path) VALUES (?, ?, ?, ?, ?, ?)",
-            (name, int(stock), category, active, last_updated, image_db_path)
-        )
-        conn.commit()
-        conn.close()
+        products.changes.mark(product_id, "insert")
+        if self.selected_image_path:
+            # Hashing and copying a large photo happens on the worker; the
+            # row shows the default image until it is attached.
+            executor.submit(images.attach_to_product, product_id, self.selected_image_path,
+                            on_result=lambda path: products.changes.mark_worker_write(product_id),
+                            on_error=lambda error: self.show_popup("Error", f"Failed to store image: {error}"))
 
         self.show_popup("Success", "Product added successfully!")
         self.clear_fields()
@@ -1,5 +1,42 @@
-# screens/login_screen.py
+from kivy.properties import BooleanProperty, NumericProperty
 from kivy.uix.screenmanager import Screen
 
+from configs import show_popup
+from services import executor
+from services.metrics import metrics_cache
+
+
 class DashboardScreen(Screen):
-    pass
+    loading = BooleanProperty(False)
+    total_products = NumericProperty(0)
+    active_products = NumericProperty(0)
+    low_stock = NumericProperty(0)
+    store_count = NumericProperty(0)
+    active_stores = NumericProperty(0)
+    outstanding_debt = NumericProperty(0)
+
+    def on_enter(self):
+        self.refresh_metrics()
+
+    def on_leave(self):
+        executor.cancel_group(self.name)
+        self.loading = False
+
+    def refresh_metrics(self):
+        cached = metrics_cache.cached()
+        if cached is not None:
+            self._show_metrics(cached)
+            return
+        executor.cancel_group(self.name)
+        self.loading = True
+        executor.submit(metrics_cache.get, on_result=self._show_metrics,
+                        on_error=self._load_failed, group=self.name)
+
+    def _show_metrics(self, metrics):
+        self.loading = False
+        for name, value in metrics.items():
+            setattr(self, name, value)
+
+    def _load_failed(self, error):
+        self.loading = False
+        show_popup("Error", f"Could not load dashboard metrics: {error}")
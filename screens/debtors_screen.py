@@ -7,31 +7,71 @@ from kivymd.uix.textfield import MDTextField
 from kivymd.uix.menu import MDDropdownMenu
 from kivy.metrics import dp
 from kivy.app import App
-import sqlite3
+from kivy.clock import Clock
+from kivy.properties import BooleanProperty, NumericProperty, OptionProperty, StringProperty
+from configs import show_popup, start_export, start_import
+from repositories.clients import client_repository
+from repositories.debts import debt_repository
+from services import clients, executor, products
+
+
+class ClientRow(MDBoxLayout):
+    """One clients_rv row; its data item is a repositories.clients.Client record."""
+    client_id = NumericProperty(0)
+    name = StringProperty()
+    phone = StringProperty(allownone=True)
+    total_debt = NumericProperty(0)
 
 
 class DebtorsScreen(Screen):
+    loading = BooleanProperty(False)
+    sort_mode = OptionProperty('name', options=clients.SORT_MODES)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Client records (clients_rv's data), kept so sorting and single-client updates need no query.
+        self._clients = []
+
     def on_enter(self):
         self.refresh_clients()
 
+    def on_leave(self):
+        executor.cancel_group(self.name)
+        self.loading = False
+
     def refresh_clients(self):
-        self.ids.clients_list.clear_widgets()
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT c.id, c.name, c.phone, IFNULL(SUM(d.amount), 0)
-            FROM clients c
-            LEFT JOIN debts d ON c.id = d.client_id
-            GROUP BY c.id
-        """)
-        for client_id, name, phone, total_debt in cursor.fetchall():
-            item = OneLineAvatarIconListItem(
-                text=f"{name} ({phone or 'No phone'}) - Debt: ${total_debt:.2f}"
-            )
-            icon = IconRightWidget(icon="eye", on_release=lambda x, cid=client_id: self.open_manage_debts(cid))
-            item.add_widget(icon)
-            self.ids.clients_list.add_widget(item)
-        conn.close()
+        executor.cancel_group(self.name)
+        self.loading = True
+        executor.submit(self._load_clients, on_result=self._show_clients,
+                        on_error=self._load_failed, group=self.name)
+
+    @staticmethod
+    def _load_clients():
+        return clients.fetch_clients()
+
+    def _show_clients(self, data):
+        self.loading = False
+        self._clients = data
+        self._publish()
+
+    def _publish(self):
+        clients.sort_client_rows(self._clients, self.sort_mode)
+        self.ids.clients_rv.data = list(self._clients)
+
+    def on_sort_mode(self, instance, value):
+        self._publish()
+
+    def _update_client(self, client_id):
+        """Re-read one client's balance and patch its row."""
+        client = clients.fetch_client(client_id)
+        self._clients = [item for item in self._clients if item.client_id != client_id]
+        if client is not None:
+            self._clients.append(client)
+        self._publish()
+
+    def _load_failed(self, error):
+        self.loading = False
+        show_popup("Error", f"Could not load clients: {error}")
 
     def open_add_client_dialog(self):
         self.client_name = MDTextField(hint_text="Client Name")
@@ -58,30 +98,20 @@ class DebtorsScreen(Screen):
         if not name:
             return
 
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO clients (name, phone) VALUES (?, ?)", (name, phone or None))
-        conn.commit()
-        conn.close()
+        client = client_repository.add(name, phone or None)
 
         self.add_client_dialog.dismiss()
-        self.refresh_clients()
+        self._clients.append(client)
+        self._publish()
 
     def open_manage_debts(self, client_id):
         self.current_client_id = client_id
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM clients WHERE id=?", (client_id,))
-        client_name = cursor.fetchone()[0]
-
-        cursor.execute("SELECT id, product, amount FROM debts WHERE client_id=?", (client_id,))
-        debts = cursor.fetchall()
-        conn.close()
+        client_name, debts = clients.fetch_client_debts(client_id)
 
         self.debt_list_layout = MDBoxLayout(orientation="vertical", spacing=dp(5), size_hint_y=None)
-        for debt_id, product, amount in debts:
-            row = OneLineAvatarIconListItem(text=f"{product} - ${amount:.2f}")
-            del_icon = IconRightWidget(icon="delete", on_release=lambda x, did=debt_id: self.delete_debt(did))
+        for debt in debts:
+            row = OneLineAvatarIconListItem(text=f"{debt.product} - ${debt.amount:.2f}")
+            del_icon = IconRightWidget(icon="delete", on_release=lambda x, did=debt.debt_id: self.delete_debt(did))
             row.add_widget(del_icon)
             self.debt_list_layout.add_widget(row)
 
@@ -97,21 +127,13 @@ class DebtorsScreen(Screen):
         self.manage_debts_dialog.open()
 
     def open_add_debt_dialog(self):
-        # Load products from DB
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM products")
-        products = [p[0] for p in cursor.fetchall()]
-        conn.close()
-
-        self.product_field = MDTextField(hint_text="Product")
+        self.product_field = MDTextField(hint_text="Product (type to search)")
         self.amount_field = MDTextField(hint_text="Amount", input_filter="float")
+        self.product_menu = None
+        self.selected_product = None  # (id, name) picked from the suggestions
 
-        # Dropdown menu for products
-        menu_items = [{"text": p, "on_release": lambda x=p: self.set_product(x)} for p in products]
-        self.product_menu = MDDropdownMenu(caller=self.product_field, items=menu_items, width_mult=4)
-
-        self.product_field.bind(on_focus=lambda inst, val: self.product_menu.open() if val else None)
+        self._autocomplete_trigger = Clock.create_trigger(self._lookup_products, products.AUTOCOMPLETE_DEBOUNCE)
+        self.product_field.bind(text=lambda inst, text: self._autocomplete_trigger())
 
         self.add_debt_dialog = MDDialog(
             title="Add Debt",
@@ -125,9 +147,35 @@ class DebtorsScreen(Screen):
                 MDRaisedButton(text="Save", on_release=lambda x: self.save_debt())
             ]
         )
+        self.add_debt_dialog.bind(on_dismiss=self._add_debt_dismissed)
         self.add_debt_dialog.open()
 
-    def set_product(self, product_name):
+    def _add_debt_dismissed(self, *args):
+        self._autocomplete_trigger.cancel()
+        executor.cancel_group("add_debt")
+        if self.product_menu:
+            self.product_menu.dismiss()
+
+    def _lookup_products(self, dt):
+        text = self.product_field.text
+        if self.selected_product and text == self.selected_product[1]:
+            return
+        executor.cancel_group("add_debt")
+        executor.submit(products.autocomplete.complete, text, on_result=self._set_product_menu, group="add_debt")
+
+    def _set_product_menu(self, suggestions):
+        if self.product_menu:
+            self.product_menu.dismiss()
+            self.product_menu = None
+        if not suggestions:
+            return
+        menu_items = [{"text": name, "on_release": lambda x=(product_id, name): self.set_product(*x)}
+                      for product_id, name in suggestions]
+        self.product_menu = MDDropdownMenu(caller=self.product_field, items=menu_items, width_mult=4)
+        self.product_menu.open()
+
+    def set_product(self, product_id, product_name):
+        self.selected_product = (product_id, product_name)
         self.product_field.text = product_name
         self.product_menu.dismiss()
 
@@ -141,22 +189,29 @@ class DebtorsScreen(Screen):
         if not product or amount <= 0:
             return
 
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO debts (client_id, product, amount) VALUES (?, ?, ?)",
-                       (self.current_client_id, product, amount))
-        conn.commit()
-        conn.close()
+        if self.selected_product and self.selected_product[1] == product:
+            product_id = self.selected_product[0]
+        else:
+            product_id = products.find_product_id(product)
+
+        debt_repository.add(self.current_client_id, product, amount, product_id)
 
         self.add_debt_dialog.dismiss()
         self.manage_debts_dialog.dismiss()
+        self._update_client(self.current_client_id)
         self.open_manage_debts(self.current_client_id)
 
     def delete_debt(self, debt_id):
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM debts WHERE id=?", (debt_id,))
-        conn.commit()
-        conn.close()
+        debt_repository.delete(debt_id)
         self.manage_debts_dialog.dismiss()
+        self._update_client(self.current_client_id)
         self.open_manage_debts(self.current_client_id)
+
+    def export_debts(self):
+        start_export('debts')
+
+    def import_clients(self):
+        start_import('clients', on_done=lambda report: self.refresh_clients())
+
+    def import_debts(self):
+        start_import('debts', on_done=lambda report: self.refresh_clients())
@@ -1,4 +1,150 @@
 from kivy.uix.screenmanager import Screen
+from kivy.uix.boxlayout import BoxLayout
+from kivy.properties import BooleanProperty, DictProperty, NumericProperty, StringProperty
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.dialog import MDDialog
+from kivymd.uix.button import MDFlatButton, MDRaisedButton
+from kivymd.uix.textfield import MDTextField
+from kivy.metrics import dp
+from configs import show_popup
+from services import executor, orders, products
+
+
+class OrderRow(BoxLayout):
+    order_id = NumericProperty(0)
+    title = StringProperty()
+    detail = StringProperty()
+    status = StringProperty()
+
 
 class OrdersScreen(Screen):
-    pass
\ No newline at end of file
+    loading = BooleanProperty(False)
+    at_end = BooleanProperty(False)
+    # '' lists every order; otherwise one of orders.STATUSES.
+    status_filter = StringProperty('pending')
+    counts = DictProperty({})
+    # How close (as a scroll fraction) to the bottom of orders_rv the next page is fetched.
+    prefetch_threshold = 0.15
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._page_request = None
+        self._next_key = None
+
+    def on_kv_post(self, base_widget):
+        self.ids.orders_rv.bind(scroll_y=self._on_scroll)
+
+    def on_enter(self):
+        self.refresh_orders()
+
+    def on_leave(self):
+        executor.cancel_group(self.name)
+        self._page_request = None
+        self.loading = False
+
+    def on_status_filter(self, instance, value):
+        if self.manager is not None:
+            self.refresh_orders()
+
+    def refresh_orders(self):
+        executor.cancel_group(self.name)
+        self.loading = True
+        self.at_end = False
+        self._page_request = executor.submit(
+            self._load_page, self.status_filter, None, with_counts=True,
+            on_result=self._show_first_page, on_error=self._load_failed, group=self.name)
+
+    @staticmethod
+    def _load_page(status, after, with_counts=False):
+        rows = orders.fetch_page(status or None, after, orders.PAGE_SIZE)
+        counts = orders.status_counts() if with_counts else None
+        return rows, orders.build_order_rows(rows), counts
+
+    def _show_first_page(self, result):
+        rows, data, counts = result
+        self.counts = counts
+        self.ids.orders_rv.data = data
+        self.ids.orders_rv.scroll_y = 1
+        self._page_loaded(rows)
+
+    def _show_next_page(self, result):
+        rows, data, _counts = result
+        self.ids.orders_rv.data = self.ids.orders_rv.data + data
+        self._page_loaded(rows)
+
+    def _page_loaded(self, rows):
+        self._page_request = None
+        self.loading = False
+        self.at_end = len(rows) < orders.PAGE_SIZE
+        self._next_key = orders.page_key(rows[-1]) if rows else None
+
+    def _on_scroll(self, rv, scroll_y):
+        if self._page_request is not None or self.at_end or not rv.data:
+            return
+        if scroll_y <= self.prefetch_threshold:
+            self._page_request = executor.submit(
+                self._load_page, self.status_filter, self._next_key,
+                on_result=self._show_next_page, on_error=self._load_failed, group=self.name)
+
+    def _load_failed(self, error):
+        self._page_request = None
+        self.loading = False
+        show_popup("Error", f"Could not load orders: {error}")
+
+    def fulfil_order(self, order_id):
+        executor.submit(orders.fulfil_order, order_id, on_result=lambda _r: self.refresh_orders(),
+                        on_error=self._action_failed, group="order_action")
+
+    def cancel_order(self, order_id):
+        executor.submit(orders.cancel_order, order_id, on_result=lambda _r: self.refresh_orders(),
+                        on_error=self._action_failed, group="order_action")
+
+    def _action_failed(self, error):
+        show_popup("Order", str(error))
+        self.refresh_orders()
+
+    def open_new_order_dialog(self):
+        self.store_field = MDTextField(hint_text="Store name")
+        self.lines_field = MDTextField(hint_text="One line per product: 3 x Product name", multiline=True)
+
+        self.new_order_dialog = MDDialog(
+            title="New Order",
+            type="custom",
+            content_cls=MDBoxLayout(
+                self.store_field, self.lines_field,
+                orientation="vertical", spacing=dp(10), size_hint_y=None, height=dp(200)
+            ),
+            buttons=[
+                MDFlatButton(text="Cancel", on_release=lambda x: self.new_order_dialog.dismiss()),
+                MDRaisedButton(text="Save", on_release=lambda x: self.save_order())
+            ]
+        )
+        self.new_order_dialog.open()
+
+    def save_order(self):
+        store = self.store_field.text.strip()
+        lines = orders.parse_lines(self.lines_field.text)
+        if not store or not lines:
+            return
+        executor.submit(self._create_order, store, lines, on_result=self._order_created,
+                        on_error=lambda error: show_popup("Order", str(error)), group="new_order")
+
+    @staticmethod
+    def _create_order(store, lines):
+        store_id = orders.find_store_id(store)
+        if store_id is None:
+            raise orders.OrderError(f"no store named {store!r}")
+        resolved = []
+        for name, quantity in lines:
+            product_id = products.find_product_id(name)
+            if product_id is None:
+                raise orders.OrderError(f"no product named {name!r}")
+            resolved.append((product_id, quantity))
+        return orders.create_order(store_id, resolved)
+
+    def _order_created(self, order_id):
+        self.new_order_dialog.dismiss()
+        if self.status_filter == 'pending':
+            self.refresh_orders()
+        else:
+            self.status_filter = 'pending'  # on_status_filter refreshes
@@ -7,10 +7,13 @@ from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.boxlayout import BoxLayout
 from kivy.app import App
-from kivy.properties import DictProperty, NumericProperty, StringProperty
-import sqlite3
+from kivy.clock import Clock
+from kivy.properties import BooleanProperty, DictProperty, NumericProperty, StringProperty
 import os
-from configs import show_popup
+from repositories.products import product_repository
+from services import catalog, executor, images, products, search
+from services.thumbnails import texture_cache
+from configs import show_popup, start_export, start_import
 from kivymd.uix.textfield import MDTextField
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.boxlayout import MDBoxLayout
@@ -18,6 +21,8 @@ from kivymd.uix.button import MDFlatButton
 from kivy.metrics import dp
 from kivy.uix.image import Image
 from kivy.uix.scrollview import ScrollView
+from kivy.uix.checkbox import CheckBox
+from kivy.uix.togglebutton import ToggleButton
 
 
 
@@ -31,8 +36,9 @@ class ProductPopup(Popup):
         layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
         info_layout = BoxLayout(orientation='horizontal', spacing=10)
 
-        if image_path and os.path.isfile(image_path):
-            img = Image(source=image_path, size_hint=(0.4, 1))
+        texture = texture_cache.get(image_path) if image_path else None
+        if texture is not None:
+            img = Image(texture=texture, size_hint=(0.4, 1))
         else:
             img = Label(text='[No Image]', size_hint=(0.4, 1), halign='center', valign='middle')
             img.bind(size=img.setter('text_size'))
@@ -57,79 +63,217 @@ class ProductPopup(Popup):
 
 
 class ProductRow(BoxLayout):
+    """One rv_products row; its data item is a repositories.products.Product record."""
     product_id = NumericProperty(0)
     name = StringProperty()
     category = StringProperty()
-    image_path = StringProperty()
-    index = NumericProperty()
+    thumb_path = StringProperty()
+
+    def on_kv_post(self, base_widget):
+        # on_thumb_path only runs on a change, so a new row whose first
+        # product has no thumbnail ('' to '') would otherwise stay blank.
+        self._show_thumb(self.thumb_path)
+
+    def on_thumb_path(self, instance, value):
+        # Rows are recycled, so this only runs when a row shows a different product image.
+        self._show_thumb(value)
+
+    def _show_thumb(self, path):
+        self.ids.thumb.texture = texture_cache.get(path or products.DEFAULT_IMAGE)
 
 
 class ProductsScreen(Screen):
     edit_dialog = None
+    filter_dialog = None
+    loading = BooleanProperty(False)
+    filter_label = StringProperty('Filter')
+    # How close (as a scroll fraction) to either end of rv_products we start fetching the next page.
+    prefetch_threshold = 0.15
+    row_height = 71  # RecycleBoxLayout default_size + spacing
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.pager = products.ProductPager()
+        self._page_request = None
+        self._sync_trigger = Clock.create_trigger(lambda dt: self.sync_changes())
+        self._search_text = ""
+        self._search_trigger = Clock.create_trigger(self._run_search, search.SEARCH_DEBOUNCE)
+        # The sort/filter chosen in the Filter dialog, or None for newest first.
+        self.catalog_source = None
+        products.changes.add_listener(self._on_products_changed)
+
+    def on_kv_post(self, base_widget):
+        self.ids.rv_products.bind(scroll_y=self._on_scroll)
+
     def on_enter(self):
+        self.sync_changes()
+
+    def _on_products_changed(self):
+        if self.manager is not None and self.manager.current == self.name:
+            self._sync_trigger()
+
+    def sync_changes(self):
+        """Patch rv_products with local writes, or reload if another writer touched the database."""
+        if self._page_request is not None and self.loading:
+            return
+        pending = products.changes.pending() if self.ids.rv_products.data else None
+        if pending is None:
+            self.refresh_products()
+        elif pending and not isinstance(self.pager.source, products.LatestProducts):
+            # Search ranks and catalog ranks are recomputed rather than patched.
+            self.refresh_products()
+        else:
+            self.apply_changes(pending)
+
+    def on_search_text(self, text):
+        """Debounce search box keystrokes; only the last one within SEARCH_DEBOUNCE runs."""
+        self._search_text = text
+        self._search_trigger.cancel()
+        self._search_trigger()
+
+    def _run_search(self, dt):
+        text = self._search_text.strip()
+        self.pager.source = search.ProductSearch(text) if text else self._browse_source()
+        # refresh_products cancels whatever query the previous keystroke started.
         self.refresh_products()
 
+    def _browse_source(self):
+        return self.catalog_source or products.LatestProducts()
+
+    def apply_changes(self, pending):
+        """Insert, update, delete or move only the rows named in pending."""
+        if not pending:
+            return
+        rv = self.ids.rv_products
+        rows = products.fetch_rows([pid for pid, op in pending if op != "delete"])
+        for product_id, _op in pending:
+            position = self._position_of(product_id)
+            item = rows.get(product_id)
+
+            if position is not None and item is not None \
+                    and products.data_key(rv.data[position]) == products.data_key(item):
+                rv.data[position] = item
+                continue
+            if position is not None:
+                rv.data.pop(position)
+                self.pager.row_removed(position)
+            if item is not None and self.pager.contains_key(products.data_key(item)):
+                position = self._insert_position(products.data_key(item))
+                rv.data.insert(position, item)
+                self.pager.row_inserted(position, products.data_key(item))
+
+    def _position_of(self, product_id):
+        for i, item in enumerate(self.ids.rv_products.data):
+            if item.product_id == product_id:
+                return i
+        return None
+
+    def _insert_position(self, key):
+        data = self.ids.rv_products.data
+        for i, item in enumerate(data):
+            if self.pager.precedes(key, products.data_key(item)):
+                return i
+        return len(data)
+
+    def on_leave(self):
+        executor.cancel_group(self.name)
+        self._page_request = None
+        self.loading = False
+
     def refresh_products(self):
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, category, image_path FROM products ORDER BY last_updated DESC")
-        products = cursor.fetchall()
-        conn.close()
-
-        data = []
-        for idx, prod in enumerate(products):
-            id_, name, category, image_path = prod
-            print(image_path)
-            if image_path and os.path.isfile(image_path):
-                img = os.path.abspath(image_path).replace("\\", "/")
-            else:
-                img = os.path.abspath(os.path.join('product_images', 'default_img.png')).replace("\\", "/")
-                # print(img)
-            print(img)
-            data.append({
-                'product_id': id_,
-                'name': name,
-                'category': category,
-                'image_path': img,
-                'index': idx,
-                'view_product': self.view_product,
-                'edit_product': self.edit_product,
-                'delete_product': self.delete_product,
-            })
-        self.ids.rv_products.data = data
- 
+        executor.cancel_group(self.name)
+        self.loading = True
+        self._page_request = executor.submit(
+            self._load_page, self.pager.source, "first", None, self.pager.page_size,
+            on_result=self._show_first_page, on_error=self._load_failed, group=self.name)
+
+    @staticmethod
+    def _load_page(source, direction, key, limit):
+        # Runs on a worker thread. The Product records it returns are the
+        # rv_products data as they are; no per-row dicts are built. The
+        # first page comes with the products version it was read at.
+        if direction == "first":
+            return products.read_first_page(source, limit)
+        if direction == "after":
+            return source.after(key, limit)
+        return source.before(key, limit)
+
+    def _show_first_page(self, result):
+        version, rows = result
+        self._page_request = None
+        self.pager.set_first_page(rows)
+        products.changes.sync_point(version)
+        rv = self.ids.rv_products
+        rv.data = rows
+        rv.scroll_y = 1
+        self.loading = False
+
+    def _on_scroll(self, rv, scroll_y):
+        if self._page_request is not None or not rv.data:
+            return
+        if scroll_y <= self.prefetch_threshold and not self.pager.at_end:
+            self._page_request = executor.submit(
+                self._load_page, self.pager.source, "after", self.pager.next_key, self.pager.page_size,
+                on_result=self._show_next_page, on_error=self._load_failed, group=self.name)
+        elif scroll_y >= 1 - self.prefetch_threshold and not self.pager.at_start:
+            self._page_request = executor.submit(
+                self._load_page, self.pager.source, "before", self.pager.prev_key, self.pager.page_size,
+                on_result=self._show_prev_page, on_error=self._load_failed, group=self.name)
+
+    def _show_next_page(self, rows):
+        self._page_request = None
+        dropped = self.pager.add_next_page(rows)
+        rv = self.ids.rv_products
+        offset = self._scroll_offset()
+        rv.data = rv.data[dropped:] + rows
+        self._restore_scroll(offset - dropped * self.row_height)
+
+    def _show_prev_page(self, rows):
+        self._page_request = None
+        dropped = self.pager.add_prev_page(rows)
+        rv = self.ids.rv_products
+        offset = self._scroll_offset()
+        kept = rv.data[:len(rv.data) - dropped] if dropped else rv.data
+        rv.data = rows + kept
+        self._restore_scroll(offset + len(rows) * self.row_height)
+
+    def _scroll_offset(self):
+        """Distance in pixels from the top of the data to the top of the viewport."""
+        rv = self.ids.rv_products
+        scrollable = len(rv.data) * self.row_height - rv.height
+        return (1 - rv.scroll_y) * scrollable if scrollable > 0 else 0
+
+    def _restore_scroll(self, offset):
+        # Keep the rows the user is looking at in place after pages are added or trimmed.
+        rv = self.ids.rv_products
+        scrollable = len(rv.data) * self.row_height - rv.height
+        if scrollable > 0:
+            rv.scroll_y = min(1, max(0, 1 - offset / scrollable))
+
+    def _load_failed(self, error):
+        self._page_request = None
+        self.loading = False
+        show_popup("Error", f"Could not load products: {error}")
 
     def view_product(self, product_id):
-
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, category, last_updated, image_path FROM products WHERE id=?", (product_id,))
-        product = cursor.fetchone()
-        conn.close()
+        product = product_repository.get(int(product_id))
 
         if product is None:
             show_popup("Error", "Product not found.")
             return
 
-        # product is a tuple: (id, name, category, image_path)
-        popup = ProductPopup(name=product[1], category=product[2], last_updated=product[3], image_path=product[4])
+        popup = ProductPopup(name=product.name, category=product.category,
+                             last_updated=product.last_updated, image_path=product.image_path)
         popup.open()
 
-        print(product)
-
-
     def edit_product(self, product_id):
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT name, category, image_path FROM products WHERE id=?", (product_id,))
-        product = cursor.fetchone()
-        conn.close()
+        product = product_repository.get(int(product_id))
 
         if not product:
             show_popup("Error", "Product not found!")
             return
 
-        name, category, image_path = product
+        name, category, image_path = product.name, product.category, product.image_path
 
         
         content = MDBoxLayout(
@@ -151,20 +295,21 @@ class ProductsScreen(Screen):
         scroll.add_widget(content)
 
         # Create the dialog with Save and Cancel buttons
-        self.dialog = MDDialog(
+        self.edit_dialog = MDDialog(
         title="Edit Product",
         type="custom",
         content_cls=scroll,
         size_hint=(None, None),
         size=(dp(420), dp(550)),
         buttons=[
-            MDFlatButton(text="Cancel", on_release=lambda x: self.dialog.dismiss()),
-            MDFlatButton(text="Save", on_release=self.save_product),
+            MDFlatButton(text="Cancel", on_release=lambda x: self.edit_dialog.dismiss()),
+            MDFlatButton(text="Save", on_release=lambda x: self.save_product(product_id)),
         ],
         )
-        self.dialog.open()
+        self.edit_dialog.open()
 
     def save_product(self, product_id):
+        product_id = int(product_id)
         name = self.name_field.text.strip()
         category = self.category_field.text.strip()
         image_path = self.image_path_field.text.strip()
@@ -173,25 +318,24 @@ class ProductsScreen(Screen):
             show_popup("Error", "Name and Category cannot be empty!")
             return
 
-        # Optional: check if image_path is valid file, else set to None or empty string
         if image_path and not os.path.isfile(image_path):
-            show_popup("Warning", "Image path is invalid or file does not exist.")
+            show_popup("Warning", "Image path is invalid or file does not exist; the current image was kept.")
 
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE products SET name=?, category=?, image_path=? WHERE id=?",
-            (name, category, image_path, product_id)
-        )
-        conn.commit()
-        conn.close()
+        previous = product_repository.update_details(product_id, name, category)
+        change, new_image = products.edited_image(previous.image_path if previous else None, image_path)
+        if previous and change:
+            # The new image goes through the image store on the worker.
+            executor.submit(images.attach_to_product, product_id, new_image,
+                            on_result=lambda path: products.changes.mark_worker_write(product_id),
+                            on_error=lambda error: show_popup("Error", f"Failed to store image: {error}"))
 
         self.edit_dialog.dismiss()
         show_popup("Success", "Product updated successfully!")
-        self.refresh_products()
+        products.changes.mark(product_id, "update")
 
 
     def delete_product(self, product_id):
+        product_id = int(product_id)
         content = BoxLayout(orientation='vertical', spacing=10, padding=10)
         content.add_widget(Label(text=f"Are you sure you want to delete product ID: {product_id}?"))
         btns = BoxLayout(spacing=10, size_hint_y=None, height='40dp')
@@ -204,19 +348,79 @@ class ProductsScreen(Screen):
         popup = Popup(title='Confirm Delete', content=content, size_hint=(None,None), size=(400,200))
 
         def confirm_delete(instance):
-            conn = sqlite3.connect("users.db")
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-            conn.commit()
-            conn.close()
+            product_repository.delete(product_id)
             popup.dismiss()
-            self.refresh_products()
+            products.changes.mark(product_id, "delete")
             show_popup("Deleted", "Product deleted successfully!")
 
         yes_btn.bind(on_release=confirm_delete)
         no_btn.bind(on_release=popup.dismiss)
         popup.open()
+
+    def export_products(self):
+        start_export('products')
+
+    def import_products(self):
+        # The import commits on a worker, so sync_changes sees it and reloads.
+        start_import('products', on_done=lambda report: self.sync_changes())
+
     def filter_products(self):
-        show_popup("Success", "Accessing the Filter product menu")
+        current = self.catalog_source or catalog.CatalogProducts()
+        content = MDBoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None, height=dp(220))
+
+        sort_row = BoxLayout(spacing=dp(5), size_hint_y=None, height=dp(40))
+        self.sort_buttons = {}
+        for sort, text in (('latest', 'Newest'), ('name', 'Name'), ('stock', 'Stock')):
+            button = ToggleButton(text=text, group='product_sort', allow_no_selection=False,
+                                  state='down' if sort == current.sort else 'normal')
+            self.sort_buttons[sort] = button
+            sort_row.add_widget(button)
+        content.add_widget(sort_row)
+
+        self.filter_category_field = MDTextField(text=current.category or "",
+                                                 hint_text="Category (blank for all)")
+        content.add_widget(self.filter_category_field)
+
+        self.active_only_box = CheckBox(active=current.active_only, size_hint_x=None, width=dp(40))
+        self.reverse_box = CheckBox(active=current.reverse, size_hint_x=None, width=dp(40))
+        for box, text in ((self.active_only_box, "Active products only"), (self.reverse_box, "Reverse order")):
+            row = BoxLayout(size_hint_y=None, height=dp(40))
+            row.add_widget(box)
+            row.add_widget(Label(text=text, color=(0.2, 0.25, 0.35, 1)))
+            content.add_widget(row)
+
+        self.filter_dialog = MDDialog(
+            title="Sort and Filter",
+            type="custom",
+            content_cls=content,
+            buttons=[
+                MDFlatButton(text="Clear", on_release=lambda x: self.clear_filter()),
+                MDFlatButton(text="Cancel", on_release=lambda x: self.filter_dialog.dismiss()),
+                MDFlatButton(text="Apply", on_release=lambda x: self.apply_filter()),
+            ]
+        )
+        self.filter_dialog.open()
+
+    def apply_filter(self):
+        sort = next(sort for sort, button in self.sort_buttons.items() if button.state == 'down')
+        category = self.filter_category_field.text.strip()
+        # Answered from services.catalog; the first use loads it on the worker.
+        self.catalog_source = catalog.CatalogProducts(sort, category or None,
+                                                      self.active_only_box.active, self.reverse_box.active)
+        self.filter_label = 'Filter *'
+        self.filter_dialog.dismiss()
+        self._show_browse_source()
+
+    def clear_filter(self):
+        self.catalog_source = None
+        self.filter_label = 'Filter'
+        self.filter_dialog.dismiss()
+        self._show_browse_source()
+
+    def _show_browse_source(self):
+        # A search in progress keeps its results; the filter applies once the box is cleared.
+        if not self._search_text.strip():
+            self.pager.source = self._browse_source()
+            self.refresh_products()
 
 
@@ -15,7 +15,7 @@ class RegisterScreen(Screen):
             return
 
         try:
-            db.add_user(username, email, password)
+            db.insert_user(username, email, password)
             show_popup("Success", "User registered successfully!")
             self.manager.current = "login"
 
@@ -0,0 +1,116 @@
+import importlib
+import time
+
+from kivy.clock import Clock
+from kivy.lang import Builder
+from kivy.logger import Logger
+from kivy.uix.screenmanager import ScreenManager
+
+from services import instrumentation
+
+# Screen name -> (module, class, kv file). Nothing here is imported, parsed
+# or built until the screen is first needed.
+SCREENS = {
+    'login': ('screens.login_screen', 'LoginScreen', 'kv/login.kv'),
+    'register': ('screens.register_screen', 'RegisterScreen', 'kv/register.kv'),
+    'dashboard': ('screens.dashboard_screen', 'DashboardScreen', 'kv/dashboard.kv'),
+    'products': ('screens.products_screen', 'ProductsScreen', 'kv/products.kv'),
+    'stores': ('screens.stores_screen', 'StoresScreen', 'kv/stores.kv'),
+    'orders': ('screens.orders_screen', 'OrdersScreen', 'kv/orders.kv'),
+    'suppliers': ('screens.suppliers_screen', 'SuppliersScreen', 'kv/suppliers.kv'),
+    'reports': ('screens.reports_screen', 'ReportsScreen', 'kv/reports.kv'),
+    'settings': ('screens.settings_screen', 'SettingsScreen', 'kv/settings.kv'),
+    'add_product': ('screens.add_product_screen', 'AddProductScreen', 'kv/add_product.kv'),
+    'edit_product': ('screens.edit_product_screen', 'EditProductScreen', 'kv/edit_product.kv'),
+    'debtors': ('screens.debtors_screen', 'DebtorsScreen', 'kv/debtors.kv'),
+}
+
+# Gap between two prewarmed screens, so each gets its own idle frame.
+PREWARM_INTERVAL = 0.25
+
+
+class StartupTimeline:
+    """Named, timed startup steps grouped by phase (import, kv, build, ...)."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.steps = []
+
+    def record(self, phase, label, started):
+        """Record a step that began at perf_counter() value `started`."""
+        self.steps.append((phase, label, (time.perf_counter() - started) * 1000))
+
+    def totals(self):
+        totals = {}
+        for phase, _label, ms in self.steps:
+            totals[phase] = totals.get(phase, 0.0) + ms
+        return totals
+
+    def log(self, title="Startup"):
+        elapsed = (time.perf_counter() - self.origin) * 1000
+        Logger.info("%s: %.1f ms since launch (%s)", title, elapsed,
+                    ", ".join(f"{phase} {ms:.1f} ms" for phase, ms in self.totals().items()))
+        for phase, label, ms in self.steps:
+            Logger.info("%s:   %-6s %-28s %7.1f ms", title, phase, label, ms)
+
+
+timeline = StartupTimeline()
+
+
+class LazyScreenManager(ScreenManager):
+    """A ScreenManager that builds registered screens on first use.
+
+    get_screen() (which setting `current` goes through) imports the
+    screen's module, loads its kv file and constructs it the first time a
+    registered name is asked for.
+    """
+
+    def __init__(self, registry=SCREENS, **kwargs):
+        self.registry = dict(registry)
+        self._loaded_kv = set()
+        self._prewarm_queue = []
+        self._prewarm_event = None
+        super().__init__(**kwargs)
+
+    def is_built(self, name):
+        return any(screen.name == name for screen in self.screens)
+
+    def get_screen(self, name):
+        if name in self.registry and not self.is_built(name):
+            self.build_screen(name)
+        return super().get_screen(name)
+
+    def build_screen(self, name):
+        module_name, class_name, kv_file = self.registry[name]
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        timeline.record('import', module_name, started)
+        if kv_file not in self._loaded_kv:
+            started = time.perf_counter()
+            Builder.load_file(kv_file)
+            self._loaded_kv.add(kv_file)
+            timeline.record('kv', kv_file, started)
+        started = time.perf_counter()
+        screen = getattr(module, class_name)(name=name)
+        instrumentation.instrument_screen(screen)
+        self.add_widget(screen)
+        timeline.record('build', name, started)
+        return screen
+
+    def prewarm(self, names, interval=PREWARM_INTERVAL):
+        """Build the given screens one per clock tick while the app is idle."""
+        self._prewarm_queue.extend(name for name in names if name in self.registry)
+        if self._prewarm_event is None:
+            self._prewarm_event = Clock.schedule_once(self._prewarm_next, interval)
+
+    def _prewarm_next(self, _dt):
+        self._prewarm_event = None
+        while self._prewarm_queue:
+            name = self._prewarm_queue.pop(0)
+            if not self.is_built(name):
+                self.build_screen(name)
+                break
+        if self._prewarm_queue:
+            self._prewarm_event = Clock.schedule_once(self._prewarm_next, PREWARM_INTERVAL)
+        else:
+            timeline.log("Prewarm")
@@ -1,4 +1,49 @@
+from kivy.properties import BooleanProperty, DictProperty, NumericProperty, StringProperty
 from kivy.uix.screenmanager import Screen
 
+from configs import show_popup
+from services import executor, reports
+
+
+def _breakdown(rows):
+    """One line per (label, stock_in, stock_out, movements) row."""
+    if not rows:
+        return "No stock movements"
+    return "\n".join(f"{label or 'Uncategorised'}: +{stock_in:g} / -{stock_out:g} ({movements} moves)"
+                     for label, stock_in, stock_out, movements in rows)
+
+
 class ReportsScreen(Screen):
-    pass
\ No newline at end of file
+    loading = BooleanProperty(False)
+    period = NumericProperty(reports.PERIODS[1])
+    report = DictProperty()
+    category_text = StringProperty()
+    store_text = StringProperty()
+
+    def on_enter(self):
+        self.refresh_report()
+
+    def on_leave(self):
+        executor.cancel_group(self.name)
+        self.loading = False
+
+    def set_period(self, days):
+        if days != self.period:
+            self.period = days
+            self.refresh_report()
+
+    def refresh_report(self):
+        executor.cancel_group(self.name)
+        self.loading = True
+        executor.submit(reports.build_report, self.period, on_result=self._show_report,
+                        on_error=self._load_failed, group=self.name)
+
+    def _show_report(self, report):
+        self.loading = False
+        self.report = report
+        self.category_text = _breakdown(report['categories'])
+        self.store_text = _breakdown([row[1:] for row in report['stores']])
+
+    def _load_failed(self, error):
+        self.loading = False
+        show_popup("Error", f"Could not load report: {error}")
@@ -1,4 +1,65 @@
+import os
+import time
+
+from kivy.app import App
+from kivy.properties import BooleanProperty, StringProperty
 from kivy.uix.screenmanager import Screen
 
+from configs import show_popup
+from services import instrumentation, sync
+from services.instrumentation import recorder
+
+# Where Dump writes, under the app's user_data_dir.
+PERF_DIR = 'perf'
+
+
 class SettingsScreen(Screen):
-    pass
\ No newline at end of file
+    instrumentation_on = BooleanProperty(False)
+    perf_summary = StringProperty()
+    sync_status = StringProperty()
+
+    def on_enter(self):
+        self.refresh_perf()
+        url = sync.server_url()
+        if not url:
+            self.sync_status = f"Not configured (set {sync.ENV_URL})"
+        elif not self.sync_status:
+            self.sync_status = f"{sync.pending_changes(url)} local change(s) waiting for {url}"
+
+    def sync_now(self):
+        if not sync.server_url():
+            return
+        self.sync_status = "Syncing..."
+        App.get_running_app().sync_now(on_result=self._synced, on_error=self._sync_failed)
+
+    def _synced(self, stats):
+        if stats is None:
+            self.sync_status = "A sync is already running"
+        else:
+            self.sync_status = "Pushed {pushed}, pulled {pulled} ({applied} applied, {deferred} waiting)".format(**stats)
+
+    def _sync_failed(self, error):
+        self.sync_status = f"Sync failed: {error}"
+
+    def toggle_instrumentation(self):
+        instrumentation.set_enabled(not recorder.enabled)
+        self.refresh_perf()
+
+    def refresh_perf(self):
+        self.instrumentation_on = recorder.enabled
+        self.perf_summary = recorder.summary_text()
+
+    def clear_perf(self):
+        recorder.clear()
+        self.refresh_perf()
+
+    def dump_perf(self):
+        app = App.get_running_app()
+        directory = os.path.join(app.user_data_dir, PERF_DIR) if app else PERF_DIR
+        path = os.path.join(directory, time.strftime("perf-%Y%m%d-%H%M%S.json"))
+        try:
+            recorder.dump(path)
+        except OSError as exc:
+            show_popup("Error", f"Could not write timings: {exc}")
+            return
+        show_popup("Timings saved", f"{len(recorder.events())} samples written to\n{path}")
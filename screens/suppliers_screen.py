@@ -7,86 +7,9 @@ from kivy.uix.popup import Popup
 from kivy.uix.textinput import TextInput
 from kivy.uix.gridlayout import GridLayout
 from kivy.clock import Clock
-import json
-import csv
-from datetime import datetime
-
-class SupplierManager:
-    """Handles all supplier-related data operations"""
-    
-    def __init__(self):
-        self.suppliers = [
-            {
-                'id': 'acme_supplies',
-                'name': 'Acme Supplies Ltd.',
-                'category': 'Industrial Equipment & Materials',
-                'status': 'Active',
-                'contact': '+1-555-0123',
-                'email': 'acme@supplies.com',
-                'rating': 4.2,
-                'avatar': 'AS',
-                'color': [0.27, 0.54, 0.96, 1],
-                'address': '123 Industrial Ave, Manufacturing City',
-                'date_added': '2024-01-15'
-            },
-            {
-                'id': 'global_systems',
-                'name': 'Global Systems Inc.',
-                'category': 'Technology & Software Solutions',
-                'status': 'Active',
-                'contact': '+1-555-0456',
-                'email': 'info@globalsystems.com',
-                'rating': 4.8,
-                'avatar': 'GS',
-                'color': [0.64, 0.42, 0.89, 1],
-                'address': '456 Tech Boulevard, Silicon Valley',
-                'date_added': '2024-02-20'
-            }
-        ]
-        
-    def get_all_suppliers(self):
-        return self.suppliers
-    
-    def get_supplier(self, supplier_id):
-        return next((s for s in self.suppliers if s['id'] == supplier_id), None)
-    
-    def add_supplier(self, supplier_data):
-        supplier_data['id'] = supplier_data['name'].lower().replace(' ', '_').replace('.', '')
-        supplier_data['date_added'] = datetime.now().strftime('%Y-%m-%d')
-        self.suppliers.append(supplier_data)
-        return supplier_data['id']
-    
-    def update_supplier(self, supplier_id, updated_data):
-        supplier = self.get_supplier(supplier_id)
-        if supplier:
-            supplier.update(updated_data)
-            return True
-        return False
-    
-    def delete_supplier(self, supplier_id):
-        self.suppliers = [s for s in self.suppliers if s['id'] != supplier_id]
-    
-    def filter_suppliers(self, search_term):
-        if not search_term:
-            return self.suppliers
-        
-        search_term = search_term.lower()
-        return [s for s in self.suppliers if 
-                search_term in s['name'].lower() or 
-                search_term in s['category'].lower() or
-                search_term in s['email'].lower()]
-    
-    def export_to_csv(self, filename='suppliers_export.csv'):
-        """Export suppliers to CSV file"""
-        fieldnames = ['name', 'category', 'status', 'contact', 'email', 'rating', 'address', 'date_added']
-        
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for supplier in self.suppliers:
-                writer.writerow({k: supplier.get(k, '') for k in fieldnames})
-        
-        return filename
+import db
+from configs import start_export, start_import
+from services.suppliers import FILTER_DEBOUNCE, SupplierManager
 
 class AddSupplierDialog(Popup):
     """Dialog for adding new suppliers"""
@@ -211,6 +134,8 @@ class SuppliersScreen(Screen):
         super().__init__(**kwargs)
         self.supplier_manager = SupplierManager()
         self.filtered_suppliers = self.supplier_manager.get_all_suppliers()
+        self._search_text = ''
+        self._filter_trigger = Clock.create_trigger(self._apply_filter, FILTER_DEBOUNCE)
         
     def on_enter(self):
         """Called when screen is entered"""
@@ -237,12 +162,19 @@ class SuppliersScreen(Screen):
         """Callback when new supplier is added"""
         supplier_id = self.supplier_manager.add_supplier(supplier_data)
         self.create_supplier_card(supplier_data)
+        # The manager hands out fresh lists, so re-filter to pick the new supplier up.
+        self.filtered_suppliers = self.supplier_manager.filter_suppliers(self._search_text)
         self.refresh_suppliers_list()
         self.show_success_message(f"Supplier '{supplier_data['name']}' added successfully!")
         
     def filter_suppliers(self, search_text):
-        """Filter suppliers based on search text"""
-        self.filtered_suppliers = self.supplier_manager.filter_suppliers(search_text)
+        """Filter suppliers based on search text, once typing pauses"""
+        self._search_text = search_text
+        self._filter_trigger.cancel()
+        self._filter_trigger()
+
+    def _apply_filter(self, dt):
+        self.filtered_suppliers = self.supplier_manager.filter_suppliers(self._search_text)
         self.refresh_suppliers_list()
         
     def view_supplier(self, supplier_id):
@@ -261,6 +193,7 @@ class SuppliersScreen(Screen):
     def edit_supplier_callback(self, supplier_id, updated_data):
         """Callback when supplier is edited"""
         if self.supplier_manager.update_supplier(supplier_id, updated_data):
+            self.filtered_suppliers = self.supplier_manager.filter_suppliers(self._search_text)
             self.refresh_suppliers_list()
             self.show_success_message("Supplier updated successfully!")
             
@@ -312,16 +245,22 @@ class SuppliersScreen(Screen):
         
         self.supplier_manager.delete_supplier(supplier_id)
         popup.dismiss()
+        self.filtered_suppliers = self.supplier_manager.filter_suppliers(self._search_text)
         self.refresh_suppliers_list()
         self.show_success_message(f"Supplier '{supplier_name}' deleted successfully!")
         
     def export_suppliers(self):
-        """Export suppliers to CSV"""
-        try:
-            filename = self.supplier_manager.export_to_csv()
-            self.show_success_message(f"Suppliers exported to {filename}")
-        except Exception as e:
-            self.show_error_message(f"Export failed: {str(e)}")
+        """Export suppliers to CSV in the background"""
+        start_export('suppliers')
+
+    def import_suppliers(self):
+        """Bulk-import suppliers from a CSV file"""
+        start_import('suppliers', on_done=self._suppliers_imported)
+
+    def _suppliers_imported(self, report):
+        self.supplier_manager.invalidate()
+        self.filtered_suppliers = self.supplier_manager.filter_suppliers(self._search_text)
+        self.refresh_suppliers_list()
             
     def create_supplier_card(self, supplier):
         """Dynamically create a supplier card widget"""
@@ -553,6 +492,7 @@ class SuppliersApp(App):
     """Main application class for testing"""
     
     def build(self):
+        db.create_tables()
         return SuppliersScreen(name='suppliers')
     
     # Methods that would be called from the KV file
@@ -0,0 +1,345 @@
+"""In-memory, column-oriented copy of the product list behind the products screen's sort and filter.
+
+The first sort or filter loads every product once into parallel columns
+(the array module; NumPy, when installed, only speeds up the selection
+step), with one precomputed order per sort mode and one byte-per-product
+bitmap per category. A sort/filter combination is then a bitmap AND plus
+one pass over a precomputed order: a few ms for 100k products, with no
+query.
+
+Writes through product_repository patch the columns in place. Anything
+else that writes products (imports, sync, image workers, other
+processes) moves the products counter in table_versions (migration 15),
+and the next query reloads.
+"""
+import threading
+from array import array
+from bisect import bisect_left, insort
+from itertools import compress
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import db
+from repositories.products import LIST_COLUMNS, Product, product_repository
+
+# Sort modes, and whether each is shown in descending key order.
+SORTS = {
+    'latest': True,   # newest first, like LatestProducts
+    'name': False,    # A-Z, ignoring case
+    'stock': False,   # lowest stock first
+}
+
+# Reload instead of patching once this share of the columns is deleted rows.
+MAX_DEAD_FRACTION = 0.25
+
+_VERSION_SQL = "SELECT version FROM table_versions WHERE tbl = 'products'"
+_ALL_SQL = f"SELECT {LIST_COLUMNS} FROM products"
+_ONE_SQL = f"SELECT {LIST_COLUMNS} FROM products WHERE id = ?"
+
+
+def _and(a, b):
+    # Bitmaps hold one 0/1 byte per product, so a bitwise AND of the two
+    # buffers read as big integers is a per-product AND, done in C.
+    return (int.from_bytes(a, 'little') & int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+def _or(a, b):
+    return (int.from_bytes(a, 'little') | int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+def _select(order, mask):
+    """The positions in order whose mask byte is set, keeping their order."""
+    if numpy is not None:
+        positions = numpy.frombuffer(order, dtype=numpy.intc)
+        return positions[numpy.frombuffer(mask, dtype=numpy.bool_)[positions]]
+    return array('i', compress(order, map(mask.__getitem__, order)))
+
+
+class CatalogSelection:
+    """The positions matching one query, in display order; slice it into Product records with rows()."""
+
+    def __init__(self, catalog, loads, positions):
+        self.catalog = catalog
+        self.loads = loads
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def rows(self, start, stop):
+        """Records for ranks start..stop-1 (sort_key is the rank), or None if the catalog has reloaded since."""
+        return self.catalog.records(self.positions[start:stop], start, self.loads)
+
+
+class ProductCatalog:
+    """Every product as parallel columns, indexed by position.
+
+    Positions are append-only between loads: an updated product is
+    appended again and its old position left dead, so a selection's
+    positions stay valid until the next load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Signalled when a load finishes; loading is read and set under _lock.
+        self._load_done = threading.Condition(self._lock)
+        self.loaded = False
+        self.loading = False
+        self.version = None
+        self.loads = 0
+        self._reset()
+
+    def _reset(self):
+        self.ids = array('q')
+        self.names = []
+        self.categories = array('i')
+        self.stock = array('q')
+        self.last_updated = []
+        self.thumbs = []
+        self.active = bytearray()
+        self.alive = bytearray()
+        self.dead = 0
+        self.category_names = []
+        self.bitmaps = []
+        self.orders = {}
+        self._codes = {}
+        self._positions = {}
+
+    def _sort_key(self, sort):
+        ids = self.ids
+        if sort == 'latest':
+            last_updated = self.last_updated
+            return lambda p: (last_updated[p], ids[p])
+        if sort == 'name':
+            names = self.names
+            return lambda p: (names[p].casefold(), ids[p])
+        stock = self.stock
+        return lambda p: (stock[p], ids[p])
+
+    def _code(self, category):
+        code = self._codes.get(category)
+        if code is None:
+            code = self._codes[category] = len(self.category_names)
+            self.category_names.append(category)
+            self.bitmaps.append(bytearray(len(self.ids)))
+        return code
+
+    def load(self):
+        """Read every product and rebuild the columns, orders and bitmaps. Run this on a worker."""
+        with self._lock:
+            self._wait_for_load()
+            self._load()
+
+    def _wait_for_load(self):
+        while self.loading:
+            self._load_done.wait()
+
+    def _load(self):
+        # Called holding _lock. The lock is released for the read itself so
+        # written() can see loading and return instead of waiting; every
+        # other caller waits in _wait_for_load() until the columns are whole.
+        self.loading = True
+        self._lock.release()
+        try:
+            self._read_all()
+        finally:
+            self._lock.acquire()
+            self.loading = False
+            self._load_done.notify_all()
+
+    def _read_all(self):
+        conn = db.get_connection()
+        # Version first: a write landing between the two reads then only
+        # causes one extra reload, never a missed change.
+        version = conn.execute(_VERSION_SQL).fetchone()[0]
+        rows = conn.execute(_ALL_SQL).fetchall()
+        self._reset()
+        count = len(rows)
+        if rows:
+            ids, names, categories, stock, active, last_updated, thumbs = zip(*rows)
+            self.ids = array('q', ids)
+            self.names = list(names)
+            # ids first: _code() sizes each new category's bitmap from it.
+            self.categories = array('i', map(self._code, (c or '' for c in categories)))
+            self.stock = array('q', (s or 0 for s in stock))
+            self.active = bytearray(1 if a else 0 for a in active)
+            self.last_updated = [u or '' for u in last_updated]
+            self.thumbs = [t or '' for t in thumbs]
+            for position, code in enumerate(self.categories):
+                self.bitmaps[code][position] = 1
+        self.alive = bytearray(b'\x01') * count
+        self._positions = {product_id: position for position, product_id in enumerate(self.ids)}
+        for sort in SORTS:
+            self.orders[sort] = array('i', sorted(range(count), key=self._sort_key(sort)))
+        self.version = version
+        self.loaded = True
+        self.loads += 1
+
+    def _ensure_current(self):
+        self._wait_for_load()
+        conn = db.get_connection()
+        if not self.loaded or self.version is None or conn.execute(_VERSION_SQL).fetchone()[0] != self.version:
+            self._load()
+
+    def written(self, product_id):
+        """Patch one product after a write through product_repository, or mark the copy stale."""
+        with self._lock:
+            if self.loading:
+                # Don't hold up the writer (usually the UI thread) behind a load.
+                # The load either read this write or stamped an older version,
+                # which makes the next query reload.
+                return
+            if not self.loaded or self.version is None:
+                return
+            conn = db.get_connection()
+            if conn.in_transaction:
+                # Inside an outer transaction that may still roll back.
+                self.version = None
+                return
+            version = conn.execute(_VERSION_SQL).fetchone()[0]
+            if version == self.version:
+                return
+            if version != self.version + 1:
+                # Someone else wrote products too; reload on the next query.
+                self.version = None
+                return
+            row = conn.execute(_ONE_SQL, (product_id,)).fetchone()
+            self._remove(product_id)
+            if row is not None:
+                self._append(row)
+            self.version = version
+            if self.dead > MAX_DEAD_FRACTION * len(self.ids):
+                self.version = None
+
+    def _remove(self, product_id):
+        position = self._positions.pop(product_id, None)
+        if position is None:
+            return
+        for sort, order in self.orders.items():
+            key = self._sort_key(sort)
+            del order[bisect_left(order, key(position), key=key)]
+        self.bitmaps[self.categories[position]][position] = 0
+        self.active[position] = 0
+        self.alive[position] = 0
+        self.dead += 1
+
+    def _append(self, row):
+        product_id, name, category, stock, active, last_updated, thumb_path = row
+        position = len(self.ids)
+        code = self._code(category or '')
+        self.ids.append(product_id)
+        self.names.append(name)
+        self.categories.append(code)
+        self.stock.append(stock or 0)
+        self.active.append(1 if active else 0)
+        self.last_updated.append(last_updated or '')
+        self.thumbs.append(thumb_path or '')
+        self.alive.append(1)
+        for bitmap in self.bitmaps:
+            bitmap.append(0)
+        self.bitmaps[code][position] = 1
+        self._positions[product_id] = position
+        for sort, order in self.orders.items():
+            insort(order, position, key=self._sort_key(sort))
+
+    def select(self, sort='latest', category=None, active_only=False, reverse=False):
+        """Products matching the filters, as a CatalogSelection in display order.
+
+        category matches ignoring case; '' or None means every category.
+        reverse flips the sort mode's usual direction.
+        """
+        if sort not in SORTS:
+            raise ValueError(f"unknown sort {sort!r}; expected one of {', '.join(SORTS)}")
+        with self._lock:
+            self._ensure_current()
+            mask = self.alive
+            if category:
+                wanted = category.casefold()
+                codes = [code for code, name in enumerate(self.category_names) if name.casefold() == wanted]
+                if not codes:
+                    return CatalogSelection(self, self.loads, array('i'))
+                matching = self.bitmaps[codes[0]]
+                for code in codes[1:]:
+                    matching = _or(matching, self.bitmaps[code])
+                mask = _and(mask, matching)
+            if active_only:
+                mask = _and(mask, self.active)
+            if mask is self.alive and not self.dead:
+                # Nothing filtered out: the precomputed order is the answer.
+                positions = self.orders[sort][:]
+            else:
+                positions = _select(self.orders[sort], mask)
+            loads = self.loads
+        if SORTS[sort] != reverse:
+            positions = positions[::-1]
+        return CatalogSelection(self, loads, positions)
+
+    def records(self, positions, first_rank, loads):
+        """Product records for positions, ranked from first_rank; None if a load has happened since loads."""
+        with self._lock:
+            self._wait_for_load()
+            if loads != self.loads:
+                return None
+            category_names = self.category_names
+            return [
+                Product(self.ids[p], self.names[p], category_names[self.categories[p]], self.stock[p],
+                        self.active[p], self.last_updated[p], self.thumbs[p], None, rank)
+                for rank, p in enumerate(positions, first_rank)
+            ]
+
+    def category_list(self):
+        """Category names with at least one product, sorted ignoring case."""
+        with self._lock:
+            self._ensure_current()
+            return sorted((name for name, bitmap in zip(self.category_names, self.bitmaps)
+                           if name and 1 in bitmap), key=str.casefold)
+
+
+catalog = ProductCatalog()
+product_repository.add_write_listener(catalog.written)
+
+
+class CatalogProducts:
+    """Page source for ProductPager over a catalog selection; rows are keyed by rank."""
+
+    descending = False
+
+    def __init__(self, sort='latest', category=None, active_only=False, reverse=False, product_catalog=None):
+        self.sort = sort
+        self.category = category
+        self.active_only = active_only
+        self.reverse = reverse
+        self.catalog = product_catalog or catalog
+        self._selection = None
+
+    @staticmethod
+    def key(row):
+        return row.sort_key
+
+    def _rows(self, start, stop):
+        start = max(0, start)
+        if self._selection is not None:
+            rows = self._selection.rows(start, stop)
+            if rows is not None:
+                return rows
+        # First page, or the catalog reloaded since: select again.
+        self._selection = self.catalog.select(self.sort, self.category, self.active_only, self.reverse)
+        return self._selection.rows(start, stop) or []
+
+    @property
+    def count(self):
+        """Matching products, once the first page has been selected."""
+        return len(self._selection) if self._selection is not None else 0
+
+    def first(self, limit):
+        self._selection = None
+        return self._rows(0, limit)
+
+    def after(self, key, limit):
+        return self._rows(key + 1, key + 1 + limit)
+
+    def before(self, key, limit):
+        return self._rows(key - limit, key)
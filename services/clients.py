@@ -0,0 +1,77 @@
+import logging
+
+import db
+from repositories.clients import client_repository
+from repositories.debts import debt_repository
+
+logger = logging.getLogger(__name__)
+
+SORT_MODES = ('name', 'balance')
+
+
+def fetch_clients():
+    """Client records (with total_debt) for every client."""
+    return client_repository.all()
+
+
+def fetch_client(client_id):
+    return client_repository.get(client_id)
+
+
+def fetch_client_debts(client_id):
+    """(client name, [Debt, ...]) for the Manage Debts dialog."""
+    client = client_repository.get(client_id)
+    return client.name, debt_repository.for_client(client_id)
+
+
+def fetch_top_debtors(limit=10):
+    """The clients owing the most, largest balance first."""
+    return client_repository.top_debtors(limit)
+
+
+def check_balances(repair=False, tolerance=0.005):
+    """Compare client_balances with a full SUM over debts.
+
+    Returns (client_id, stored, actual) for every client that is off by
+    more than tolerance or has no balance row. With repair=True the table
+    is rebuilt from debts when anything is wrong.
+    """
+    conn = db.get_connection()
+    mismatches = conn.execute("""
+        SELECT c.id, b.total, IFNULL(SUM(d.amount), 0) AS actual
+        FROM clients c
+        LEFT JOIN client_balances b ON b.client_id = c.id
+        LEFT JOIN debts d ON d.client_id = c.id
+        GROUP BY c.id
+        HAVING b.total IS NULL OR ABS(b.total - actual) > ?
+    """, (tolerance,)).fetchall()
+    if mismatches and repair:
+        with db.transaction() as conn:
+            db.rebuild_client_balances(conn)
+        logger.warning("Rebuilt client_balances, %d client(s) were out of step", len(mismatches))
+    return mismatches
+
+
+def sort_client_rows(data, mode):
+    """Sort Client records in place: by name (A-Z) or by balance (largest first)."""
+    if mode == 'balance':
+        data.sort(key=lambda client: (-client.total_debt, client.name.lower()))
+    else:
+        data.sort(key=lambda client: client.name.lower())
+    return data
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check client_balances against the debts table.")
+    parser.add_argument("--repair", action="store_true", help="rebuild client_balances if it is out of step")
+    args = parser.parse_args()
+    db.create_tables()
+    bad = check_balances(repair=args.repair)
+    for client_id, stored, actual in bad:
+        print(f"client {client_id}: stored {stored}, actual {actual:.2f}")
+    if bad:
+        print(f"{len(bad)} client(s) out of step" + (", rebuilt" if args.repair else ""))
+    else:
+        print("client_balances OK")
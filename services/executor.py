@@ -0,0 +1,96 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.clock import Clock
+
+logger = logging.getLogger(__name__)
+
+
+class DBRequest:
+    """Handle for a piece of work submitted to the executor.
+
+    Cancelling a request guarantees its callbacks will not run, even if the
+    worker has already finished and the delivery is queued on the Clock.
+    """
+
+    def __init__(self, group):
+        self.group = group
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class DBExecutor:
+    """Runs database work on worker threads and hands results back on the Kivy main thread.
+
+    Each worker thread gets its own connection from db.get_connection(),
+    so submitted callables just use the db module as usual.
+    """
+
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def submit(self, fn, *args, on_result=None, on_error=None, group=None, **kwargs):
+        request = DBRequest(group)
+        with self._lock:
+            self._pending.setdefault(group, set()).add(request)
+
+        def run():
+            if request.cancelled:
+                return
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                logger.exception("Background query %r failed", fn)
+                Clock.schedule_once(lambda dt: self._deliver(request, on_error, exc))
+            else:
+                Clock.schedule_once(lambda dt: self._deliver(request, on_result, result))
+
+        request.future = self._pool.submit(run)
+        return request
+
+    def _deliver(self, request, callback, value):
+        self._forget(request)
+        if request.cancelled or callback is None:
+            return
+        callback(value)
+
+    def _forget(self, request):
+        with self._lock:
+            requests = self._pending.get(request.group)
+            if requests is not None:
+                requests.discard(request)
+                if not requests:
+                    del self._pending[request.group]
+
+    def cancel_group(self, group):
+        """Cancel every outstanding request submitted with this group."""
+        with self._lock:
+            requests = self._pending.pop(group, set())
+        for request in requests:
+            request.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            groups = list(self._pending)
+        for group in groups:
+            self.cancel_group(group)
+        self._pool.shutdown(wait=True)
+
+
+executor = DBExecutor()
+
+
+def submit(fn, *args, **kwargs):
+    return executor.submit(fn, *args, **kwargs)
+
+
+def cancel_group(group):
+    executor.cancel_group(group)
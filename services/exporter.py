@@ -0,0 +1,85 @@
+import csv
+import os
+import tempfile
+from datetime import datetime
+
+import db
+
+# Rows pulled per fetchmany() call; memory stays bounded by this, not the table size.
+CHUNK_SIZE = 500
+
+EXPORT_DIR = 'exports'
+
+# kind -> (count query, row query, CSV header)
+EXPORTS = {
+    'suppliers': (
+        "SELECT COUNT(*) FROM suppliers",
+        # id is the slug, which the suppliers import matches on.
+        "SELECT slug, name, category, status, contact, email, rating, address, date_added FROM suppliers ORDER BY id",
+        ['id', 'name', 'category', 'status', 'contact', 'email', 'rating', 'address', 'date_added'],
+    ),
+    'products': (
+        "SELECT COUNT(*) FROM products",
+        "SELECT id, name, stock, category, active, last_updated, image_path FROM products ORDER BY id",
+        ['id', 'name', 'stock', 'category', 'active', 'last_updated', 'image_path'],
+    ),
+    'debts': (
+        "SELECT COUNT(*) FROM debts",
+        "SELECT d.id, c.name, c.phone, d.product, d.amount "
+        "FROM debts d JOIN clients c ON c.id = d.client_id ORDER BY d.id",
+        ['id', 'client', 'phone', 'product', 'amount'],
+    ),
+}
+
+
+def iter_chunks(cursor, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_path(kind, directory=EXPORT_DIR):
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(directory, f"{kind}_export_{stamp}.csv")
+
+
+def export_query(count_sql, sql, header, dest_path, params=(), chunk_size=CHUNK_SIZE, progress=None):
+    """Stream a query into a CSV file; returns (dest_path, rows_written).
+
+    Rows are written to a temp file in the destination directory, which
+    is renamed over dest_path only once everything is on disk, so readers
+    never see a half-written export. progress(written, total) is called
+    after every chunk, on the calling thread.
+    """
+    directory = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.export_', suffix='.csv.tmp', dir=directory)
+    written = 0
+    try:
+        # One read transaction, so the count and the rows come from the same snapshot.
+        with db.read_snapshot() as conn, os.fdopen(fd, 'w', newline='', encoding='utf-8') as csvfile:
+            total = conn.execute(count_sql).fetchone()[0]
+            writer = csv.writer(csvfile)
+            writer.writerow(header)
+            for chunk in iter_chunks(conn.execute(sql, params), chunk_size):
+                writer.writerows(chunk)
+                written += len(chunk)
+                if progress is not None:
+                    progress(written, total)
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return dest_path, written
+
+
+def export(kind, dest_path=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Export one of EXPORTS to dest_path (default: a timestamped file in EXPORT_DIR)."""
+    count_sql, sql, header = EXPORTS[kind]
+    return export_query(count_sql, sql, header, dest_path or export_path(kind),
+                        chunk_size=chunk_size, progress=progress)
@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+import db
+from services import thumbnails
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = os.path.join('product_images', 'store')
+
+# Bytes read per chunk while copying and hashing.
+CHUNK_SIZE = 256 * 1024
+
+# Optional re-encoding on ingest: None stores the original bytes, 'JPEG' or
+# 'WEBP' re-encodes with the longest side capped at MAX_IMAGE_SIDE.
+REENCODE_FORMAT = None
+MAX_IMAGE_SIDE = 1600
+REENCODE_QUALITY = 85
+
+# Unreferenced blobs younger than this (seconds) survive garbage collection,
+# so an image ingested for a product that is not saved yet is not lost.
+GC_GRACE_SECONDS = 3600
+
+_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+
+def blob_path(digest, ext):
+    """Where the blob with this sha256 hex digest lives, sharded by its first byte."""
+    return os.path.join(STORE_DIR, digest[:2], digest + ext).replace("\\", "/")
+
+
+def is_stored(path):
+    return bool(path) and path.replace("\\", "/").startswith(STORE_DIR.replace("\\", "/") + "/")
+
+
+def _copy_hashing(src, dest_file):
+    digest = hashlib.sha256()
+    size = 0
+    with open(src, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            dest_file.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _reencode(src, dest_file, fmt, max_side, quality):
+    with Image.open(src) as img:
+        img.thumbnail((max_side, max_side))
+        img.convert("RGB").save(dest_file, fmt, quality=quality)
+    dest_file.flush()
+    dest_file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: dest_file.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def ingest(src, fmt=REENCODE_FORMAT, max_side=MAX_IMAGE_SIDE, quality=REENCODE_QUALITY):
+    """Add an image file to the store and return its store path.
+
+    The file is copied (or re-encoded) into a temp file in chunks while it
+    is hashed; if a blob with the same content already exists the copy is
+    discarded and the existing path returned. Run this on a worker.
+    """
+    if is_stored(src) and os.path.isfile(src):
+        return src.replace("\\", "/")
+    os.makedirs(STORE_DIR, exist_ok=True)
+    ext = _EXTENSIONS[fmt] if fmt else (os.path.splitext(src)[1].lower() or '.img')
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=STORE_DIR)
+    try:
+        with os.fdopen(fd, 'w+b') as tmp:
+            if fmt:
+                digest, size = _reencode(src, tmp, fmt, max_side, quality)
+            else:
+                digest, size = _copy_hashing(src, tmp)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        path = blob_path(digest, ext)
+        if os.path.isfile(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT INTO image_blobs (hash, path, size, refs, touched_at) VALUES (?, ?, ?, 0, ?) "
+            "ON CONFLICT(hash) DO UPDATE SET touched_at = excluded.touched_at",
+            (digest, path, size, time.time())
+        )
+    return path
+
+
+def attach_to_product(product_id, src):
+    """Ingest src (None clears the image) and point the product and its thumbnail at it.
+
+    Returns the stored path. Safe to run on a worker.
+    """
+    path = ingest(src) if src else None
+    with db.transaction() as conn:
+        conn.execute("UPDATE products SET image_path=? WHERE id=?", (path, product_id))
+    thumbnails.update_product_thumbnail(product_id, path)
+    return path
+
+
+def _thumbnail_paths(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return [os.path.join(thumbnails.THUMB_DIR, stem + ext) for ext in ('.png', '.jpg')]
+
+
+def collect_garbage(grace_seconds=GC_GRACE_SECONDS):
+    """Delete blobs no product references (and their thumbnails).
+
+    Also sweeps temp files left in the store by interrupted ingests.
+    Returns (blobs_removed, bytes_freed).
+    """
+    cutoff = time.time() - grace_seconds
+    conn = db.get_connection()
+    candidates = conn.execute(
+        "SELECT hash, path, size FROM image_blobs WHERE refs <= 0 AND touched_at < ?", (cutoff,)
+    ).fetchall()
+    removed = freed = 0
+    for digest, path, size in candidates:
+        with db.transaction() as conn:
+            # Re-check inside the write transaction: a product may have
+            # picked the blob up since the candidates were read.
+            deleted = conn.execute(
+                "DELETE FROM image_blobs WHERE hash=? AND refs <= 0 AND touched_at < ?", (digest, cutoff)
+            ).rowcount
+        if not deleted:
+            continue
+        for stale in [path] + _thumbnail_paths(path):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+        removed += 1
+        freed += size
+
+    if os.path.isdir(STORE_DIR):
+        for entry in os.scandir(STORE_DIR):
+            if entry.name.endswith('.tmp') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+    if removed:
+        logger.info("Image store GC removed %d blob(s), %d bytes", removed, freed)
+    return removed, freed
+
+
+def store_stats():
+    conn = db.get_connection()
+    blobs, size, refs, unreferenced = conn.execute(
+        "SELECT COUNT(*), IFNULL(SUM(size), 0), IFNULL(SUM(refs), 0), IFNULL(SUM(refs <= 0), 0) "
+        "FROM image_blobs"
+    ).fetchone()
+    return {'blobs': blobs, 'bytes': size, 'references': refs, 'unreferenced': unreferenced}
@@ -0,0 +1,298 @@
+import csv
+import itertools
+import json
+import os
+import time
+from datetime import datetime
+
+import db
+
+# Rows validated and inserted per transaction; also the resume granularity.
+BATCH_SIZE = 1000
+
+# Rejected rows kept with their reason; beyond this only the count grows.
+MAX_REJECTS_KEPT = 1000
+
+
+class RowError(ValueError):
+    """A CSV row that cannot be imported; the message is the reason shown to the user."""
+
+
+def _required(row, field):
+    value = (row.get(field) or '').strip()
+    if not value:
+        raise RowError(f"missing {field}")
+    return value
+
+
+def _optional(row, field, default=None):
+    value = (row.get(field) or '').strip()
+    return value if value else default
+
+
+def _int(row, field, default=0):
+    value = _optional(row, field)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f"{field} is not a whole number: {value!r}")
+
+
+def _float(row, field, default=0.0):
+    value = _optional(row, field)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise RowError(f"{field} is not a number: {value!r}")
+
+
+def _flag(row, field):
+    value = (_optional(row, field) or '0').lower()
+    if value in ('1', 'true', 'yes', 'y', 'active'):
+        return 1
+    if value in ('0', 'false', 'no', 'n', 'inactive'):
+        return 0
+    raise RowError(f"{field} is not a yes/no value: {value!r}")
+
+
+class ProductImport:
+    table = 'products'
+    insert_sql = ("INSERT INTO products (name, stock, category, active, last_updated, image_path) "
+                  "VALUES (?, ?, ?, ?, ?, ?)")
+
+    def start(self, conn):
+        self.now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def convert(self, row, conn):
+        stock = _int(row, 'stock')
+        if stock < 0:
+            raise RowError("stock is negative")
+        return (_required(row, 'name'), stock, _required(row, 'category'), _flag(row, 'active'),
+                _optional(row, 'last_updated', self.now), _optional(row, 'image_path'))
+
+
+class SupplierImport:
+    """Suppliers, upserted on slug so re-importing an export updates rows instead of duplicating them.
+
+    A row is matched on its id column (the slug, as exporter writes it),
+    or failing that on an existing supplier with the same name, once per
+    file. Anything else is a new supplier with a fresh slug. Updates keep
+    the supplier's color, and its other stored values wherever the file
+    leaves a column empty.
+    """
+
+    table = 'suppliers'
+    insert_sql = (
+        "INSERT INTO suppliers (slug, name, category, status, contact, email, rating, "
+        "avatar, color, address, date_added) "
+        "VALUES (?1, ?2, ?3, IFNULL(?4, 'Active'), ?5, ?6, IFNULL(?7, 0), ?8, ?9, ?10, IFNULL(?11, ?12)) "
+        "ON CONFLICT(slug) DO UPDATE SET name = excluded.name, category = excluded.category, "
+        "status = IFNULL(?4, status), contact = IFNULL(?5, contact), email = excluded.email, "
+        "rating = IFNULL(?7, rating), avatar = excluded.avatar, address = IFNULL(?10, address), "
+        "date_added = IFNULL(?11, date_added)"
+    )
+
+    def start(self, conn):
+        self.slugs = set()
+        self.by_name = {}
+        for slug, name in conn.execute("SELECT slug, name FROM suppliers ORDER BY id"):
+            self.slugs.add(slug)
+            self.by_name.setdefault(name.casefold(), slug)
+        self.today = datetime.now().strftime('%Y-%m-%d')
+
+    def _slug(self, name):
+        base = name.lower().replace(' ', '_').replace('.', '')
+        slug, n = base, 2
+        while slug in self.slugs:
+            slug = f"{base}_{n}"
+            n += 1
+        return slug
+
+    def convert(self, row, conn):
+        name = _required(row, 'name')
+        category = _required(row, 'category')
+        email = _required(row, 'email')
+        rating = _float(row, 'rating', None)
+        if rating is not None and not 0 <= rating <= 5:
+            raise RowError(f"rating out of range: {rating}")
+        same_name = self.by_name.pop(name.casefold(), None)
+        slug = _optional(row, 'id') or same_name or self._slug(name)
+        self.slugs.add(slug)
+        avatar = ''.join(word[0].upper() for word in name.split()[:2])
+        return (slug, name, category, _optional(row, 'status'), _optional(row, 'contact'),
+                email, rating, avatar, json.dumps([0.27, 0.54, 0.96, 1]), _optional(row, 'address'),
+                _optional(row, 'date_added'), self.today)
+
+
+class ClientImport:
+    table = 'clients'
+    insert_sql = "INSERT INTO clients (name, phone) VALUES (?, ?)"
+
+    def start(self, conn):
+        pass
+
+    def convert(self, row, conn):
+        return (_required(row, 'name'), _optional(row, 'phone'))
+
+
+class DebtImport:
+    """Debts name their client by client_id or by client (+ phone), as in the debts export.
+
+    Clients named but not yet in the database are created in the same batch.
+    """
+
+    table = 'debts'
+    insert_sql = "INSERT INTO debts (client_id, product, amount, product_id) VALUES (?, ?, ?, ?)"
+
+    def start(self, conn):
+        self.clients = {}
+        self.products = {}
+
+    def _client_id(self, row, conn):
+        client_id = _optional(row, 'client_id')
+        if client_id is not None:
+            if not client_id.isdigit() or conn.execute(
+                    "SELECT 1 FROM clients WHERE id=?", (int(client_id),)).fetchone() is None:
+                raise RowError(f"unknown client_id {client_id!r}")
+            return int(client_id)
+        name = _required(row, 'client')
+        phone = _optional(row, 'phone')
+        key = (name, phone)
+        if key not in self.clients:
+            found = conn.execute("SELECT id FROM clients WHERE name=? AND phone IS ?", key).fetchone()
+            if found is None:
+                found = (conn.execute("INSERT INTO clients (name, phone) VALUES (?, ?)", key).lastrowid,)
+            self.clients[key] = found[0]
+        return self.clients[key]
+
+    def convert(self, row, conn):
+        amount = _float(row, 'amount', None)
+        if amount is None or amount <= 0:
+            raise RowError("amount must be greater than zero")
+        product = _required(row, 'product')
+        key = product.lower()
+        if key not in self.products:
+            found = conn.execute("SELECT id FROM products WHERE name = ? COLLATE NOCASE ORDER BY id LIMIT 1",
+                                 (product,)).fetchone()
+            self.products[key] = found[0] if found else None
+        return (self._client_id(row, conn), product, amount, self.products[key])
+
+
+IMPORTS = {
+    'products': ProductImport,
+    'suppliers': SupplierImport,
+    'clients': ClientImport,
+    'debts': DebtImport,
+}
+
+
+class ImportReport:
+    def __init__(self, kind, source):
+        self.kind = kind
+        self.source = source
+        self.accepted = 0
+        self.rejected = 0
+        self.rejects = []
+        self.resumed_from = 0
+        self.processed = 0
+        self.bytes_read = 0
+        self.total_bytes = 0
+        self.seconds = 0.0
+
+    def reject(self, row_number, reason):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REJECTS_KEPT:
+            self.rejects.append((row_number, reason))
+
+    @property
+    def rows_per_second(self):
+        """Throughput of this run only (rows before a resume point are not counted)."""
+        return self.processed / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        text = (f"{self.accepted} {self.kind} imported, {self.rejected} rejected "
+                f"in {self.seconds:.1f}s ({self.rows_per_second:.0f} rows/sec)")
+        if self.resumed_from:
+            text += f", resumed after row {self.resumed_from}"
+        return text
+
+
+def _decoded_lines(binfile, report):
+    # Binary line iteration keeps embedded newlines intact (like newline='')
+    # and lets the report track how far into the file we are.
+    for i, raw in enumerate(binfile):
+        report.bytes_read += len(raw)
+        line = raw.decode('utf-8')
+        yield line.lstrip('\ufeff') if i == 0 else line
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime
+
+
+def _checkpoint(conn, kind, signature):
+    row = conn.execute(
+        "SELECT size, mtime, row_number, accepted, rejected FROM import_checkpoints WHERE source=? AND kind=?",
+        (signature[0], kind)
+    ).fetchone()
+    if row is None or (row[0], row[1]) != signature[1:]:
+        return None
+    return row[2:]
+
+
+def import_csv(kind, path, batch_size=BATCH_SIZE, progress=None):
+    """Import a CSV file of `kind` (see IMPORTS) in batched transactions.
+
+    Each batch is validated row by row, inserted with executemany and
+    committed together with a checkpoint of the last row it covered. If a
+    previous run of the same unchanged file was interrupted, the import
+    resumes after that checkpoint. progress(report) is called after each
+    committed batch. Returns an ImportReport.
+    """
+    spec = IMPORTS[kind]()
+    report = ImportReport(kind, path)
+    signature = _file_signature(path)
+    report.total_bytes = signature[1]
+    conn = db.get_connection()
+    started = time.perf_counter()
+
+    resume = _checkpoint(conn, kind, signature)
+    if resume is not None:
+        report.resumed_from, report.accepted, report.rejected = resume
+    spec.start(conn)
+
+    with open(path, 'rb') as csvfile:
+        rows = enumerate(csv.DictReader(_decoded_lines(csvfile, report)), start=1)
+        if report.resumed_from:
+            rows = itertools.islice(rows, report.resumed_from, None)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            with db.transaction() as conn:
+                values = []
+                for row_number, row in batch:
+                    try:
+                        values.append(spec.convert(row, conn))
+                    except RowError as exc:
+                        report.reject(row_number, str(exc))
+                conn.executemany(spec.insert_sql, values)
+                report.accepted += len(values)
+                report.processed += len(batch)
+                conn.execute(
+                    "INSERT OR REPLACE INTO import_checkpoints "
+                    "(source, kind, size, mtime, row_number, accepted, rejected) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (signature[0], kind, signature[1], signature[2], batch[-1][0], report.accepted, report.rejected)
+                )
+            if progress is not None:
+                progress(report)
+
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM import_checkpoints WHERE source=? AND kind=?", (signature[0], kind))
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,262 @@
+"""Opt-in latency instrumentation.
+
+Timings (SQL statements, screen on_enter, dialog opens, RecycleView
+refreshes, frame intervals) go into one in-memory ring buffer that can be
+summarised as p50/p95/p99 per kind and label, or dumped to JSON. Nothing
+is recorded until recorder.enable() is called (or INVENTORY_INSTRUMENT=1
+is set at startup); the hooks stay installed but cost one flag check.
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Events kept in the ring buffer; older ones are dropped first.
+RING_CAPACITY = 20000
+
+# Longest SQL label kept per statement.
+SQL_LABEL_LENGTH = 80
+
+ENV_FLAG = "INVENTORY_INSTRUMENT"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    """A ring buffer of (timestamp, kind, label, ms) events."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.enabled = False
+        self._events = deque(maxlen=capacity)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self._events.clear()
+
+    def record(self, kind, label, ms):
+        if self.enabled:
+            self._events.append((time.time(), kind, label, ms))
+
+    @contextmanager
+    def timed(self, kind, label):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, label, (time.perf_counter() - started) * 1000)
+
+    def events(self):
+        return list(self._events)
+
+    def summary(self, kind=None):
+        """Per (kind, label) count and p50/p95/p99/max in ms, slowest p95 first."""
+        groups = {}
+        for _ts, event_kind, label, ms in self.events():
+            if kind is None or event_kind == kind:
+                groups.setdefault((event_kind, label), []).append(ms)
+        rows = []
+        for (event_kind, label), values in groups.items():
+            values.sort()
+            rows.append({
+                'kind': event_kind,
+                'label': label,
+                'count': len(values),
+                'p50_ms': round(percentile(values, 50), 3),
+                'p95_ms': round(percentile(values, 95), 3),
+                'p99_ms': round(percentile(values, 99), 3),
+                'max_ms': round(values[-1], 3),
+            })
+        rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return rows
+
+    def summary_text(self, limit=15):
+        rows = self.summary()
+        if not rows:
+            return "No samples recorded yet."
+        lines = [f"{len(self._events)} samples"]
+        for row in rows[:limit]:
+            lines.append(f"[{row['kind']}] {row['label'][:40]}  n={row['count']}  "
+                         f"p50 {row['p50_ms']:.1f}  p95 {row['p95_ms']:.1f}  p99 {row['p99_ms']:.1f} ms")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write the summary and every buffered event to path as JSON."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'dumped_at': time.time(),
+                'summary': self.summary(),
+                'events': [{'ts': ts, 'kind': kind, 'label': label, 'ms': round(ms, 3)}
+                           for ts, kind, label, ms in self.events()],
+            }, f, indent=1)
+        return path
+
+
+recorder = Recorder()
+if os.environ.get(ENV_FLAG) == "1":
+    recorder.enable()
+
+
+def timed(kind, label):
+    """Decorator form of recorder.timed()."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with recorder.timed(kind, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def sql_label(sql):
+    return _WHITESPACE.sub(" ", sql).strip()[:SQL_LABEL_LENGTH]
+
+
+# SQL timing. sqlite3's trace callback only reports when a statement starts,
+# so statements are timed around execute*/fetch* by these factories, which
+# db.ConnectionManager uses for every connection.
+
+class TimedCursor(sqlite3.Cursor):
+    _label = ""
+
+    def execute(self, sql, parameters=()):
+        if not recorder.enabled:
+            return super().execute(sql, parameters)
+        self._label = sql_label(sql)
+        with recorder.timed('sql', self._label):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not recorder.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        self._label = sql_label(sql)
+        with recorder.timed('sql', self._label):
+            return super().executemany(sql, seq_of_parameters)
+
+    def fetchone(self):
+        if not recorder.enabled:
+            return super().fetchone()
+        with recorder.timed('sql_fetch', self._label):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if not recorder.enabled:
+            return super().fetchmany(size)
+        with recorder.timed('sql_fetch', self._label):
+            return super().fetchmany(size)
+
+    def fetchall(self):
+        if not recorder.enabled:
+            return super().fetchall()
+        with recorder.timed('sql_fetch', self._label):
+            return super().fetchall()
+
+
+class TimedConnection(sqlite3.Connection):
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        with recorder.timed('sql', sql_label(script)):
+            return super().executescript(script)
+
+
+# Kivy hooks. Imported lazily so db and the benchmarks stay headless.
+
+_frame_event = None
+_ui_hooks_installed = False
+
+
+def _on_frame(dt):
+    recorder.record('frame', 'interval', dt * 1000)
+
+
+def start_frame_sampling():
+    """Record the interval between consecutive frames while enabled."""
+    global _frame_event
+    from kivy.clock import Clock
+    if _frame_event is None:
+        _frame_event = Clock.schedule_interval(_on_frame, 0)
+
+
+def stop_frame_sampling():
+    global _frame_event
+    if _frame_event is not None:
+        _frame_event.cancel()
+        _frame_event = None
+
+
+def set_enabled(enabled):
+    if enabled:
+        recorder.enable()
+        start_frame_sampling()
+    else:
+        recorder.disable()
+        stop_frame_sampling()
+
+
+def instrument_screen(screen):
+    """Time this screen's on_pre_enter and on_enter handlers."""
+    for event in ('on_pre_enter', 'on_enter'):
+        handler = getattr(screen, event)
+        # Kivy dispatches the default handler through getattr, so an
+        # instance attribute wraps it for this screen only.
+        setattr(screen, event, timed('screen', f"{screen.name}.{event}")(handler))
+
+
+def install_ui_hooks():
+    """Time every dialog open and RecycleView refresh. Safe to call more than once."""
+    global _ui_hooks_installed
+    if _ui_hooks_installed:
+        return
+    from kivy.uix.modalview import ModalView
+    from kivy.uix.recycleview import RecycleView
+
+    open_dialog = ModalView.open
+    refresh_views = RecycleView.refresh_views
+
+    @wraps(open_dialog)
+    def timed_open(self, *args, **kwargs):
+        label = getattr(self, 'title', '') or type(self).__name__
+        with recorder.timed('dialog', f"{type(self).__name__}: {label}"[:SQL_LABEL_LENGTH]):
+            return open_dialog(self, *args, **kwargs)
+
+    @wraps(refresh_views)
+    def timed_refresh(self, *args, **kwargs):
+        viewclass = self.viewclass if isinstance(self.viewclass, str) else getattr(self.viewclass, '__name__', '')
+        with recorder.timed('rv', viewclass):
+            return refresh_views(self, *args, **kwargs)
+
+    ModalView.open = timed_open
+    RecycleView.refresh_views = timed_refresh
+    _ui_hooks_installed = True
+    if recorder.enabled:
+        start_frame_sampling()
@@ -0,0 +1,74 @@
+import threading
+
+import db
+
+# Products at or below this many units on hand (unassigned plus every
+# store's store_stock) count as low stock.
+LOW_STOCK_THRESHOLD = 5
+
+_METRICS_SQL = """
+    SELECT p.total, p.active, p.low_stock,
+           (SELECT COUNT(*) FROM stores),
+           (SELECT COUNT(DISTINCT store_id) FROM product_stores),
+           (SELECT IFNULL(SUM(total), 0) FROM client_balances)
+    FROM (
+        SELECT COUNT(*) AS total,
+               IFNULL(SUM(active = 1), 0) AS active,
+               IFNULL(SUM(IFNULL(stock, 0) + IFNULL(s.quantity, 0) <= ?), 0) AS low_stock
+        FROM products
+        LEFT JOIN (
+            SELECT product_id, SUM(quantity) AS quantity FROM store_stock GROUP BY product_id
+        ) s ON s.product_id = products.id
+    ) p
+"""
+
+
+def compute_metrics(low_stock_threshold=LOW_STOCK_THRESHOLD):
+    """Every dashboard figure from a single aggregate query."""
+    conn = db.get_connection()
+    (total, active, low_stock, stores,
+     active_stores, outstanding) = conn.execute(_METRICS_SQL, (low_stock_threshold,)).fetchone()
+    return {
+        'total_products': total,
+        'active_products': active,
+        'low_stock': low_stock,
+        'store_count': stores,
+        'active_stores': active_stores,
+        'outstanding_debt': outstanding,
+    }
+
+
+class MetricsCache:
+    """Dashboard metrics, recomputed only when db.write_generation() has moved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._metrics = None
+
+    def cached(self):
+        """The metrics if nothing was written since they were computed, else None."""
+        with self._lock:
+            if self._generation == db.write_generation():
+                return self._metrics
+            return None
+
+    def get(self):
+        metrics = self.cached()
+        if metrics is not None:
+            return metrics
+        # Read the generation first: a write racing the query leaves the
+        # cache stale-marked rather than fresh-looking.
+        generation = db.write_generation()
+        metrics = compute_metrics()
+        with self._lock:
+            self._generation = generation
+            self._metrics = metrics
+        return metrics
+
+    def invalidate(self):
+        with self._lock:
+            self._generation = None
+
+
+metrics_cache = MetricsCache()
@@ -0,0 +1,240 @@
+import sqlite3
+from datetime import datetime
+
+import db
+from repositories.stores import store_repository
+from services import stock
+
+# Orders per keyset page in orders_rv.
+PAGE_SIZE = 40
+
+STATUSES = ('pending', 'fulfilled', 'cancelled')
+
+PAGE_COLUMNS = """o.id, o.status, o.created_at, o.line_count, o.units, o.total,
+    IFNULL(c.name, ''), IFNULL(s.name, '')"""
+
+
+class OrderError(ValueError):
+    """An order that cannot be created or moved to the requested status."""
+
+
+class _Shortfall(Exception):
+    """Raised inside create_order's transaction to roll the reservations back."""
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _normalise(line):
+    """(product_id, quantity[, unit_price]) -> (product_id, quantity, unit_price)."""
+    product_id, quantity = line[:2]
+    if int(quantity) != quantity or quantity <= 0:
+        raise OrderError(f"quantity must be a positive whole number, got {quantity!r}")
+    return int(product_id), int(quantity), float(line[2]) if len(line) > 2 else 0.0
+
+
+def _per_product(lines):
+    """Sum quantities per product, so each reservation is one guarded UPDATE."""
+    totals = {}
+    for product_id, quantity, _price in lines:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
+
+def create_order(store_id, lines, client_id=None, note=None):
+    """Create a pending order and reserve its stock in the store; returns the order id.
+
+    The order row, every line (one executemany) and the reservations are
+    written in one transaction. Each reservation only succeeds while the
+    store's unreserved quantity covers it, and since SQLite serialises
+    writers, a second order for the same units sees the first one's
+    reservation and fails instead of overselling. On any shortfall the
+    whole order is rolled back and OrderError raised.
+    """
+    lines = [_normalise(line) for line in lines]
+    if not lines:
+        raise OrderError("an order needs at least one line")
+    needed = _per_product(lines)
+    now = _now()
+    try:
+        with db.transaction() as conn:
+            order_id = conn.execute(
+                "INSERT INTO orders (client_id, store_id, status, line_count, units, total, note, "
+                "created_at, updated_at) VALUES (?, ?, 'pending', ?, ?, ?, ?, ?, ?)",
+                (client_id, store_id, len(lines), sum(q for _p, q, _u in lines),
+                 round(sum(q * price for _p, q, price in lines), 2), note, now, now)
+            ).lastrowid
+            # Each line keeps the product's current name, so the order still
+            # reads the same after the product is renamed or deleted.
+            conn.executemany(
+                "INSERT INTO order_lines (order_id, line_no, product_id, product_name, quantity, unit_price) "
+                "VALUES (?1, ?2, ?3, IFNULL((SELECT name FROM products WHERE id = ?3), ''), ?4, ?5)",
+                [(order_id, line_no, product_id, quantity, price)
+                 for line_no, (product_id, quantity, price) in enumerate(lines, 1)]
+            )
+            reserved = conn.executemany(
+                "UPDATE store_stock SET reserved = reserved + ?1, updated_at = ?4 "
+                "WHERE product_id = ?2 AND store_id = ?3 AND quantity - reserved >= ?1",
+                [(quantity, product_id, store_id, now) for product_id, quantity in needed.items()]
+            ).rowcount
+            if reserved != len(needed):
+                raise _Shortfall()
+    except _Shortfall:
+        # Read after the rollback, so partial reservations are not counted.
+        raise OrderError("not enough stock for " + ", ".join(_shortfall(store_id, needed))) from None
+    except sqlite3.IntegrityError as exc:
+        if "FOREIGN KEY" in str(exc):
+            raise OrderError("unknown store, client or product in this order") from exc
+        raise
+    return order_id
+
+
+def _shortfall(store_id, needed):
+    """'name (have N, need M)' for every product the store cannot cover."""
+    conn = db.get_connection()
+    short = []
+    for product_id, quantity in needed.items():
+        row = conn.execute(
+            "SELECT p.name, IFNULL(s.quantity - s.reserved, 0) FROM products p "
+            "LEFT JOIN store_stock s ON s.product_id = p.id AND s.store_id = ? WHERE p.id = ?",
+            (store_id, product_id)
+        ).fetchone()
+        name, available = row if row else (f"product {product_id}", 0)
+        if available < quantity:
+            short.append(f"{name} (have {available}, need {quantity})")
+    return short
+
+
+def _move_pending(conn, order_id, status, now):
+    """Move a pending order to status and release its reservation; returns its store id."""
+    row = conn.execute("SELECT store_id FROM orders WHERE id = ?", (order_id,)).fetchone()
+    changed = conn.execute(
+        "UPDATE orders SET status = ?, updated_at = ? WHERE id = ? AND status = 'pending'",
+        (status, now, order_id)
+    ).rowcount
+    if not changed:
+        raise OrderError(f"order {order_id} is not pending")
+    store_id = row[0]
+    conn.executemany(
+        "UPDATE store_stock SET reserved = reserved - ?1, updated_at = ?4 "
+        "WHERE product_id = ?2 AND store_id = ?3",
+        [(quantity, product_id, store_id, now) for product_id, quantity in order_quantities(order_id)]
+    )
+    return store_id
+
+
+def order_quantities(order_id):
+    """(product_id, total quantity) per product on an order, skipping lines whose product was deleted."""
+    conn = db.get_connection()
+    return conn.execute(
+        "SELECT product_id, SUM(quantity) FROM order_lines WHERE order_id = ? AND product_id IS NOT NULL "
+        "GROUP BY product_id",
+        (order_id,)
+    ).fetchall()
+
+
+def fulfil_order(order_id):
+    """Ship a pending order: release its reservation and take the units out of the store.
+
+    Both happen in the same transaction as the status change, with the
+    removals recorded in stock_movements.
+    """
+    now = _now()
+    with db.transaction() as conn:
+        store_id = _move_pending(conn, order_id, 'fulfilled', now)
+        stock.apply_movements(
+            [(product_id, store_id, -quantity) for product_id, quantity in order_quantities(order_id)],
+            reason="order", reference=f"order:{order_id}"
+        )
+
+
+def cancel_order(order_id):
+    """Cancel a pending order and give its reserved units back to the store."""
+    with db.transaction() as conn:
+        _move_pending(conn, order_id, 'cancelled', _now())
+
+
+def fetch_page(status=None, after=None, limit=PAGE_SIZE):
+    """A page of orders, newest first, optionally for one status.
+
+    after is the (created_at, id) key of the last row already shown. With a
+    status this is a range scan on idx_orders_status, otherwise on
+    idx_orders_created.
+    """
+    conn = db.get_connection()
+    where, params = [], []
+    if status:
+        where.append("o.status = ?")
+        params.append(status)
+    if after:
+        where.append("(o.created_at, o.id) < (?, ?)")
+        params.extend(after)
+    clause = ("WHERE " + " AND ".join(where)) if where else ""
+    return conn.execute(f"""
+        SELECT {PAGE_COLUMNS}
+        FROM orders o
+        LEFT JOIN clients c ON c.id = o.client_id
+        LEFT JOIN stores s ON s.id = o.store_id
+        {clause}
+        ORDER BY o.created_at DESC, o.id DESC
+        LIMIT ?
+    """, params + [limit]).fetchall()
+
+
+def page_key(row):
+    return (row[2], row[0])
+
+
+def fetch_lines(order_id):
+    """(line_no, product_name, quantity, unit_price) for one order, with names as they were when ordered."""
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT line_no, product_name, quantity, unit_price
+        FROM order_lines
+        WHERE order_id = ?
+        ORDER BY line_no
+    """, (order_id,)).fetchall()
+
+
+def status_counts():
+    """Orders per status, each counted from idx_orders_status."""
+    conn = db.get_connection()
+    return {status: conn.execute("SELECT COUNT(*) FROM orders WHERE status = ?", (status,)).fetchone()[0]
+            for status in STATUSES}
+
+
+def build_order_rows(rows):
+    """Turn page rows into orders_rv data dicts."""
+    data = []
+    for row in rows:
+        order_id, status, created_at, line_count, units, total, client, store = row
+        data.append({
+            'order_id': order_id,
+            'title': f"Order #{order_id} — {line_count} line(s), {units} unit(s) — {status.capitalize()}",
+            'detail': " · ".join(part for part in (store, client or None, created_at, f"${total:.2f}") if part),
+            'status': status,
+            'sort_key': page_key(row),
+        })
+    return data
+
+
+def find_store_id(name):
+    """Id of the store with exactly this name (ignoring case), or None."""
+    store = store_repository.find(name)
+    return store.store_id if store else None
+
+
+def parse_lines(text):
+    """'3 x Product name' per line -> [(product name, quantity)]; a bare name means 1."""
+    lines = []
+    for raw in text.splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        quantity, sep, name = raw.partition(" x ")
+        if sep and quantity.strip().isdigit():
+            lines.append((name.strip(), int(quantity)))
+        else:
+            lines.append((raw, 1))
+    return lines
@@ -0,0 +1,353 @@
+import os
+import threading
+from collections import OrderedDict, deque
+
+import db
+from repositories.products import product_repository
+
+# Rows per keyset page and how many pages rv_products keeps in memory.
+PAGE_SIZE = 50
+MAX_PAGES = 6
+
+# Suggestions shown by the Add Debt autocomplete, the delay after the last
+# keystroke before looking them up, and how many prefixes stay cached.
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_DEBOUNCE = 0.15
+AUTOCOMPLETE_CACHE_SIZE = 256
+
+DEFAULT_IMAGE = os.path.abspath(os.path.join('product_images', 'default_img.png')).replace("\\", "/")
+
+
+def fetch_first_page(limit=PAGE_SIZE):
+    return product_repository.first_page(limit)
+
+
+def fetch_page_after(key, limit=PAGE_SIZE):
+    """Rows that sort after key = (last_updated, id), newest first."""
+    return product_repository.page_after(key, limit)
+
+
+def fetch_page_before(key, limit=PAGE_SIZE):
+    """Rows that sort just before key = (last_updated, id), returned newest first."""
+    return product_repository.page_before(key, limit)
+
+
+def fetch_rows(product_ids):
+    """List rows for specific products, keyed by id (missing ids are absent)."""
+    return product_repository.fetch_many(product_ids)
+
+
+def products_version():
+    """The products counter in table_versions; it moves with every committed product write."""
+    conn = db.get_connection()
+    return conn.execute("SELECT version FROM table_versions WHERE tbl = 'products'").fetchone()[0]
+
+
+def read_first_page(source, limit=PAGE_SIZE):
+    """(products_version(), source.first(limit)), both read from one snapshot. Run this on a worker."""
+    with db.read_snapshot():
+        return products_version(), source.first(limit)
+
+
+def page_key(row):
+    return row.sort_key
+
+
+def data_key(item):
+    """The keyset key of an rv_products item."""
+    return item.sort_key
+
+
+class LatestProducts:
+    """Page source listing every product, newest first, keyed on (last_updated, id)."""
+
+    descending = True
+    key = staticmethod(page_key)
+
+    def first(self, limit):
+        return fetch_first_page(limit)
+
+    def after(self, key, limit):
+        return fetch_page_after(key, limit)
+
+    def before(self, key, limit):
+        return fetch_page_before(key, limit)
+
+
+class ProductPager:
+    """A sliding window of keyset pages from a page source.
+
+    The pager only tracks keys and page sizes; the rows themselves are
+    fetched on a worker with the source's first/after/before methods and
+    handed back through the add_* methods, which report how many rows
+    were dropped from the other end so the view can trim its data to at
+    most max_pages pages.
+    """
+
+    def __init__(self, source=None, page_size=PAGE_SIZE, max_pages=MAX_PAGES):
+        self.source = source or LatestProducts()
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.reset()
+
+    def reset(self):
+        # (first_key, last_key, row_count) per page currently held.
+        self.pages = deque()
+        self.at_start = True
+        self.at_end = False
+
+    def __len__(self):
+        return sum(count for _first, _last, count in self.pages)
+
+    @property
+    def next_key(self):
+        return self.pages[-1][1] if self.pages else None
+
+    @property
+    def prev_key(self):
+        return self.pages[0][0] if self.pages else None
+
+    def _page(self, rows):
+        return (self.source.key(rows[0]), self.source.key(rows[-1]), len(rows))
+
+    def precedes(self, a, b):
+        """Whether key a is displayed before key b."""
+        return a > b if self.source.descending else a < b
+
+    def set_first_page(self, rows):
+        self.reset()
+        if rows:
+            self.pages.append(self._page(rows))
+        self.at_end = len(rows) < self.page_size
+
+    def add_next_page(self, rows):
+        """Append a page; returns how many rows were dropped from the head."""
+        if len(rows) < self.page_size:
+            self.at_end = True
+        if not rows:
+            return 0
+        self.pages.append(self._page(rows))
+        dropped = 0
+        while len(self.pages) > self.max_pages:
+            dropped += self.pages.popleft()[2]
+            self.at_start = False
+        return dropped
+
+    def add_prev_page(self, rows):
+        """Prepend a page; returns how many rows were dropped from the tail."""
+        if len(rows) < self.page_size:
+            self.at_start = True
+        if not rows:
+            return 0
+        self.pages.appendleft(self._page(rows))
+        dropped = 0
+        while len(self.pages) > self.max_pages:
+            dropped += self.pages.pop()[2]
+            self.at_end = False
+        return dropped
+
+    def contains_key(self, key):
+        """Whether a row with this key belongs inside the current window."""
+        if not self.pages:
+            return self.at_start and self.at_end
+        first, last = self.pages[0][0], self.pages[-1][1]
+        return ((self.at_start or not self.precedes(key, first))
+                and (self.at_end or not self.precedes(last, key)))
+
+    def _locate(self, position):
+        for i, (_first, _last, count) in enumerate(self.pages):
+            if position < count:
+                return i
+            position -= count
+        return len(self.pages) - 1
+
+    def row_inserted(self, position, key):
+        if not self.pages:
+            self.pages.append((key, key, 1))
+            return
+        i = self._locate(position)
+        first, last, count = self.pages[i]
+        if i == 0 and position == 0 and self.precedes(key, first):
+            first = key
+        if i == len(self.pages) - 1 and position >= len(self) and self.precedes(last, key):
+            last = key
+        self.pages[i] = (first, last, count + 1)
+
+    def row_removed(self, position):
+        # Boundary keys are left alone: a deleted row's key is still a valid cursor.
+        i = self._locate(position)
+        first, last, count = self.pages[i]
+        self.pages[i] = (first, last, count - 1)
+
+
+class ChangeTracker:
+    """Products written by this process since rv_products last synced with the database.
+
+    It works from the products counter in table_versions (migration 15),
+    which every connection's product writes move. sync_point() takes the
+    value read in the same snapshot as the page on screen. Every mark()
+    stands for exactly one expected move of the counter: writers on the UI
+    thread call mark(), and a worker write we started ourselves is
+    absorbed with mark_worker_write() once it is delivered back to the UI
+    thread. If the counter has moved any further (an import, a sync,
+    another worker, another process), pending() returns None to ask for a
+    full reload.
+    """
+
+    def __init__(self):
+        self._changes = OrderedDict()
+        self._expected = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """callback() runs after every mark(), on the thread that called mark()."""
+        self._listeners.append(callback)
+
+    def sync_point(self, version):
+        """Call after a full reload with the products_version() read alongside its rows (see read_first_page)."""
+        self._changes.clear()
+        self._expected = version
+
+    def mark(self, product_id, op):
+        if self._expected is not None:
+            self._expected += 1
+        previous = self._changes.pop(product_id, None)
+        if previous == "insert" and op == "delete":
+            return
+        if previous == "insert":
+            op = "insert"
+        self._changes[product_id] = op
+        for callback in self._listeners:
+            callback()
+
+    def mark_worker_write(self, product_id, op="update"):
+        """Absorb one product write a worker made for us (e.g. images.attach_to_product's thumbnail)."""
+        self.mark(product_id, op)
+
+    def pending(self):
+        """Drain queued (product_id, op) pairs, or None if a full reload is needed."""
+        if self._expected is None or products_version() != self._expected:
+            return None
+        changes = list(self._changes.items())
+        self._changes.clear()
+        return changes
+
+
+changes = ChangeTracker()
+
+
+# SQLite's NOCASE folds only A-Z; the cache must fold exactly the same way
+# or its filtered results would differ from a fresh query for names like "É".
+_NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def nocase(text):
+    """text lowercased the way COLLATE NOCASE compares it (ASCII letters only)."""
+    return text.translate(_NOCASE)
+
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater, under NOCASE, than every string starting with prefix.
+
+    prefix is already folded. Folded strings never contain A-Z, so the
+    character after '@' is '[', not 'A' (which NOCASE would read as 'a').
+    """
+    following = chr(ord(prefix[-1]) + 1)
+    if 'A' <= following <= 'Z':
+        following = '['
+    return prefix[:-1] + following
+
+
+def fetch_name_prefix(prefix, limit=AUTOCOMPLETE_LIMIT):
+    """(id, name) of products whose name starts with prefix, case-insensitively.
+
+    A range scan on idx_products_name_nocase, in name order.
+    """
+    conn = db.get_connection()
+    prefix = nocase(prefix)
+    return conn.execute(
+        "SELECT id, name FROM products "
+        "WHERE name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE "
+        "ORDER BY name COLLATE NOCASE, id LIMIT ?",
+        (prefix, _prefix_upper_bound(prefix), limit)
+    ).fetchall()
+
+
+def edited_image(current_path, typed_path):
+    """The image change asked for by the Edit Product dialog's image field.
+
+    Returns (change, path). change is False when the image stays as it is:
+    the field is unchanged, or names a file that does not exist. Otherwise
+    path is the new image file, or None to remove the image.
+    """
+    typed_path = typed_path.strip()
+    if typed_path == (current_path or ""):
+        return False, None
+    if not typed_path:
+        return True, None
+    if not os.path.isfile(typed_path):
+        return False, None
+    return True, typed_path
+
+
+def find_product_id(name):
+    """Id of the product with exactly this name (ignoring case), or None."""
+    conn = db.get_connection()
+    row = conn.execute(
+        "SELECT id FROM products WHERE name = ? COLLATE NOCASE ORDER BY id LIMIT 1", (name,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+class ProductAutocomplete:
+    """Top-N product name suggestions per typed prefix.
+
+    Results are cached per prefix, folded as nocase() does (LRU), and dropped whenever
+    db.write_generation() moves. When a shorter prefix returned fewer than
+    limit rows, that list is complete, so longer prefixes are filtered from
+    it without a query.
+    """
+
+    def __init__(self, limit=AUTOCOMPLETE_LIMIT, cache_size=AUTOCOMPLETE_CACHE_SIZE):
+        self.limit = limit
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    def _cached(self, prefix):
+        with self._lock:
+            if self._generation != db.write_generation():
+                self._cache.clear()
+                self._generation = db.write_generation()
+            if prefix in self._cache:
+                self._cache.move_to_end(prefix)
+                return self._cache[prefix]
+            for end in range(len(prefix) - 1, 0, -1):
+                shorter = self._cache.get(prefix[:end])
+                if shorter is not None and len(shorter) < self.limit:
+                    return [row for row in shorter if nocase(row[1]).startswith(prefix)]
+        return None
+
+    def _store(self, prefix, rows):
+        with self._lock:
+            self._cache[prefix] = rows
+            self._cache.move_to_end(prefix)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def complete(self, text):
+        """Up to limit (id, name) suggestions for text. Safe to call from a worker."""
+        prefix = nocase(text.strip())
+        if not prefix:
+            return []
+        rows = self._cached(prefix)
+        if rows is None:
+            self.queries += 1
+            rows = fetch_name_prefix(prefix, self.limit)
+        self._store(prefix, rows)
+        return rows
+
+
+autocomplete = ProductAutocomplete()
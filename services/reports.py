@@ -0,0 +1,109 @@
+import datetime
+
+import db
+
+# Reporting windows offered by ReportsScreen, in days.
+PERIODS = (7, 30, 90)
+
+
+def period_start(days, today=None):
+    """First day (ISO date) of a window of `days` days ending today."""
+    today = today or datetime.date.today()
+    return (today - datetime.timedelta(days=days - 1)).isoformat()
+
+
+def stock_summary(days, today=None):
+    """(stock_in, stock_out, movements) over the last `days` days."""
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT IFNULL(SUM(stock_in), 0), IFNULL(SUM(stock_out), 0), IFNULL(SUM(movements), 0)
+        FROM daily_stock_rollup WHERE day >= ?
+    """, (period_start(days, today),)).fetchone()
+
+
+def debt_summary(days, today=None):
+    """(added, settled, entries) over the last `days` days."""
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT IFNULL(SUM(added), 0), IFNULL(SUM(settled), 0), IFNULL(SUM(entries), 0)
+        FROM daily_debt_rollup WHERE day >= ?
+    """, (period_start(days, today),)).fetchone()
+
+
+def stock_by_category(days, today=None):
+    """(category, stock_in, stock_out, movements) per category, busiest first."""
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT category, SUM(stock_in), SUM(stock_out), SUM(movements)
+        FROM daily_stock_rollup WHERE day >= ?
+        GROUP BY category
+        ORDER BY SUM(stock_in) + SUM(stock_out) DESC, category
+    """, (period_start(days, today),)).fetchall()
+
+
+def stock_by_store(days, today=None):
+    """(store_id, store_name, stock_in, stock_out, movements) per store.
+
+    Movements not attributed to a store are reported under store_id 0.
+    """
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT r.store_id, IFNULL(s.name, 'Unassigned'),
+               SUM(r.stock_in), SUM(r.stock_out), SUM(r.movements)
+        FROM daily_stock_rollup r
+        LEFT JOIN stores s ON s.id = r.store_id
+        WHERE r.day >= ?
+        GROUP BY r.store_id
+        ORDER BY SUM(r.stock_in) + SUM(r.stock_out) DESC
+    """, (period_start(days, today),)).fetchall()
+
+
+def daily_series(days, today=None):
+    """(day, stock_in, stock_out, debt_added, debt_settled) for each day with activity."""
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT day, SUM(stock_in), SUM(stock_out), SUM(added), SUM(settled)
+        FROM (
+            SELECT day, stock_in, stock_out, 0 AS added, 0 AS settled
+            FROM daily_stock_rollup WHERE day >= :start
+            UNION ALL
+            SELECT day, 0, 0, added, settled
+            FROM daily_debt_rollup WHERE day >= :start
+        )
+        GROUP BY day ORDER BY day
+    """, {'start': period_start(days, today)}).fetchall()
+
+
+def build_report(days):
+    """Everything ReportsScreen shows for one period, read from the rollups."""
+    stock_in, stock_out, movements = stock_summary(days)
+    added, settled, entries = debt_summary(days)
+    return {
+        'days': days,
+        'stock_in': stock_in,
+        'stock_out': stock_out,
+        'movements': movements,
+        'debt_added': added,
+        'debt_settled': settled,
+        'debt_entries': entries,
+        'categories': stock_by_category(days),
+        'stores': stock_by_store(days),
+    }
+
+
+def rebuild_rollups(conn):
+    """Recompute both rollup tables from report_events (repair only)."""
+    conn.execute("DELETE FROM daily_stock_rollup")
+    conn.execute("DELETE FROM daily_debt_rollup")
+    conn.execute("""
+        INSERT INTO daily_stock_rollup (day, category, store_id, stock_in, stock_out, movements)
+        SELECT day, category, store_id, SUM(MAX(delta, 0)), SUM(MAX(-delta, 0)), COUNT(*)
+        FROM report_events WHERE kind = 'stock'
+        GROUP BY day, category, store_id
+    """)
+    conn.execute("""
+        INSERT INTO daily_debt_rollup (day, added, settled, entries)
+        SELECT day, SUM(MAX(delta, 0)), SUM(MAX(-delta, 0)), COUNT(*)
+        FROM report_events WHERE kind = 'debt'
+        GROUP BY day
+    """)
@@ -0,0 +1,104 @@
+import re
+
+import db
+from repositories.base import fetch_all
+from repositories.products import LIST_COLUMNS, ranked_row
+
+# Delay between the last keystroke and running the search, in seconds.
+SEARCH_DEBOUNCE = 0.3
+
+# bm25 column weights: a hit in the name outranks a hit in the category.
+NAME_WEIGHT = 10.0
+CATEGORY_WEIGHT = 1.0
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_LOWEST = (float("-inf"), 0)
+
+_fts_available = None
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        conn = db.get_connection()
+        _fts_available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='products_fts'"
+        ).fetchone() is not None
+    return _fts_available
+
+
+def match_expression(text):
+    """FTS5 query matching every word of text as a prefix, e.g. 'red app' -> '"red"* "app"*'."""
+    return " ".join(f'"{token}"*' for token in _TOKEN.findall(text))
+
+
+_P_COLUMNS = ", ".join(f"p.{c.strip()}" for c in LIST_COLUMNS.split(","))
+
+# Statement text per direction, fixed so each stays in the statement cache.
+_FTS_SQL = {
+    descending: (
+        f"SELECT {_P_COLUMNS}, s.score FROM ("
+        f"  SELECT rowid AS id, bm25(products_fts, {NAME_WEIGHT}, {CATEGORY_WEIGHT}) AS score"
+        "   FROM products_fts WHERE products_fts MATCH ?"
+        ") AS s JOIN products p ON p.id = s.id "
+        f"WHERE (s.score, s.id) {op} (?, ?) ORDER BY s.score {order}, s.id {order} LIMIT ?"
+    )
+    for descending, op, order in ((False, ">", "ASC"), (True, "<", "DESC"))
+}
+_LIKE_SQL = {
+    descending: (
+        f"SELECT {LIST_COLUMNS}, 0.0 FROM products "
+        "WHERE (name LIKE ? ESCAPE '\\' OR category LIKE ? ESCAPE '\\') "
+        f"AND (0.0, id) {op} (?, ?) ORDER BY id {order} LIMIT ?"
+    )
+    for descending, op, order in ((False, ">", "ASC"), (True, "<", "DESC"))
+}
+
+
+def _fts_page(expression, key, limit, descending=False):
+    rows = fetch_all(_FTS_SQL[descending], (expression, key[0], key[1], limit), ranked_row)
+    if descending:
+        rows.reverse()
+    return rows
+
+
+def _like_page(text, key, limit, descending=False):
+    pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    rows = fetch_all(_LIKE_SQL[descending], (pattern, pattern, key[0], key[1], limit), ranked_row)
+    if descending:
+        rows.reverse()
+    return rows
+
+
+class ProductSearch:
+    """Page source for a search box query: best matches first, keyed on (score, id).
+
+    Uses the products_fts index with prefix matching and bm25 ranking; on
+    builds without FTS5 it degrades to an unranked LIKE scan.
+    """
+
+    descending = False
+
+    def __init__(self, text):
+        self.text = text.strip()
+        self.expression = match_expression(self.text)
+
+    @staticmethod
+    def key(row):
+        return row.sort_key
+
+    def _page(self, key, limit, descending=False):
+        if not self.expression:
+            return []
+        if fts_available():
+            return _fts_page(self.expression, key, limit, descending)
+        return _like_page(self.text, key, limit, descending)
+
+    def first(self, limit):
+        return self._page(_LOWEST, limit)
+
+    def after(self, key, limit):
+        return self._page(key, limit)
+
+    def before(self, key, limit):
+        return self._page(key, limit, descending=True)
@@ -0,0 +1,153 @@
+import logging
+import sqlite3
+from datetime import datetime
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background reconciliations of store_stock with the ledger.
+RECONCILE_INTERVAL = 30 * 60
+
+
+class StockError(ValueError):
+    """A batch of movements that cannot be applied; nothing from it was written."""
+
+
+def _normalise(movement, reason, reference):
+    """(product_id, store_id, delta[, reason[, reference]]) -> full ledger tuple."""
+    product_id, store_id, delta = movement[:3]
+    if int(delta) != delta or delta == 0:
+        raise StockError(f"delta must be a non-zero whole number, got {delta!r}")
+    return (int(product_id), int(store_id), int(delta),
+            movement[3] if len(movement) > 3 else reason,
+            movement[4] if len(movement) > 4 else reference)
+
+
+def apply_movements(movements, reason=None, reference=None):
+    """Apply a batch of stock movements atomically.
+
+    Each movement is (product_id, store_id, delta) with optional per-row
+    reason and reference; reason/reference arguments fill in the rest.
+    Every movement is appended to stock_movements and folded into
+    store_stock with one executemany UPSERT each. If any store would go
+    below zero or below what pending orders have reserved, or a product
+    or store does not exist, the whole batch is rolled back and
+    StockError raised. Returns the number of movements.
+    """
+    rows = [_normalise(m, reason, reference) for m in movements]
+    if not rows:
+        return 0
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        with db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO stock_movements (product_id, store_id, delta, reason, reference, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [row + (now,) for row in rows]
+            )
+            # SQLite checks the CHECK constraint on the candidate row before
+            # resolving the conflict, so a removal from an existing row
+            # proposes 0 and applies the delta in DO UPDATE; a removal from
+            # a missing row proposes the negative delta and fails.
+            conn.executemany(
+                "INSERT INTO store_stock (product_id, store_id, quantity, updated_at) "
+                "VALUES (?1, ?2, CASE WHEN ?3 >= 0 OR NOT EXISTS ("
+                "    SELECT 1 FROM store_stock WHERE product_id = ?1 AND store_id = ?2"
+                ") THEN ?3 ELSE 0 END, ?4) "
+                "ON CONFLICT(product_id, store_id) DO UPDATE SET "
+                "quantity = quantity + ?3, updated_at = ?4",
+                [(product_id, store_id, delta, now) for product_id, store_id, delta, _r, _ref in rows]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO product_stores (product_id, store_id) VALUES (?, ?)",
+                {(product_id, store_id) for product_id, store_id, *_rest in rows}
+            )
+    except sqlite3.IntegrityError as exc:
+        message = str(exc)
+        if "CHECK" in message:
+            raise StockError("not enough unreserved stock in the store for this batch") from exc
+        if "FOREIGN KEY" in message:
+            raise StockError("unknown product or store in this batch") from exc
+        raise
+    return len(rows)
+
+
+def transfer(product_id, from_store, to_store, quantity, reference=None):
+    """Move units between two stores in one transaction."""
+    return apply_movements([(product_id, from_store, -quantity), (product_id, to_store, quantity)],
+                           reason="transfer", reference=reference)
+
+
+def product_levels(product_id):
+    """(store_id, store_name, quantity) for every store holding this product."""
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT s.store_id, st.name, s.quantity
+        FROM store_stock s JOIN stores st ON st.id = s.store_id
+        WHERE s.product_id = ?
+        ORDER BY st.name
+    """, (product_id,)).fetchall()
+
+
+def store_levels(store_id):
+    """(product_id, product_name, quantity) for everything a store holds."""
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT s.product_id, p.name, s.quantity
+        FROM store_stock s JOIN products p ON p.id = s.product_id
+        WHERE s.store_id = ?
+        ORDER BY p.name
+    """, (store_id,)).fetchall()
+
+
+def on_hand(product_id):
+    """Unassigned stock plus every store's quantity for one product."""
+    conn = db.get_connection()
+    return conn.execute("""
+        SELECT IFNULL(p.stock, 0) + IFNULL((SELECT SUM(quantity) FROM store_stock WHERE product_id = p.id), 0)
+        FROM products p WHERE p.id = ?
+    """, (product_id,)).fetchone()[0]
+
+
+_MISMATCHES = """
+    WITH ledger AS (
+        SELECT product_id, store_id, SUM(delta) AS total
+        FROM stock_movements GROUP BY product_id, store_id
+    )
+    SELECT s.product_id, s.store_id, s.quantity, IFNULL(l.total, 0)
+    FROM store_stock s
+    LEFT JOIN ledger l ON l.product_id = s.product_id AND l.store_id = s.store_id
+    WHERE s.quantity != IFNULL(l.total, 0)
+    UNION ALL
+    SELECT l.product_id, l.store_id, 0, l.total
+    FROM ledger l
+    JOIN products p ON p.id = l.product_id
+    JOIN stores st ON st.id = l.store_id
+    WHERE l.total != 0 AND NOT EXISTS (
+        SELECT 1 FROM store_stock s WHERE s.product_id = l.product_id AND s.store_id = l.store_id
+    )
+"""
+
+
+def reconcile(repair=False):
+    """Check store_stock against the ledger.
+
+    Returns (product_id, store_id, stored, ledger_total) for every pair
+    that disagrees. With repair=True those rows are reset to the ledger
+    total, which is the source of truth.
+    """
+    conn = db.get_connection()
+    mismatches = conn.execute(_MISMATCHES).fetchall()
+    if mismatches:
+        logger.warning("store_stock disagrees with stock_movements for %d item(s)", len(mismatches))
+    if mismatches and repair:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO store_stock (product_id, store_id, quantity, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(product_id, store_id) DO UPDATE SET quantity = excluded.quantity, "
+                "reserved = MIN(reserved, excluded.quantity), updated_at = excluded.updated_at",
+                [(product_id, store_id, max(total, 0), now) for product_id, store_id, _stored, total in mismatches]
+            )
+    return mismatches
@@ -0,0 +1,211 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+
+import db
+from services import exporter
+
+# Supplier dict keys stored as columns; 'id' maps to the slug column.
+COLUMNS = ['name', 'category', 'status', 'contact', 'email', 'rating', 'avatar', 'color', 'address', 'date_added']
+
+_SELECT = "SELECT slug, " + ", ".join(COLUMNS) + " FROM suppliers"
+
+# Fields filter_suppliers matches against.
+SEARCH_FIELDS = ('name', 'category', 'email')
+
+# Delay between the last keystroke in the search box and filtering, in seconds.
+FILTER_DEBOUNCE = 0.2
+
+
+def _to_dict(row):
+    supplier = dict(zip(['id'] + COLUMNS, row))
+    supplier['color'] = json.loads(supplier['color']) if supplier['color'] else [0.27, 0.54, 0.96, 1]
+    supplier['rating'] = supplier['rating'] or 0.0
+    for key in ('contact', 'email', 'address', 'avatar'):
+        supplier[key] = supplier[key] or ''
+    return supplier
+
+
+def _to_column(key, value):
+    return json.dumps(value) if key == 'color' else value
+
+
+class SupplierSearchIndex:
+    """Lowercase n-gram index over SEARCH_FIELDS.
+
+    Every 1-, 2- and 3-character substring of each field maps to the
+    suppliers containing it, so terms of up to three characters are a
+    single lookup. Longer terms intersect the postings of their trigrams
+    and then confirm the substring on that small candidate set.
+    """
+
+    GRAM = 3
+
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._texts = {}
+
+    def _grams(self, texts):
+        grams = set()
+        for text in texts:
+            for n in range(1, self.GRAM + 1):
+                grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+        return grams
+
+    def add(self, supplier_id, supplier):
+        self.remove(supplier_id)
+        texts = tuple((supplier.get(f) or '').lower() for f in SEARCH_FIELDS)
+        self._texts[supplier_id] = texts
+        for gram in self._grams(texts):
+            self._postings[gram].add(supplier_id)
+
+    def remove(self, supplier_id):
+        texts = self._texts.pop(supplier_id, None)
+        if texts is None:
+            return
+        for gram in self._grams(texts):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(supplier_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def matches(self, supplier_id, term):
+        return any(term in text for text in self._texts.get(supplier_id, ()))
+
+    def search(self, term, candidates=None):
+        """Ids of suppliers containing the lowercase term.
+
+        candidates, when given, restricts the search to those ids (used
+        when the term narrows a previous search).
+        """
+        if candidates is not None:
+            return {i for i in candidates if self.matches(i, term)}
+        if len(term) <= self.GRAM:
+            return set(self._postings.get(term, ()))
+        trigrams = sorted({term[i:i + self.GRAM] for i in range(len(term) - self.GRAM + 1)},
+                          key=lambda g: len(self._postings.get(g, ())))
+        found = set(self._postings.get(trigrams[0], ()))
+        for gram in trigrams[1:]:
+            if not found:
+                break
+            found &= self._postings.get(gram, set())
+        return {i for i in found if self.matches(i, term)}
+
+
+class SupplierManager:
+    """Handles all supplier-related data operations.
+
+    Suppliers live in the suppliers table. Rows are cached in a dict keyed
+    by supplier id (the slug); every write refreshes or drops just the
+    entry it touched, and updates the search index the same way.
+    """
+
+    def __init__(self):
+        self._cache = None
+        self._index = SupplierSearchIndex()
+        self._order = {}
+        self._last_term = None
+        self._last_ids = None
+
+    def invalidate(self):
+        """Forget the cache after suppliers were written behind this manager's back (e.g. an import)."""
+        self._cache = None
+        self._index = SupplierSearchIndex()
+        self._order = {}
+        self._last_term = self._last_ids = None
+
+    def _rows(self):
+        if self._cache is None:
+            conn = db.get_connection()
+            self._cache = {}
+            for row in conn.execute(_SELECT + " ORDER BY id"):
+                self._store(_to_dict(row))
+        return self._cache
+
+    def _store(self, supplier):
+        supplier_id = supplier['id']
+        self._order.setdefault(supplier_id, len(self._order))
+        self._cache[supplier_id] = supplier
+        self._index.add(supplier_id, supplier)
+        self._last_term = self._last_ids = None
+
+    def _drop(self, supplier_id):
+        self._rows().pop(supplier_id, None)
+        self._order.pop(supplier_id, None)
+        self._index.remove(supplier_id)
+        self._last_term = self._last_ids = None
+
+    def _reload(self, supplier_id):
+        row = db.get_connection().execute(_SELECT + " WHERE slug=?", (supplier_id,)).fetchone()
+        if row is None:
+            self._drop(supplier_id)
+            return None
+        self._rows()
+        supplier = _to_dict(row)
+        self._store(supplier)
+        return supplier
+
+    @property
+    def suppliers(self):
+        return list(self._rows().values())
+
+    def get_all_suppliers(self):
+        return self.suppliers
+
+    def get_supplier(self, supplier_id):
+        return self._rows().get(supplier_id)
+
+    def _unique_slug(self, name):
+        base = name.lower().replace(' ', '_').replace('.', '')
+        slug, n = base, 2
+        while slug in self._rows():
+            slug = f"{base}_{n}"
+            n += 1
+        return slug
+
+    def add_supplier(self, supplier_data):
+        supplier_data['id'] = self._unique_slug(supplier_data['name'])
+        supplier_data['date_added'] = datetime.now().strftime('%Y-%m-%d')
+        columns = [c for c in COLUMNS if c in supplier_data]
+        with db.transaction() as conn:
+            conn.execute(
+                f"INSERT INTO suppliers (slug, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})",
+                [supplier_data['id']] + [_to_column(c, supplier_data[c]) for c in columns]
+            )
+        self._reload(supplier_data['id'])
+        return supplier_data['id']
+
+    def update_supplier(self, supplier_id, updated_data):
+        if self.get_supplier(supplier_id) is None:
+            return False
+        columns = [c for c in COLUMNS if c in updated_data]
+        if columns:
+            with db.transaction() as conn:
+                conn.execute(
+                    f"UPDATE suppliers SET {', '.join(c + '=?' for c in columns)} WHERE slug=?",
+                    [_to_column(c, updated_data[c]) for c in columns] + [supplier_id]
+                )
+        self._reload(supplier_id)
+        return True
+
+    def delete_supplier(self, supplier_id):
+        with db.transaction() as conn:
+            conn.execute("DELETE FROM suppliers WHERE slug=?", (supplier_id,))
+        self._drop(supplier_id)
+
+    def filter_suppliers(self, search_term):
+        if not search_term:
+            return self.suppliers
+
+        rows = self._rows()
+        search_term = search_term.lower()
+        # A term that extends the previous one can only match a subset of its results.
+        narrowing = self._last_term is not None and self._last_term in search_term
+        ids = self._index.search(search_term, self._last_ids if narrowing else None)
+        self._last_term, self._last_ids = search_term, ids
+        return [rows[i] for i in sorted(ids, key=self._order.__getitem__)]
+
+    def export_to_csv(self, filename='suppliers_export.csv'):
+        """Export suppliers to CSV file"""
+        return exporter.export('suppliers', filename)[0]
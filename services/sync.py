@@ -0,0 +1,330 @@
+"""Offline-first delta sync between this device's database and a sync server.
+
+Local writes to the synced tables are recorded by triggers (migration 14)
+in change_log, with a uid and last-writer-wins version per row in
+sync_rows. sync() pushes the rows changed since this peer's push cursor
+and pulls everything the server has seen since its pull cursor, in
+gzip-compressed batches. Each pulled batch is applied together with the
+cursor update in one transaction, so an interrupted sync resumes from the
+last completed batch. A newer version wins; equal versions go to the
+higher device id.
+
+Point the app at a server with INVENTORY_SYNC_URL (see sync_server.py).
+"""
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import requests
+
+import db
+
+logger = logging.getLogger(__name__)
+
+ENV_URL = "INVENTORY_SYNC_URL"
+
+# Seconds between background syncs while the app runs.
+SYNC_INTERVAL = 5 * 60
+
+# Rows per push/pull request, and the HTTP timeout in seconds.
+BATCH_SIZE = 500
+TIMEOUT = 30
+
+# Parents before children; deletes are applied in the reverse order.
+TABLES = ('stores', 'products', 'clients', 'debts', 'product_stores')
+
+COLUMNS = {
+    'stores': ('name', 'location'),
+    'products': ('name', 'stock', 'category', 'active', 'last_updated'),
+    'clients': ('name', 'phone'),
+    'debts': ('client_id', 'product', 'amount', 'product_id'),
+}
+
+# Foreign keys travel as the referenced row's uid: column -> (table, required).
+REFERENCES = {
+    'debts': {'client_id': ('clients', True), 'product_id': ('products', False)},
+}
+
+_running = threading.Lock()
+
+
+class SyncError(Exception):
+    """The server rejected a request or returned something unusable."""
+
+
+def server_url():
+    return os.environ.get(ENV_URL) or None
+
+
+def device_id():
+    conn = db.get_connection()
+    return conn.execute("SELECT value FROM sync_state WHERE key = 'device_id'").fetchone()[0]
+
+
+def _uid_of(conn, table, row_id):
+    row = conn.execute("SELECT uid FROM sync_rows WHERE tbl = ? AND row_id = ?", (table, row_id)).fetchone()
+    return row[0] if row else None
+
+
+def _local_id(conn, table, uid):
+    row = conn.execute("SELECT row_id FROM sync_rows WHERE tbl = ? AND uid = ? AND deleted = 0",
+                       (table, uid)).fetchone()
+    return row[0] if row else None
+
+
+def _peer_cursors(conn, peer):
+    conn.execute("INSERT OR IGNORE INTO sync_peers (peer) VALUES (?)", (peer,))
+    return conn.execute("SELECT pushed_seq, pulled_seq FROM sync_peers WHERE peer = ?", (peer,)).fetchone()
+
+
+def pending_changes(peer):
+    """Rows changed locally and not yet pushed to peer."""
+    conn = db.get_connection()
+    row = conn.execute("SELECT pushed_seq FROM sync_peers WHERE peer = ?", (peer,)).fetchone()
+    return conn.execute("SELECT COUNT(DISTINCT tbl || uid) FROM change_log WHERE seq > ?",
+                        (row[0] if row else 0,)).fetchone()[0]
+
+
+# Push side
+
+def _row_data(conn, table, row_id):
+    columns = COLUMNS[table]
+    row = conn.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?", (row_id,)).fetchone()
+    if row is None:
+        return None
+    data = dict(zip(columns, row))
+    for column, (ref_table, _required) in REFERENCES.get(table, {}).items():
+        if data[column] is not None:
+            data[column] = _uid_of(conn, ref_table, data[column])
+    return data
+
+
+def collect_changes(after_seq, limit=BATCH_SIZE):
+    """The current state of up to limit rows changed after change_log seq after_seq.
+
+    Returns (changes, last_seq). A row changed several times is sent once,
+    positioned at its latest change; earlier entries for it are covered
+    by that send, so last_seq is a safe push cursor.
+    """
+    conn = db.get_connection()
+    entries = conn.execute(
+        "SELECT tbl, uid, MAX(seq) AS last FROM change_log WHERE seq > ? "
+        "GROUP BY tbl, uid ORDER BY last LIMIT ?", (after_seq, limit)
+    ).fetchall()
+    changes = []
+    for table, uid, _last in entries:
+        state = conn.execute("SELECT row_id, version, origin, deleted FROM sync_rows WHERE tbl = ? AND uid = ?",
+                             (table, uid)).fetchone()
+        if state is None:
+            continue
+        row_id, version, origin, deleted = state
+        change = {'tbl': table, 'uid': uid, 'version': version, 'origin': origin, 'deleted': deleted}
+        if not deleted and table in COLUMNS:
+            change['data'] = _row_data(conn, table, row_id)
+            if change['data'] is None:
+                continue
+        changes.append(change)
+    return changes, (entries[-1][2] if entries else None)
+
+
+def prune_log():
+    """Drop change_log entries every known peer has already received."""
+    with db.transaction() as conn:
+        return conn.execute(
+            "DELETE FROM change_log WHERE seq <= (SELECT MIN(pushed_seq) FROM sync_peers)"
+        ).rowcount
+
+
+# Pull side
+
+def _order_key(change):
+    position = TABLES.index(change['tbl'])
+    return (1, -position) if change.get('deleted') else (0, position)
+
+
+def _apply_one(conn, change):
+    """Apply one remote change. True if applied, False if it must wait for a parent, None if stale."""
+    table, uid = change['tbl'], change['uid']
+    local = conn.execute("SELECT row_id, version, origin FROM sync_rows WHERE tbl = ? AND uid = ?",
+                         (table, uid)).fetchone()
+    if local and (local[1], local[2]) >= (change['version'], change['origin']):
+        return None
+
+    row_id = local[0] if local else None
+    try:
+        if table == 'product_stores':
+            product_uid, _sep, store_uid = uid.partition('|')
+            product_id = _local_id(conn, 'products', product_uid)
+            store_id = _local_id(conn, 'stores', store_uid)
+            if change['deleted']:
+                conn.execute("DELETE FROM product_stores WHERE product_id = ? AND store_id = ?",
+                             (product_id, store_id))
+            elif product_id is None or store_id is None:
+                return False
+            else:
+                conn.execute("INSERT OR IGNORE INTO product_stores (product_id, store_id) VALUES (?, ?)",
+                             (product_id, store_id))
+        elif change['deleted']:
+            if row_id is not None:
+                conn.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+        else:
+            data = dict(change['data'])
+            for column, (ref_table, required) in REFERENCES.get(table, {}).items():
+                ref = data.get(column)
+                data[column] = _local_id(conn, ref_table, ref) if ref is not None else None
+                if required and data[column] is None:
+                    return False
+            columns = COLUMNS[table]
+            values = [data.get(column) for column in columns]
+            updated = 0
+            if row_id is not None:
+                updated = conn.execute(
+                    f"UPDATE {table} SET {', '.join(c + ' = ?' for c in columns)} WHERE id = ?",
+                    values + [row_id]
+                ).rowcount
+            if not updated:
+                row_id = conn.execute(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    values
+                ).lastrowid
+    except sqlite3.IntegrityError as exc:
+        # Typically a delete of a row local data still points at.
+        logger.info("Deferring %s %s: %s", table, uid, exc)
+        return False
+
+    conn.execute(
+        "INSERT INTO sync_rows (tbl, uid, row_id, version, origin, deleted) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(tbl, uid) DO UPDATE SET row_id = excluded.row_id, version = excluded.version, "
+        "origin = excluded.origin, deleted = excluded.deleted",
+        (table, uid, row_id, change['version'], change['origin'], int(bool(change['deleted'])))
+    )
+    return True
+
+
+def _apply_batch(conn, changes):
+    applied = deferred = 0
+    for change in sorted(changes, key=_order_key):
+        if change.get('tbl') not in TABLES:
+            continue
+        result = _apply_one(conn, change)
+        if result is False:
+            conn.execute("INSERT OR REPLACE INTO sync_deferred (tbl, uid, change) VALUES (?, ?, ?)",
+                         (change['tbl'], change['uid'], json.dumps(change)))
+            deferred += 1
+            continue
+        conn.execute("DELETE FROM sync_deferred WHERE tbl = ? AND uid = ?", (change['tbl'], change['uid']))
+        applied += bool(result)
+    return applied, deferred
+
+
+def _retry_deferred(conn):
+    applied = 0
+    while True:
+        waiting = [json.loads(change) for (change,) in conn.execute("SELECT change FROM sync_deferred")]
+        if not waiting:
+            return applied
+        progress, still_waiting = _apply_batch(conn, waiting)
+        applied += progress
+        if still_waiting == len(waiting):
+            return applied
+
+
+def apply_changes(changes):
+    """Apply pulled changes in one transaction without logging them as local edits.
+
+    Returns (applied, deferred). Changes that reference rows this device
+    does not have yet are kept in sync_deferred and retried after every
+    batch.
+    """
+    with db.transaction() as conn:
+        conn.execute("UPDATE sync_state SET value = '1' WHERE key = 'applying'")
+        applied, deferred = _apply_batch(conn, changes)
+        applied += _retry_deferred(conn)
+        conn.execute("UPDATE sync_state SET value = '0' WHERE key = 'applying'")
+    return applied, deferred
+
+
+# Transport
+
+class SyncClient:
+    """HTTP transport to a sync server; request and response bodies are gzip-compressed JSON."""
+
+    def __init__(self, base_url, session=None, timeout=TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def _check(self, response):
+        try:
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as exc:
+            raise SyncError(f"{response.request.method} {response.url} failed: {exc}") from exc
+
+    def push(self, device, changes):
+        body = gzip.compress(json.dumps({'device': device, 'changes': changes}).encode('utf-8'))
+        response = self.session.post(
+            self.base_url + '/push', data=body, timeout=self.timeout,
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+        return self._check(response)
+
+    def pull(self, device, since, limit=BATCH_SIZE):
+        # requests asks for and transparently decompresses gzip responses.
+        response = self.session.get(self.base_url + '/pull', timeout=self.timeout,
+                                    params={'device': device, 'since': since, 'limit': limit})
+        return self._check(response)
+
+
+def sync(base_url=None, client=None, batch_size=BATCH_SIZE):
+    """Push local changes, then pull remote ones. Run this on a worker.
+
+    Returns counts of what moved, or None if no server is configured or
+    another sync is already running.
+    """
+    base_url = base_url or server_url()
+    if not base_url:
+        return None
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        client = client or SyncClient(base_url)
+        device = device_id()
+        stats = {'pushed': 0, 'pulled': 0, 'applied': 0, 'deferred': 0}
+        with db.transaction() as conn:
+            pushed_seq, pulled_seq = _peer_cursors(conn, base_url)
+
+        while True:
+            changes, last_seq = collect_changes(pushed_seq, batch_size)
+            if last_seq is None:
+                break
+            if changes:
+                client.push(device, changes)
+            with db.transaction() as conn:
+                conn.execute("UPDATE sync_peers SET pushed_seq = ? WHERE peer = ?", (last_seq, base_url))
+            pushed_seq = last_seq
+            stats['pushed'] += len(changes)
+
+        while True:
+            batch = client.pull(device, pulled_seq, batch_size)
+            with db.transaction() as conn:
+                applied, deferred = apply_changes(batch['changes'])
+                conn.execute("UPDATE sync_peers SET pulled_seq = ? WHERE peer = ?", (batch['cursor'], base_url))
+            pulled_seq = batch['cursor']
+            stats['pulled'] += len(batch['changes'])
+            stats['applied'] += applied
+            stats['deferred'] += deferred
+            if not batch.get('more'):
+                break
+
+        with db.transaction() as conn:
+            conn.execute("UPDATE sync_peers SET last_synced = ? WHERE peer = ?",
+                         (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), base_url))
+        prune_log()
+        logger.info("Sync with %s: %s", base_url, stats)
+        return stats
+    finally:
+        _running.release()
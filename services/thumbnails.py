@@ -0,0 +1,144 @@
+import logging
+import os
+from collections import OrderedDict
+
+from PIL import Image
+
+import db
+
+logger = logging.getLogger(__name__)
+
+THUMB_SIZE = (128, 128)
+THUMB_DIR = os.path.join('product_images', 'thumbs')
+
+# Upper bound on decoded texture memory held by the cache (RGBA bytes).
+TEXTURE_CACHE_BYTES = 32 * 1024 * 1024
+# Paths that failed to load and are remembered, so they are not retried on every scroll.
+MAX_FAILED_PATHS = 256
+
+
+def make_thumbnail(image_path, size=THUMB_SIZE):
+    """Write a THUMB_SIZE copy of image_path into THUMB_DIR and return its path."""
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    with Image.open(image_path) as img:
+        img.thumbnail(size)
+        if img.mode in ("RGBA", "LA", "P"):
+            dest = os.path.join(THUMB_DIR, stem + ".png")
+            img.save(dest, "PNG", optimize=True)
+        else:
+            dest = os.path.join(THUMB_DIR, stem + ".jpg")
+            img.convert("RGB").save(dest, "JPEG", quality=85)
+    return dest.replace("\\", "/")
+
+
+def update_product_thumbnail(product_id, image_path):
+    """Regenerate (or clear) a product's thumbnail. Safe to run on a worker."""
+    thumb_path = make_thumbnail(image_path) if image_path else None
+    with db.transaction() as conn:
+        conn.execute("UPDATE products SET thumb_path=? WHERE id=?", (thumb_path, product_id))
+    return thumb_path
+
+
+def generate_missing_thumbnails():
+    """Backfill thumbnails for products added before thumbnails existed."""
+    conn = db.get_connection()
+    rows = conn.execute(
+        "SELECT id, image_path FROM products "
+        "WHERE thumb_path IS NULL AND image_path IS NOT NULL AND image_path != ''"
+    ).fetchall()
+    made = 0
+    for product_id, image_path in rows:
+        if not os.path.isfile(image_path):
+            continue
+        try:
+            update_product_thumbnail(product_id, image_path)
+            made += 1
+        except OSError:
+            logger.warning("Could not create thumbnail for %s", image_path)
+    return made
+
+
+def _load_texture(path):
+    from kivy.core.image import Image as CoreImage
+    return CoreImage(path).texture
+
+
+class TextureCache:
+    """LRU cache of decoded textures, bounded by their RGBA byte size.
+
+    Paths that fail to load are remembered in a separate LRU of at most
+    max_failed paths, so a missing file is only looked up once while it
+    stays in there.
+    """
+
+    def __init__(self, budget_bytes=TEXTURE_CACHE_BYTES, loader=_load_texture, max_failed=MAX_FAILED_PATHS):
+        self.budget_bytes = budget_bytes
+        self.loader = loader
+        self.max_failed = max_failed
+        self._entries = OrderedDict()
+        self._failed = OrderedDict()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Lookups answered by the failed-path LRU: no texture shown, so not hits.
+        self.failed_lookups = 0
+        self.evictions = 0
+
+    def get(self, path):
+        if not path:
+            return None
+        entry = self._entries.get(path)
+        if entry is not None:
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[0]
+        if path in self._failed:
+            self._failed.move_to_end(path)
+            self.failed_lookups += 1
+            return None
+
+        self.misses += 1
+        try:
+            texture = self.loader(path)
+        except Exception:
+            texture = None
+        if texture is None:
+            self._failed[path] = None
+            while len(self._failed) > self.max_failed:
+                self._failed.popitem(last=False)
+            return None
+        size = texture.size[0] * texture.size[1] * 4
+        self._entries[path] = (texture, size)
+        self.used_bytes += size
+        self._evict()
+        return texture
+
+    def invalidate(self, path):
+        self._failed.pop(path, None)
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.used_bytes -= entry[1]
+
+    def _evict(self):
+        while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+            _path, (_texture, size) = self._entries.popitem(last=False)
+            self.used_bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.failed_lookups
+        return {
+            "entries": len(self._entries),
+            "failed": len(self._failed),
+            "used_bytes": self.used_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failed_lookups": self.failed_lookups,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+texture_cache = TextureCache()
@@ -0,0 +1,167 @@
+"""Reference sync server for services.sync, so sync can be run and tested offline.
+
+    python -m sync_server --port 8765 --db sync_server.db
+    INVENTORY_SYNC_URL=http://127.0.0.1:8765 python main.py
+
+It keeps the newest version of every row devices have pushed (last writer
+wins, ties broken by device id), each under a server-wide sequence number,
+and serves them back in sequence order as gzip-compressed JSON batches.
+Pushing the same batch twice is harmless, which is what lets a device
+retry a push that was interrupted before it saw the reply.
+"""
+import argparse
+import gzip
+import json
+import logging
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+MAX_BATCH = 5000
+
+
+class ChangeStore:
+    """The server's rows table; one connection, serialised by a lock."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rows (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                uid TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                origin TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                data TEXT,
+                UNIQUE (tbl, uid)
+            )
+        """)
+        self._conn.commit()
+
+    def push(self, changes):
+        """Keep each change that is newer than what is stored; returns how many were kept."""
+        accepted = 0
+        with self._lock, self._conn:
+            for change in changes:
+                current = self._conn.execute(
+                    "SELECT version, origin FROM rows WHERE tbl = ? AND uid = ?", (change['tbl'], change['uid'])
+                ).fetchone()
+                if current and tuple(current) >= (change['version'], change['origin']):
+                    continue
+                # REPLACE deletes the old row, so the change gets a new, higher seq.
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rows (tbl, uid, version, origin, deleted, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (change['tbl'], change['uid'], change['version'], change['origin'],
+                     int(bool(change.get('deleted'))), json.dumps(change.get('data')))
+                )
+                accepted += 1
+        return accepted
+
+    def pull(self, device, since, limit):
+        """Rows after seq since, minus the requesting device's own; returns (changes, cursor, more)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, tbl, uid, version, origin, deleted, data FROM rows WHERE seq > ? ORDER BY seq LIMIT ?",
+                (since, limit)
+            ).fetchall()
+        changes = [
+            {'tbl': tbl, 'uid': uid, 'version': version, 'origin': origin, 'deleted': deleted,
+             'data': json.loads(data) if data else None}
+            for _seq, tbl, uid, version, origin, deleted, data in rows if origin != device
+        ]
+        return changes, (rows[-1][0] if rows else since), len(rows) == limit
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SyncHandler(BaseHTTPRequestHandler):
+    store = None  # set on the subclass make_server() creates
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/pull':
+            self._reply(404, {'error': 'not found'})
+            return
+        query = parse_qs(url.query)
+        try:
+            since = int(query.get('since', ['0'])[0])
+            limit = min(int(query.get('limit', [str(MAX_BATCH)])[0]), MAX_BATCH)
+        except ValueError:
+            self._reply(400, {'error': 'since and limit must be integers'})
+            return
+        changes, cursor, more = self.store.pull(query.get('device', [''])[0], since, limit)
+        self._reply(200, {'changes': changes, 'cursor': cursor, 'more': more})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/push':
+            self._reply(404, {'error': 'not found'})
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            payload = json.loads(body)
+            accepted = self.store.push(payload['changes'])
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            self._reply(400, {'error': str(exc)})
+            return
+        self._reply(200, {'accepted': accepted, 'received': len(payload['changes'])})
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+
+def make_server(path, host='127.0.0.1', port=DEFAULT_PORT):
+    """A ThreadingHTTPServer serving the change store at path; port 0 picks a free one."""
+    handler = type('BoundSyncHandler', (SyncHandler,), {'store': ChangeStore(path)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve_in_background(path, host='127.0.0.1', port=0):
+    """Start a server on a daemon thread; returns (server, base_url). Call server.shutdown() to stop."""
+    server = make_server(path, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True, name="sync-server").start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local sync server for services.sync.")
+    parser.add_argument("--db", default="sync_server.db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    server = make_server(args.db, args.host, args.port)
+    print(f"Sync server on http://{args.host}:{server.server_address[1]} ({args.db})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
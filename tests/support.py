@@ -0,0 +1,19 @@
+import os
+import tempfile
+import unittest
+
+import db
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs each test against a freshly migrated database in a temporary directory."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmp.name, "test.db")
+        db.configure(self.db_path)
+        db.migrate()
+
+    def tearDown(self):
+        db.close_connections()
+        self._tmp.cleanup()
@@ -0,0 +1,55 @@
+import threading
+import unittest
+
+import db
+from tests.support import DatabaseTestCase
+
+
+class TransactionTest(DatabaseTestCase):
+    def _insert_store(self, name):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO stores (name, location) VALUES (?, '')", (name,))
+
+    def test_read_then_write_survives_a_concurrent_commit(self):
+        # The other writer commits (or tries to) between this transaction's
+        # first read and its first write.
+        read_done = threading.Event()
+        other_done = threading.Event()
+        errors = []
+
+        def other_writer():
+            read_done.wait()
+            try:
+                self._insert_store("other")
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                other_done.set()
+
+        thread = threading.Thread(target=other_writer)
+        thread.start()
+        with db.transaction() as conn:
+            conn.execute("SELECT COUNT(*) FROM stores").fetchone()
+            read_done.set()
+            other_done.wait(0.5)
+            conn.execute("INSERT INTO stores (name, location) VALUES ('mine', '')")
+        thread.join()
+
+        self.assertEqual(errors, [])
+        names = {name for (name,) in db.get_connection().execute("SELECT name FROM stores")}
+        self.assertTrue({"mine", "other"} <= names)
+
+    def test_read_snapshot_does_not_block_writers(self):
+        self._insert_store("first")
+        with db.read_snapshot() as conn:
+            before = conn.execute("SELECT COUNT(*) FROM stores").fetchone()[0]
+            thread = threading.Thread(target=self._insert_store, args=("second",))
+            thread.start()
+            thread.join(2)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM stores").fetchone()[0], before)
+        self.assertEqual(db.get_connection().execute("SELECT COUNT(*) FROM stores").fetchone()[0], before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import csv
+import os
+import unittest
+
+import db
+from services import exporter, importer
+from tests.support import DatabaseTestCase
+
+
+class SupplierReimportTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.export_path = os.path.join(self._tmp.name, "suppliers.csv")
+
+    def _suppliers(self):
+        conn = db.get_connection()
+        return {slug: (name, rating, color) for slug, name, rating, color in
+                conn.execute("SELECT slug, name, rating, color FROM suppliers")}
+
+    def _write(self, header, rows):
+        with open(self.export_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def test_reimporting_an_export_changes_nothing(self):
+        before = self._suppliers()
+        exporter.export("suppliers", self.export_path)
+
+        report = importer.import_csv("suppliers", self.export_path)
+
+        self.assertEqual(report.accepted, len(before))
+        self.assertEqual(self._suppliers(), before)
+
+    def test_edited_export_updates_the_existing_supplier(self):
+        exporter.export("suppliers", self.export_path)
+        with open(self.export_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        header, data = rows[0], rows[1:]
+        data[0][header.index("rating")] = "1.5"
+        slug = data[0][header.index("id")]
+        color = self._suppliers()[slug][2]
+        self._write(header, data)
+
+        importer.import_csv("suppliers", self.export_path)
+
+        suppliers = self._suppliers()
+        self.assertEqual(len(suppliers), len(data))
+        self.assertEqual(suppliers[slug][1], 1.5)
+        self.assertEqual(suppliers[slug][2], color)
+
+    def test_file_without_ids_matches_on_name(self):
+        before = self._suppliers()
+        self._write(["name", "category", "email", "rating"], [
+            ["Acme Supplies Ltd.", "Industrial Equipment & Materials", "acme@supplies.com", "3.0"],
+            ["New Parts Co.", "Hardware", "hello@newparts.com", "4.0"],
+        ])
+
+        importer.import_csv("suppliers", self.export_path)
+
+        suppliers = self._suppliers()
+        self.assertEqual(len(suppliers), len(before) + 1)
+        self.assertEqual(suppliers["acme_supplies"][1], 3.0)
+        self.assertIn("new_parts_co", suppliers)
+        self.assertFalse([slug for slug in suppliers if slug.endswith("_2")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import db
+from repositories.products import product_repository
+from repositories.stores import store_repository
+from services import orders, stock
+from tests.support import DatabaseTestCase
+
+
+class DeleteOrderedProductTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product_id = product_repository.add("Widget", 0, "Tools", 1, "2026-01-01 00:00:00")
+        self.store_id = store_repository.add("Main", "Downtown").store_id
+        stock.apply_movements([(self.product_id, self.store_id, 5)], reason="test")
+
+    def test_fulfilled_order_keeps_its_lines(self):
+        order_id = orders.create_order(self.store_id, [(self.product_id, 2, 1.5)])
+        orders.fulfil_order(order_id)
+
+        product_repository.delete(self.product_id)
+
+        self.assertIsNone(product_repository.get(self.product_id))
+        self.assertEqual(orders.fetch_lines(order_id), [(1, "Widget", 2, 1.5)])
+        product_id = db.get_connection().execute(
+            "SELECT product_id FROM order_lines WHERE order_id = ?", (order_id,)).fetchone()[0]
+        self.assertIsNone(product_id)
+
+    def test_pending_order_can_still_be_cancelled(self):
+        order_id = orders.create_order(self.store_id, [(self.product_id, 2)])
+
+        product_repository.delete(self.product_id)
+        orders.cancel_order(order_id)
+
+        self.assertEqual(orders.status_counts()["cancelled"], 1)
+        self.assertEqual(orders.fetch_lines(order_id)[0][1], "Widget")
+
+
+if __name__ == "__main__":
+    unittest.main()
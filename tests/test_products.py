@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import db
+from repositories.products import product_repository
+from services import products
+from tests.support import DatabaseTestCase
+
+
+class EditedImageTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.current = os.path.join(self._tmp.name, "current.png")
+        self.new = os.path.join(self._tmp.name, "new.png")
+        for path in (self.current, self.new):
+            with open(path, "wb") as f:
+                f.write(b"png")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_invalid_path_keeps_the_current_image(self):
+        missing = os.path.join(self._tmp.name, "missing.png")
+        self.assertEqual(products.edited_image(self.current, missing), (False, None))
+
+    def test_unchanged_field_keeps_the_current_image(self):
+        self.assertEqual(products.edited_image(self.current, self.current + " "), (False, None))
+        self.assertEqual(products.edited_image(None, ""), (False, None))
+
+    def test_new_file_replaces_the_image(self):
+        self.assertEqual(products.edited_image(self.current, self.new), (True, self.new))
+        self.assertEqual(products.edited_image(None, self.new), (True, self.new))
+
+    def test_cleared_field_removes_the_image(self):
+        self.assertEqual(products.edited_image(self.current, ""), (True, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class ChangeTrackerTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tracker = products.ChangeTracker()
+        self.product_id = product_repository.add("Widget", 1, "Tools", 1, "2026-01-01 00:00:00")
+
+    def _in_other_thread(self, fn, *args):
+        thread = threading.Thread(target=fn, args=args)
+        thread.start()
+        thread.join()
+
+    def _load_first_page(self):
+        version, _rows = products.read_first_page(products.LatestProducts())
+        self.tracker.sync_point(version)
+
+    def _touch_thumbnail(self, product_id):
+        with db.transaction() as conn:
+            conn.execute("UPDATE products SET thumb_path = 'thumb.png' WHERE id = ?", (product_id,))
+
+    def test_own_writes_are_patched(self):
+        self._load_first_page()
+        product_repository.update_details(self.product_id, "Gadget", "Tools")
+        self.tracker.mark(self.product_id, "update")
+        self.assertEqual(self.tracker.pending(), [(self.product_id, "update")])
+
+    def test_worker_write_is_absorbed(self):
+        self._load_first_page()
+        self._in_other_thread(self._touch_thumbnail, self.product_id)
+        self.tracker.mark_worker_write(self.product_id)
+        self.assertEqual(self.tracker.pending(), [(self.product_id, "update")])
+
+    def test_other_writer_in_the_same_window_forces_a_reload(self):
+        other_id = product_repository.add("Other", 1, "Tools", 1, "2026-01-01 00:00:00")
+        self._load_first_page()
+        self._in_other_thread(self._touch_thumbnail, self.product_id)
+        self._in_other_thread(self._touch_thumbnail, other_id)  # e.g. an import or a sync
+        self.tracker.mark_worker_write(self.product_id)
+        self.assertIsNone(self.tracker.pending())
+
+    def test_write_between_page_read_and_sync_point_forces_a_reload(self):
+        version, _rows = products.read_first_page(products.LatestProducts())
+        self._in_other_thread(self._touch_thumbnail, self.product_id)
+        self.tracker.sync_point(version)
+        self.assertIsNone(self.tracker.pending())
+
+
+class AutocompleteTest(DatabaseTestCase):
+    NAMES = ("Élan bar", "élan drink", "Eclair", "eclat", "ÉLITE", "Zebra", "xÉa", "xéb", "XEc")
+
+    def setUp(self):
+        super().setUp()
+        for name in self.NAMES:
+            product_repository.add(name, 1, "Snacks", 1, "2026-01-01 00:00:00")
+
+    def test_cached_results_match_a_fresh_query(self):
+        cached = products.ProductAutocomplete()
+        # Each longer prefix may be answered from the shorter one's cached list.
+        for typed in ("x", "xé", "xÉ", "é", "él", "éla", "É", "ÉL", "e", "ec", "ecl"):
+            fresh = products.ProductAutocomplete().complete(typed)
+            self.assertEqual(cached.complete(typed), fresh, typed)
+
+    def test_only_ascii_letters_are_folded(self):
+        names = [name for _id, name in products.ProductAutocomplete().complete("É")]
+        self.assertEqual(names, ["Élan bar", "ÉLITE"])
+
+    def test_prefix_ending_in_punctuation(self):
+        # '@' sits just below 'A'; the range scan must not step into the letters NOCASE folds.
+        for name in ("x@y", "x[a", "x_b"):
+            product_repository.add(name, 1, "Snacks", 1, "2026-01-01 00:00:00")
+        self.assertEqual([name for _id, name in products.fetch_name_prefix("x@", 10)], ["x@y"])
+        cached = products.ProductAutocomplete()
+        for typed in ("x@", "x@y"):
+            self.assertEqual([name for _id, name in cached.complete(typed)], ["x@y"], typed)